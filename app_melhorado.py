@@ -3,13 +3,39 @@
 
 import streamlit as st
 import pandas as pd
-import calendar
-import altair as alt
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+import math
 import os
 
+from vendas.agregacao import plano_da_pagina
+from vendas.armazenamento import DATA_DIR, existe_armazem
+from vendas.cache import geracao_atual, memorizar_filtro, normalizar_selecoes, obter_derivado, versao_em_cache
+from vendas.consulta import (
+    carregar_dados, criar_aproximador, criar_dicionario_produtos, criar_motor as criar_motor_consulta,
+)
+from vendas.cubo import COLUNA_LINHAS
+from vendas.esbocos import COLUNAS_CONTAGEM, FONTE_ESBOCOS
+from vendas.esquema import (
+    COLUMN_DATA, COLUMN_VALOR_TOTAL, COLUMN_QUANTIDADE, COLUMN_TAXA, COLUMN_RENDA_ESTIMADA,
+    COLUMN_SUBTOTAL_PRODUTO, COLUMN_TAMANHO, COLUMN_PRODUTO, COLUMN_STATUS, COLUMN_DEVOLUCAO,
+)
+from vendas.exportacao import FORMATOS_EXPORTACAO, exportar
+from vendas.graficos import criar_grafico_barras, criar_grafico_pizza
+from vendas.ingestao import SITUACAO_IGNORADO, SITUACAO_INGERIDO, migrar_csv
+from vendas.leitura import EXTENSOES_EXCEL, extensao, listar_planilhas, sugerir_planilha
+from vendas.motores import MOTOR_CONFIGURADO, MOTOR_DUCKDB, MOTOR_PANDAS, MotorPandas, motor_duckdb_disponivel
+from vendas.perfil import PERFIL_AMBIENTE, Perfil
+from vendas.produtos import LIMITE_SUGESTOES
+from vendas.tarefas import FILA_TAREFAS, SITUACAO_FALHOU, submeter_ingestao
+
+# O DataFrame consolidado é compartilhado entre sessões: nenhuma operação
+# derivada pode alterá-lo em memória (Copy-on-Write é o padrão a partir do pandas 3)
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+# Perfil de desempenho opcional (?perfil=1 na URL ou DASHBOARD_PERFIL=1): mede
+# cada seção desta execução e emite o resumo no log ao final da página
+perfil = Perfil(PERFIL_AMBIENTE or st.query_params.get("perfil") == "1")
+
 # ===== CONFIGURAÇÃO DA PÁGINA =====
 st.set_page_config(
     page_title="📊 Dashboard de Análise de Vendas",
@@ -133,67 +159,166 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # ===== CONSTANTES E CONFIGURAÇÕES =====
-DATA_FILE = "dados_consolidados.csv"
+DATA_FILE = "dados_consolidados.csv"  # Formato antigo, migrado para DATA_DIR
+# Intervalo de atualização do andamento das tarefas em segundo plano
+INTERVALO_TAREFAS = "1s"
+# Opções de linhas por página da exploração dos dados
+TAMANHOS_PAGINA = [20, 50, 100, 200]
+# O Streamlit entrega um download como um único bloco de bytes mantido em
+# memória até o fim da sessão: acima deste número de células (linhas ×
+# colunas), a exportação fica para a linha de comando (python -m vendas exportar)
+LIMITE_CELULAS_DOWNLOAD = 10_000_000
+# Sem upload na página: os dados chegam pela linha de comando (python -m vendas)
+SOMENTE_LEITURA = os.environ.get("DASHBOARD_SOMENTE_LEITURA", "").strip().lower() in ("1", "true", "sim")
+colunas_numericas = [COLUMN_VALOR_TOTAL, COLUMN_RENDA_ESTIMADA, COLUMN_SUBTOTAL_PRODUTO, COLUMN_TAXA, COLUMN_DEVOLUCAO]
 
 # ===== FUNÇÕES AUXILIARES =====
 
+def migrar_dados_legados():
+    """
+    Migra o antigo CSV consolidado para o armazenamento particionado, se existir.
+    """
+    if not os.path.exists(DATA_FILE):
+        return
+    try:
+        linhas_migradas = migrar_csv(DATA_FILE, DATA_DIR)
+        if linhas_migradas:
+            st.sidebar.info(f"🔄 {linhas_migradas} linhas migradas de {DATA_FILE} para {DATA_DIR}.")
+    except Exception as e:
+        st.sidebar.error(f"❌ Erro ao migrar {DATA_FILE}: {str(e)}")
+
 def carregar_dados_existentes():
     """
-    Carrega o DataFrame consolidado de um arquivo CSV, se existir.
+    Carrega o DataFrame consolidado do armazenamento particionado, se existir.
     """
-    if os.path.exists(DATA_FILE):
+    if existe_armazem(DATA_DIR):
         try:
-            df_existente = pd.read_csv(DATA_FILE, decimal=",", encoding="utf-8")
-            st.sidebar.success(f"✅ Dados existentes ({df_existente.shape[0]} linhas) carregados de {DATA_FILE}.")
+            df_existente = carregar_dados(DATA_DIR, perfil)
+            st.sidebar.success(f"✅ Dados existentes ({df_existente.shape[0]} linhas) carregados de {DATA_DIR}.")
             return df_existente
         except Exception as e:
             st.sidebar.error(f"❌ Erro ao carregar dados existentes: {str(e)}")
             return pd.DataFrame()
     return pd.DataFrame()
 
-def salvar_dados(df):
+def criar_motor(versao):
     """
-    Salva o DataFrame consolidado em um arquivo CSV.
+    Cria o motor de consulta da versão atual dos dados: DuckDB sobre as
+    partições, se configurado e instalado, ou pandas em memória com índice e cubo.
     """
-    try:
-        df.to_csv(DATA_FILE, index=False, decimal=",", encoding="utf-8")
-        st.sidebar.success(f"💾 Dados salvos com sucesso em {DATA_FILE}.")
-    except Exception as e:
-        st.sidebar.error(f"❌ Erro ao salvar dados: {str(e)}")
+    if MOTOR_CONFIGURADO == MOTOR_DUCKDB:
+        if motor_duckdb_disponivel():
+            return criar_motor_consulta(DATA_DIR, MOTOR_DUCKDB)
+        st.sidebar.warning("⚠️ DASHBOARD_MOTOR=duckdb, mas o pacote duckdb não está instalado. Usando pandas.")
+    
+    return criar_motor_consulta(DATA_DIR, MOTOR_PANDAS, versao, perfil, df=carregar_dados_existentes())
 
-def processar_arquivo(uploaded_file):
+def exibir_relatorio_ingestao(registro):
     """
-    Função para ler o arquivo e criar um DataFrame do Pandas.
-    Suporta .csv, .xlsx e .xls com tratamento de erros aprimorado.
+    Exibe na barra lateral o resumo da ingestão de um arquivo: linhas novas,
+    falhas de conversão e mudanças de esquema.
     """
-    try:
-        file_extension = uploaded_file.name.split(".")[-1].lower()
-        
-        progress_bar = st.progress(0)
-        progress_bar.progress(25)
-        
-        if file_extension == "csv":
-            df = pd.read_csv(uploaded_file, decimal=",", encoding="utf-8")
-        elif file_extension in ["xlsx", "xls"]:
-            df = pd.read_excel(uploaded_file, engine='openpyxl')
+    st.sidebar.success(
+        f"💾 {registro['arquivo']}: {registro['novas']} linhas novas salvas em {DATA_DIR} "
+        f"({registro['duplicadas']} duplicadas ignoradas)."
+    )
+    normalizacao = registro["normalizacao"]
+    if normalizacao["linhas_descartadas"]:
+        st.sidebar.warning(f"⚠️ {normalizacao['linhas_descartadas']} linhas descartadas por não terem data válida.")
+    for col, falhas in normalizacao["falhas"].items():
+        exemplos = ", ".join(map(str, normalizacao["exemplos"][col]))
+        st.sidebar.warning(f"⚠️ {falhas} valores inválidos em '{col}' (linhas {exemplos}...).")
+    relatorio = registro["esquema"]
+    if relatorio["colunas_novas"]:
+        st.sidebar.info(f"🧩 Colunas novas no esquema: {', '.join(relatorio['colunas_novas'])}")
+    if relatorio["colunas_promovidas"]:
+        promovidas = ", ".join(f"{col} ({mudanca})" for col, mudanca in relatorio["colunas_promovidas"].items())
+        st.sidebar.warning(f"⚠️ Colunas com tipo ajustado: {promovidas}")
+
+def exibir_resumo_upload(resumo):
+    """
+    Exibe na barra lateral a situação de cada arquivo do último upload.
+    Com vários arquivos, mostra também uma tabela com as contagens de linhas.
+    """
+    if len(resumo) > 1:
+        st.sidebar.markdown("### 📥 Resumo do upload")
+        st.sidebar.dataframe(
+            pd.DataFrame([
+                {
+                    "arquivo": item["arquivo"],
+                    "situação": item["situacao"],
+                    "linhas": item["registro"]["linhas"] if item["registro"] else None,
+                    "novas": item["registro"]["novas"] if item["registro"] else None,
+                    "duplicadas": item["registro"]["duplicadas"] if item["registro"] else None,
+                }
+                for item in resumo
+            ]),
+            hide_index=True,
+        )
+    for item in resumo:
+        if item["situacao"] == SITUACAO_INGERIDO:
+            exibir_relatorio_ingestao(item["registro"])
+        elif item["situacao"] == SITUACAO_IGNORADO:
+            st.sidebar.info(f"ℹ️ O arquivo {item['arquivo']} já foi ingerido anteriormente e foi ignorado.")
         else:
-            st.error("❌ Formato de arquivo não suportado. Por favor, envie um arquivo .csv, .xlsx ou .xls.")
-            return None
-        
-        progress_bar.progress(75)
-        
-        df.columns = df.columns.str.strip().str.lower()
-        
-        progress_bar.progress(100)
-        progress_bar.empty()
-        
-        st.success(f"✅ Arquivo processado com sucesso! {df.shape[0]} linhas e {df.shape[1]} colunas carregadas.")
-        
-        return df
+            st.sidebar.error(f"❌ Erro ao processar {item['arquivo']}: {item['erro']}")
 
-    except Exception as e:
-        st.error(f"❌ Ocorreu um erro ao processar o arquivo: {str(e)}")
-        return None
+def coletar_tarefas_concluidas():
+    """
+    Retira da sessão as tarefas que terminaram e guarda o resumo do upload
+    de cada uma para exibição. Retorna True se alguma terminou.
+    """
+    concluidas = False
+    for identificador in list(st.session_state.tarefas):
+        tarefa = FILA_TAREFAS.obter(identificador)
+        if tarefa is not None and not tarefa.concluida:
+            continue
+        st.session_state.tarefas.remove(identificador)
+        concluidas = True
+        if tarefa is None:
+            continue
+        if tarefa.situacao == SITUACAO_FALHOU:
+            st.session_state.setdefault("erros_tarefas", []).append(f"{tarefa.nome}: {tarefa.erro}")
+        else:
+            st.session_state.setdefault("ultima_ingestao", []).extend(tarefa.resultado)
+    return concluidas
+
+@st.fragment(run_every=INTERVALO_TAREFAS)
+def exibir_andamento_tarefas():
+    """
+    Exibe o andamento das tarefas em segundo plano (desta e de outras
+    sessões), atualizado a cada segundo. Quando todas terminam, a página é
+    reexecutada e passa a consultar a nova versão dos dados.
+    """
+    ativas = FILA_TAREFAS.ativas(DATA_DIR)
+    proprias = set(st.session_state.tarefas)
+    for tarefa in ativas:
+        origem = "" if tarefa.id in proprias else " (outra sessão)"
+        st.progress(tarefa.progresso, text=f"⏳ {tarefa.nome}{origem}: {tarefa.mensagem}")
+    if ativas:
+        st.caption("Os dados exibidos são os da versão anterior até a conclusão.")
+    if coletar_tarefas_concluidas() or not ativas:
+        st.rerun(scope="app")
+
+def planilhas_do_arquivo(uploaded_file):
+    """
+    Retorna as planilhas de um arquivo Excel e a sugerida (a que reconhece
+    mais colunas), guardadas na sessão. Para outros formatos, ou se o arquivo
+    não puder ser aberto, retorna ([], None).
+    """
+    if "planilhas_arquivos" not in st.session_state:
+        st.session_state.planilhas_arquivos = {}
+    cache_planilhas = st.session_state.planilhas_arquivos
+    if uploaded_file.file_id not in cache_planilhas:
+        planilhas, sugerida = [], None
+        if extensao(uploaded_file.name) in EXTENSOES_EXCEL:
+            try:
+                planilhas = listar_planilhas(uploaded_file)
+                sugerida = sugerir_planilha(uploaded_file) if len(planilhas) > 1 else None
+            except Exception:
+                planilhas = []
+        cache_planilhas[uploaded_file.file_id] = (planilhas, sugerida)
+    return cache_planilhas[uploaded_file.file_id]
 
 def formatar_numero(valor):
     """
@@ -206,153 +331,209 @@ def formatar_numero(valor):
     valor_str = valor_str.replace(".", "TEMP").replace(",", ".").replace("TEMP", ",")
     return valor_str
 
-def criar_grafico_pizza(df, coluna, titulo):
+def formatar_bytes(quantidade):
     """
-    Cria um gráfico de pizza usando Plotly.
+    Formata uma quantidade de bytes em KB ou MB.
     """
-    if coluna not in df.columns:
-        return None
-    
-    dados = df[coluna].value_counts().head(10)
-    
-    fig = px.pie(
-        values=dados.values,
-        names=dados.index,
-        title=titulo,
-        color_discrete_sequence=px.colors.qualitative.Set3
-    )
-    
-    fig.update_traces(textposition='inside', textinfo='percent+label')
-    fig.update_layout(
-        font=dict(size=12),
-        showlegend=True,
-        height=400
+    if quantidade >= 1024 * 1024:
+        return f"{quantidade / (1024 * 1024):.1f} MB"
+    return f"{quantidade / 1024:.1f} KB"
+
+def formatar_percentual(fracao):
+    """
+    Formata uma fração como percentual com uma casa decimal, no padrão brasileiro.
+    """
+    return f"{fracao * 100:.1f}%".replace(".", ",")
+
+# ===== MODO APROXIMADO =====
+
+def legenda_resumo_aproximado(resultado):
+    """
+    Descreve a origem e o limite de erro de um resumo estatístico aproximado.
+    """
+    if resultado["erro_posto"] == 0:
+        percentis = "percentis exatos"
+    else:
+        percentis = f"percentis com erro de posto de até ±{formatar_percentual(resultado['erro_posto'])} (95% de confiança)"
+    if resultado["fonte"] == FONTE_ESBOCOS:
+        return (
+            f"≈ Aproximado, pelos esboços de {resultado['base']:,} linhas: {percentis}; "
+            "contagem, média, desvio, mínimo e máximo exatos."
+        )
+    return (
+        f"≈ Aproximado, por uma amostra estratificada por mês de {resultado['base']:,} linhas: {percentis}; "
+        "contagem, média e desvio estimados (cada linha pesa pelo tamanho do seu mês); "
+        "mínimo e máximo são os da amostra."
     )
-    
-    return fig
 
-def criar_grafico_barras(df, x_col, y_col, titulo):
+def tabela_com_intervalos(estimativas, coluna):
     """
-    Cria um gráfico de barras usando Plotly.
+    Formata estimativas (colunas "estimativa", "inferior" e "superior") em
+    uma tabela com a estimativa e o intervalo de 95% de confiança. Sem limite
+    superior, o intervalo é só o mínimo; com os limites iguais, a contagem é exata.
     """
-    if x_col not in df.columns or y_col not in df.columns:
-        return None
-    
-    dados = df.groupby(x_col)[y_col].sum().reset_index()
+    def intervalo(linha):
+        if pd.isna(linha["superior"]):
+            return f"≥ {linha['inferior']:,.0f}"
+        if linha["inferior"] == linha["superior"]:
+            return "exato"
+        return f"{math.floor(linha['inferior']):,} – {math.ceil(linha['superior']):,}"
+    return pd.DataFrame({
+        coluna: estimativas.iloc[:, 0],
+        "≈ Estimativa": estimativas["estimativa"].round().astype("int64"),
+        "Intervalo (95%)": [intervalo(linha) for _, linha in estimativas.iterrows()],
+    })
+
+def exibir_resumo_aproximado(aproximador, versao, selecoes, colunas_resumo, colunas):
+    """
+    Exibe o resumo estatístico, os valores distintos e os produtos mais
+    frequentes pelo modo aproximado, cada um com o seu limite de erro.
+    """
+    if colunas_resumo:
+        resultado = memorizar_filtro(
+            "resumo_aproximado", versao, selecoes, lambda: aproximador.resumo(selecoes, colunas_resumo), DATA_DIR
+        )
+        st.dataframe(resultado["tabela"], use_container_width=True)
+        st.caption(legenda_resumo_aproximado(resultado))
     
-    fig = px.bar(
-        dados,
-        x=x_col,
-        y=y_col,
-        title=titulo,
-        color=y_col,
-        color_continuous_scale='Viridis'
-    )
+    colunas_contagem = [col for col in COLUNAS_CONTAGEM if col in colunas]
+    if not colunas_contagem:
+        return
+    col_distintos, col_frequentes = st.columns(2)
     
-    fig.update_layout(
-        xaxis_title=x_col.title(),
-        yaxis_title=y_col.title(),
-        font=dict(size=12),
-        height=400
-    )
+    with col_distintos:
+        st.markdown("**≈ Valores distintos**")
+        distintos = memorizar_filtro(
+            "distintos_aproximados", versao, selecoes, lambda: aproximador.distintos(selecoes, colunas_contagem), DATA_DIR
+        )
+        st.dataframe(tabela_com_intervalos(distintos, "Coluna"), hide_index=True, use_container_width=True)
+        st.caption("≈ HyperLogLog por mês; com outros filtros, o mínimo visto na amostra.")
     
-    return fig
-
-# ===== INTERFACE PRINCIPAL =====
-
-# Header principal
-st.markdown("""
-<div class="main-header">
-    <h1>📊 Dashboard de Análise de Vendas</h1>
-    <p>Transforme seus dados em insights poderosos com visualizações interativas</p>
-</div>
-""", unsafe_allow_html=True)
-
-# ===== UPLOAD DO ARQUIVO =====
-st.markdown('<div class="section-header">📁 Upload do Arquivo de Dados</div>', unsafe_allow_html=True)
+    with col_frequentes:
+        if COLUMN_PRODUTO in colunas_contagem:
+            st.markdown("**≈ Produtos mais vendidos (linhas)**")
+            frequentes = memorizar_filtro(
+                "produtos_aproximados", versao, selecoes, lambda: aproximador.frequentes(selecoes, COLUMN_PRODUTO), DATA_DIR
+            )
+            st.dataframe(tabela_com_intervalos(frequentes, "Produto"), hide_index=True, use_container_width=True)
+            st.caption("≈ Misra-Gries por mês; com outros filtros, estimado pela amostra.")
 
-col_upload1, col_upload2, col_upload3 = st.columns([1, 2, 1])
+# ===== PERÍODO =====
+ATALHO_TODO_PERIODO = "Todo o período"
+ATALHO_PERSONALIZADO = "Personalizado"
 
-with col_upload2:
-    st.markdown("""
-    <div class="upload-section">
-        <h3>📤 Faça o upload do seu arquivo</h3>
-        <p>Suportamos arquivos CSV, Excel (.xlsx) e Excel antigo (.xls)</p>
-    </div>
-    """, unsafe_allow_html=True)
+def atalhos_de_periodo(inicio, fim):
+    """
+    Retorna os atalhos do filtro de período (rótulo -> (início, fim)): todo o
+    período, cada ano e cada trimestre com dados, do mais recente ao mais antigo.
+    Anos e trimestres cobrem meses inteiros, que o cubo responde diretamente.
+    """
+    atalhos = {ATALHO_TODO_PERIODO: (inicio, fim)}
+    for ano in range(fim.year, inicio.year - 1, -1):
+        atalhos[str(ano)] = (pd.Timestamp(ano, 1, 1).date(), pd.Timestamp(ano, 12, 31).date())
+    for trimestre in pd.period_range(inicio, fim, freq="Q")[::-1]:
+        atalhos[f"{trimestre.quarter}º tri/{trimestre.year}"] = (
+            trimestre.start_time.date(), trimestre.end_time.date()
+        )
+    return atalhos
 
+def escolher_periodo(inicio, fim):
+    """
+    Exibe o filtro de período na barra lateral (atalhos e intervalo de datas)
+    e retorna a seleção da coluna de data: [início, fim] em ISO, ou [] para
+    todo o período.
+    """
+    atalhos = atalhos_de_periodo(inicio, fim)
+    opcoes = list(atalhos) + [ATALHO_PERSONALIZADO]
+    if st.session_state.get("atalho_periodo") not in opcoes:
+        st.session_state.atalho_periodo = ATALHO_TODO_PERIODO
+    
+    # Um atalho define o intervalo exibido (limitado às datas existentes);
+    # alterar as datas à mão passa para "Personalizado"
+    atalho = st.session_state.atalho_periodo
+    if atalho != ATALHO_PERSONALIZADO or "intervalo_datas" not in st.session_state:
+        escolhido = atalhos.get(atalho, (inicio, fim))
+        st.session_state.intervalo_datas = (max(escolhido[0], inicio), min(escolhido[1], fim))
+    else:
+        datas = [min(max(data, inicio), fim) for data in st.session_state.intervalo_datas]
+        st.session_state.intervalo_datas = tuple(datas)
     
+    def marcar_personalizado():
+        st.session_state.atalho_periodo = ATALHO_PERSONALIZADO
     
-uploaded_file = st.file_uploader(
-        "Escolha um arquivo",
-        type=["csv", "xlsx", "xls"],
-        help="Arraste e solte seu arquivo aqui ou clique para selecionar"
+    st.sidebar.selectbox("📅 Período:", opcoes, key="atalho_periodo")
+    datas = st.sidebar.date_input(
+        "Intervalo de datas:",
+        key="intervalo_datas",
+        min_value=inicio,
+        max_value=fim,
+        format="DD/MM/YYYY",
+        on_change=marcar_personalizado,
     )
+    
+    if atalho == ATALHO_TODO_PERIODO:
+        return []
+    if atalho != ATALHO_PERSONALIZADO:
+        selecionado = atalhos[atalho]
+    elif not datas:
+        return []
+    else:
+        # Durante a escolha do intervalo, o calendário devolve só o início
+        selecionado = (datas[0], datas[-1])
+    if selecionado[0] <= inicio and selecionado[1] >= fim:
+        return []
+    return [selecionado[0].isoformat(), selecionado[1].isoformat()]
 
+def escolher_produtos(dicionario):
+    """
+    Exibe o filtro de produtos na barra lateral e retorna os produtos
+    selecionados. Em vez do catálogo inteiro, o seletor recebe só os
+    produtos já selecionados e os mais vendidos que correspondem à busca
+    (veja `DicionarioProdutos.buscar`).
+    """
+    busca = st.sidebar.text_input(
+        "🔎 Buscar Produtos:",
+        key="busca_produtos",
+        placeholder="Digite parte do nome...",
+    )
+    selecionados = [
+        produto for produto in st.session_state.get("produtos_selecionados", [])
+        if dicionario.posto(produto) is not None
+    ]
+    st.session_state.produtos_selecionados = selecionados
+    sugestoes = dicionario.buscar(busca, LIMITE_SUGESTOES)
+    opcoes = selecionados + [produto for produto in sugestoes if produto not in selecionados]
+    
+    escolhidos = st.sidebar.multiselect("🛍️ Selecione os Produtos:", opcoes, key="produtos_selecionados")
+    if busca.strip() and len(sugestoes) == LIMITE_SUGESTOES:
+        st.sidebar.caption(f"Os {len(sugestoes)} mais vendidos que correspondem à busca; refine para ver outros.")
+    elif busca.strip():
+        st.sidebar.caption(f"{len(sugestoes)} produto(s) encontrado(s), do mais ao menos vendido.")
+    elif len(dicionario) > len(sugestoes):
+        st.sidebar.caption(f"Os {len(sugestoes)} mais vendidos de {len(dicionario):,} produtos; busque para ver outros.".replace(",", "."))
+    return escolhidos
 
-# Carregar dados existentes ou inicializar DataFrame
-if "df_consolidado" not in st.session_state:
-    st.session_state.df_consolidado = carregar_dados_existentes()
+# ===== FRAGMENTOS DA PÁGINA =====
+# Cada seção é um fragmento: um widget dentro dela reexecuta apenas a própria
+# seção, com os mesmos argumentos da última execução completa da página.
 
-if uploaded_file is not None:
-    novo_df = processar_arquivo(uploaded_file)
-    
-    if novo_df is not None:
-        # Concatenar com dados existentes
-        if not st.session_state.df_consolidado.empty:
-            common_cols = list(set(st.session_state.df_consolidado.columns) & set(novo_df.columns))
-            st.session_state.df_consolidado = pd.concat([st.session_state.df_consolidado[common_cols], novo_df[common_cols]], ignore_index=True)
-        else:
-            st.session_state.df_consolidado = novo_df
-        
-        salvar_dados(st.session_state.df_consolidado)
-        st.rerun()
-
-df = st.session_state.df_consolidado
-
-if not df.empty:
-    # ===== DEFINIÇÃO DAS COLUNAS =====
-    COLUMN_DATA = 'data'
-    COLUMN_VALOR_TOTAL = 'valor total'
-    COLUMN_QUANTIDADE = 'quantidade'
-    COLUMN_TAXA = 'taxa'
-    COLUMN_RENDA_ESTIMADA = 'renda estimada'
-    COLUMN_SUBTOTAL_PRODUTO = 'subtotal do produto'
-    COLUMN_TAMANHO = 'tamanho'
-    COLUMN_PRODUTO = 'produto'
-    COLUMN_TIPO = 'tipo'
-    COLUMN_STATUS = 'status'
-    COLUMN_DEVOLUCAO = 'quantidade devolução'
-    COLUMN_UF = 'uf'
-    
-    # ===== PROCESSAMENTO DOS DADOS =====
-    
-    # Conversão de colunas numéricas
-    colunas_numericas = [COLUMN_VALOR_TOTAL, COLUMN_RENDA_ESTIMADA, COLUMN_SUBTOTAL_PRODUTO, COLUMN_TAXA, COLUMN_DEVOLUCAO]
-    for col in colunas_numericas:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-    
-    # Processamento de datas
-    if COLUMN_DATA in df.columns:
-        try:
-            df[COLUMN_DATA] = pd.to_datetime(df[COLUMN_DATA], format='%d/%m/%Y', errors='coerce')
-            df.dropna(subset=[COLUMN_DATA], inplace=True)
-            df['mês'] = df[COLUMN_DATA].dt.month.apply(lambda x: calendar.month_name[x].capitalize())
-            df['ano'] = df[COLUMN_DATA].dt.year
-        except Exception as e:
-            st.warning(f"⚠️ Não foi possível converter a coluna '{COLUMN_DATA}' para o formato de data.")
-    
+@st.fragment
+@perfil.medido("informacoes_gerais")
+def exibir_informacoes_gerais(total_registros, num_colunas, inicio_periodo, fim_periodo, tamanho_kb, memoria=None):
+    """
+    Exibe os cartões com as informações gerais do dataset. `memoria` é o
+    relatório da compactação dos dados em memória (None no motor DuckDB).
+    """
     # ===== INFORMAÇÕES GERAIS =====
     st.markdown('<div class="section-header">📋 Informações Gerais do Dataset</div>', unsafe_allow_html=True)
     
-    col_info1, col_info2, col_info3, col_info4 = st.columns(4)
+    col_info1, col_info2, col_info3, col_info4, col_info5 = st.columns(5)
     
     with col_info1:
         st.markdown(f"""
         <div class="metric-card">
             <h3>📊 Total de Registros</h3>
-            <h2 style="color: #667eea;">{df.shape[0]:,}</h2>
+            <h2 style="color: #667eea;">{total_registros:,}</h2>
         </div>
         """, unsafe_allow_html=True)
     
@@ -360,7 +541,7 @@ if not df.empty:
         st.markdown(f"""
         <div class="metric-card">
             <h3>📈 Total de Colunas</h3>
-            <h2 style="color: #667eea;">{df.shape[1]}</h2>
+            <h2 style="color: #667eea;">{num_colunas}</h2>
         </div>
         """, unsafe_allow_html=True)
     
@@ -369,130 +550,124 @@ if not df.empty:
         <div class="metric-card">
             <h3>📅 Período</h3>
             <h2 style="color: #667eea;">
-                {df[COLUMN_DATA].min().strftime('%m/%Y') if COLUMN_DATA in df.columns and pd.notna(df[COLUMN_DATA].min()) else 'N/A'} - 
-                {df[COLUMN_DATA].max().strftime("%m/%Y") if COLUMN_DATA in df.columns and pd.notna(df[COLUMN_DATA].max()) else 'N/A'}
+                {inicio_periodo.strftime('%m/%Y') if inicio_periodo is not None else 'N/A'} - 
+                {fim_periodo.strftime("%m/%Y") if fim_periodo is not None else 'N/A'}
             </h2>
         </div>
         """, unsafe_allow_html=True)
     
         with col_info4:
-            file_size_kb = uploaded_file.size / 1024 if uploaded_file else 0
             st.markdown(f"""
             <div class="metric-card">
                 <h3>💾 Tamanho do Arquivo</h3>
-                <h2 style="color: #667eea;">{file_size_kb:.1f} KB</h2>
+                <h2 style="color: #667eea;">{tamanho_kb:.1f} KB</h2>
             </div>
-            """, unsafe_allow_html=True) # Note: uploaded_file.size will only be available if a file was just uploaded
-    
-    # ===== SIDEBAR DE FILTROS =====
-    st.sidebar.markdown("## 🔍 Filtros Avançados")
-    st.sidebar.markdown("---")
-    
-    # Filtro de mês
-    if 'mês' in df.columns:
-        meses_en = ['January', 'February', 'March', 'April', 'May', 'June', 
-                   'July', 'August', 'September', 'October', 'November', 'December']
-        all_meses = sorted(df['mês'].unique(), key=lambda x: meses_en.index(x))
-        selected_mes = st.sidebar.selectbox("📅 Selecione o Mês:", ["Todos"] + all_meses)
-    else:
-        selected_mes = "Todos"
-    
-    # Filtro de tamanho
-    if COLUMN_TAMANHO in df.columns:
-        df[COLUMN_TAMANHO] = pd.to_numeric(df[COLUMN_TAMANHO], errors='coerce').astype('Int64')
-        df[COLUMN_TAMANHO] = df[COLUMN_TAMANHO].astype(str).str.replace('<NA>', 'NaN')
-        all_tamanhos = sorted(df[COLUMN_TAMANHO].unique())
-        selected_tamanhos = st.sidebar.multiselect("📏 Selecione os Tamanhos:", all_tamanhos, default=[])
-    else:
-        selected_tamanhos = []
-    
-    # Filtro de produto
-    if COLUMN_PRODUTO in df.columns:
-        df[COLUMN_PRODUTO] = df[COLUMN_PRODUTO].astype(str)
-        all_produtos = sorted(df[COLUMN_PRODUTO].unique())
-        selected_produtos = st.sidebar.multiselect("🛍️ Selecione os Produtos:", all_produtos, default=[])
-    else:
-        selected_produtos = []
-    
-    # Filtro de status
-    if COLUMN_STATUS in df.columns:
-        df[COLUMN_STATUS] = df[COLUMN_STATUS].astype(str)
-        all_status = sorted(df[COLUMN_STATUS].unique())
-        selected_status = st.sidebar.multiselect("📊 Selecione o Status:", all_status, default=[])
-    else:
-        selected_status = []
-    
-    # Aplicar filtros
-    df_filtrado = df.copy()
-    if selected_mes and selected_mes != "Todos":
-        df_filtrado = df_filtrado[df_filtrado["mês"] == selected_mes]
-    if selected_tamanhos:
-        df_filtrado = df_filtrado[df_filtrado[COLUMN_TAMANHO].isin(selected_tamanhos)]
-    if selected_produtos:
-        df_filtrado = df_filtrado[df_filtrado[COLUMN_PRODUTO].isin(selected_produtos)]
-    if selected_status:
-        df_filtrado = df_filtrado[df_filtrado[COLUMN_STATUS].isin(selected_status)]
-    
-    # Estatísticas dos filtros
-    st.sidebar.markdown("---")
-    st.sidebar.markdown(f"""
-    <div class="stats-container">
-        <h4>📊 Dados Filtrados</h4>
-        <p><strong>Registros:</strong> {df_filtrado.shape[0]:,}</p>
-        <p><strong>% do Total:</strong> {((df_filtrado.shape[0]/df.shape[0]*100) if df.shape[0] > 0 else 0):.1f}%</p>
-    </div>
-    """, unsafe_allow_html=True)
+            """, unsafe_allow_html=True)
     
+    if memoria is not None:
+        with col_info5:
+            st.markdown(f"""
+            <div class="metric-card">
+                <h3>🧠 Memória</h3>
+                <h2 style="color: #667eea;">{formatar_bytes(memoria["bytes_depois"].sum())}</h2>
+                <p>antes da compactação: {formatar_bytes(memoria["bytes_antes"].sum())}</p>
+            </div>
+            """, unsafe_allow_html=True)
+        
+        with st.expander("🧠 Memória por coluna"):
+            tabela_memoria = pd.DataFrame({
+                "Coluna": memoria["coluna"],
+                "Tipo (antes)": memoria["tipo_antes"],
+                "Tipo (depois)": memoria["tipo_depois"],
+                "Antes": memoria["bytes_antes"].map(formatar_bytes),
+                "Depois": memoria["bytes_depois"].map(formatar_bytes),
+                "Redução": (1 - memoria["bytes_depois"] / memoria["bytes_antes"].where(memoria["bytes_antes"] > 0)).map(
+                    lambda fracao: f"{fracao:.0%}" if pd.notna(fracao) else "-"
+                ),
+            })
+            st.dataframe(tabela_memoria, hide_index=True, use_container_width=True)
+
+@st.fragment
+@perfil.medido("kpis")
+def exibir_kpis(totais, totais_gerais):
+    """
+    Exibe os KPIs das seleções, com o percentual sobre o total geral.
+    """
     # ===== PAINEL DE KPIs =====
     st.markdown('<div class="section-header">💰 Indicadores Principais (KPIs)</div>', unsafe_allow_html=True)
     
     col1, col2, col3, col4, col5 = st.columns(5)
     
     with col1:
-        if COLUMN_VALOR_TOTAL in df_filtrado.columns:
-            valor_total = df_filtrado[COLUMN_VALOR_TOTAL].sum()
+        if COLUMN_VALOR_TOTAL in totais:
+            valor_total = totais[COLUMN_VALOR_TOTAL]
             st.metric(
                 "💵 Valor Total",
                 f"R$ {formatar_numero(valor_total)}",
-                delta=f"{(valor_total/df[COLUMN_VALOR_TOTAL].sum()*100):.1f}% do total"
+                delta=f"{(valor_total/totais_gerais[COLUMN_VALOR_TOTAL]*100):.1f}% do total"
             )
     
     with col2:
-        if COLUMN_QUANTIDADE in df_filtrado.columns:
-            qtd_total = int(df_filtrado[COLUMN_QUANTIDADE].sum())
+        if COLUMN_QUANTIDADE in totais:
+            qtd_total = int(totais[COLUMN_QUANTIDADE])
             st.metric(
                 "📦 Quantidade Total",
                 f"{qtd_total:,}",
-                delta=f"{(qtd_total/df[COLUMN_QUANTIDADE].sum()*100):.1f}% do total"
+                delta=f"{(qtd_total/totais_gerais[COLUMN_QUANTIDADE]*100):.1f}% do total"
             )
     
     with col3:
-        if COLUMN_TAXA in df_filtrado.columns:
-            taxa_total = df_filtrado[COLUMN_TAXA].sum()
+        if COLUMN_TAXA in totais:
+            taxa_total = totais[COLUMN_TAXA]
             st.metric(
                 "💳 Soma da Taxa",
                 formatar_numero(taxa_total),
-                delta=f"{(taxa_total/df[COLUMN_TAXA].sum()*100):.1f}% do total"
+                delta=f"{(taxa_total/totais_gerais[COLUMN_TAXA]*100):.1f}% do total"
             )
     
     with col4:
-        if COLUMN_RENDA_ESTIMADA in df_filtrado.columns:
-            renda_total = df_filtrado[COLUMN_RENDA_ESTIMADA].sum()
+        if COLUMN_RENDA_ESTIMADA in totais:
+            renda_total = totais[COLUMN_RENDA_ESTIMADA]
             st.metric(
                 "💰 Renda Estimada",
                 f"R$ {formatar_numero(renda_total)}",
-                delta=f"{(renda_total/df[COLUMN_RENDA_ESTIMADA].sum()*100):.1f}% do total"
+                delta=f"{(renda_total/totais_gerais[COLUMN_RENDA_ESTIMADA]*100):.1f}% do total"
             )
     
     with col5:
-        if COLUMN_SUBTOTAL_PRODUTO in df_filtrado.columns:
-            subtotal = df_filtrado[COLUMN_SUBTOTAL_PRODUTO].sum()
+        if COLUMN_SUBTOTAL_PRODUTO in totais:
+            subtotal = totais[COLUMN_SUBTOTAL_PRODUTO]
             st.metric(
                 "🛒 Subtotal do Produto",
                 f"R$ {formatar_numero(subtotal)}",
-                delta=f"{(subtotal/df[COLUMN_SUBTOTAL_PRODUTO].sum()*100):.1f}% do total"
+                delta=f"{(subtotal/totais_gerais[COLUMN_SUBTOTAL_PRODUTO]*100):.1f}% do total"
             )
-    
+
+def grafico_em_cache(nome, versao, selecoes, criar):
+    """
+    Retorna a figura `nome` das seleções, como dicionário, criando-a apenas
+    na primeira vez para a versão dos dados e os filtros (None se não houver).
+    """
+    @perfil.medido("figuras")
+    def construir():
+        figura = criar()
+        return figura.to_dict() if figura else None
+    return memorizar_filtro(nome, versao, selecoes, construir, DATA_DIR)
+
+def exibir_grafico(figura):
+    """
+    Envia uma figura ao navegador (a serialização do Plotly é medida no perfil).
+    """
+    with perfil.secao("plotly_chart"):
+        st.plotly_chart(figura, use_container_width=True)
+
+@st.fragment
+@perfil.medido("graficos")
+def exibir_graficos(agregados, versao, selecoes, colunas):
+    """
+    Exibe os gráficos a partir das agregações da página. As figuras ficam no
+    cache por filtro e são reaproveitadas ao voltar a filtros já vistos.
+    """
     # ===== ANÁLISES VISUAIS =====
     st.markdown('<div class="section-header">📊 Análises Visuais Interativas</div>', unsafe_allow_html=True)
     
@@ -504,69 +679,103 @@ if not df.empty:
 
 
 
-        if 'mês' in df_filtrado.columns and COLUMN_VALOR_TOTAL in df_filtrado.columns:
-            fig_mes = criar_grafico_barras(df_filtrado, 'mês', COLUMN_VALOR_TOTAL, "Vendas por Mês")
+        if "vendas_mes" in agregados:
+            fig_mes = grafico_em_cache("grafico_vendas_mes", versao, selecoes, lambda: criar_grafico_barras(
+                agregados["vendas_mes"], 'mês', COLUMN_VALOR_TOTAL, "Vendas por Mês"
+            ))
             if fig_mes:
-                st.plotly_chart(fig_mes, use_container_width=True)
+                exibir_grafico(fig_mes)
     
     with col_graf2:
         st.subheader("🥧 Distribuição por Status")
-        if COLUMN_STATUS in df_filtrado.columns:
-            fig_status = criar_grafico_pizza(df_filtrado, COLUMN_STATUS, "Distribuição por Status")
+        if "linhas_status" in agregados:
+            fig_status = grafico_em_cache("grafico_status", versao, selecoes, lambda: criar_grafico_pizza(
+                agregados["linhas_status"], COLUMN_STATUS, "Distribuição por Status", coluna_contagem=COLUNA_LINHAS
+            ))
             if fig_status:
-                st.plotly_chart(fig_status, use_container_width=True)
+                exibir_grafico(fig_status)
     
     # Gráfico de devolução
     st.subheader("📉 Análise de Devoluções por Tamanho")
-    if COLUMN_TAMANHO in df_filtrado.columns and COLUMN_DEVOLUCAO in df_filtrado.columns:
-        fig_devolucao = criar_grafico_barras(df_filtrado, COLUMN_TAMANHO, COLUMN_DEVOLUCAO, "Devoluções por Tamanho")
+    if COLUMN_TAMANHO in colunas and COLUMN_DEVOLUCAO in colunas:
+        fig_devolucao = grafico_em_cache("grafico_devolucoes", versao, selecoes, lambda: criar_grafico_barras(
+            agregados["por_tamanho"][[COLUMN_TAMANHO, COLUMN_DEVOLUCAO]], COLUMN_TAMANHO, COLUMN_DEVOLUCAO, "Devoluções por Tamanho"
+        ))
         if fig_devolucao:
-            st.plotly_chart(fig_devolucao, use_container_width=True)
-    
+            exibir_grafico(fig_devolucao)
+
+@st.fragment
+@perfil.medido("tabelas")
+def exibir_tabelas(agregados, motor, versao, selecoes, colunas, aproximador=None):
+    """
+    Exibe as tabelas analíticas. Apenas a aba aberta é calculada. Com o
+    `aproximador` (modo aproximado), o resumo estatístico vem dos esboços.
+    """
     # ===== TABELAS ANALÍTICAS =====
     st.markdown('<div class="section-header">📋 Tabelas Analíticas Detalhadas</div>', unsafe_allow_html=True)
     
-    # Abas para organizar as tabelas
-    tab1, tab2, tab3, tab4 = st.tabs(["📦 Por Tamanho", "🗓️ Por Mês", "🌍 Por UF", "📊 Resumo Geral"])
+    # Abas para organizar as tabelas; só a aba aberta calcula suas tabelas
+    tab1, tab2, tab3, tab4 = st.tabs(
+        ["📦 Por Tamanho", "🗓️ Por Mês", "🌍 Por UF", "📊 Resumo Geral"],
+        key="abas_analiticas",
+        on_change="rerun"
+    )
     
     with tab1:
-        col_tab1_1, col_tab1_2 = st.columns(2)
-        
-        with col_tab1_1:
-            st.subheader("Quantidade por Tamanho")
-            if COLUMN_TAMANHO in df_filtrado.columns and COLUMN_QUANTIDADE in df_filtrado.columns:
-                tabela_tamanho = df_filtrado.groupby(COLUMN_TAMANHO)[COLUMN_QUANTIDADE].sum().reset_index()
-                tabela_tamanho = tabela_tamanho.sort_values(COLUMN_QUANTIDADE, ascending=False)
-                st.dataframe(tabela_tamanho, hide_index=True, use_container_width=True)
-        
-        with col_tab1_2:
-            st.subheader("Valor Total por Tamanho")
-            if COLUMN_TAMANHO in df_filtrado.columns and COLUMN_VALOR_TOTAL in df_filtrado.columns:
-                tabela_tamanho_valor = df_filtrado.groupby(COLUMN_TAMANHO)[COLUMN_VALOR_TOTAL].sum().reset_index()
-                tabela_tamanho_valor = tabela_tamanho_valor.sort_values(COLUMN_VALOR_TOTAL, ascending=False)
-                st.dataframe(tabela_tamanho_valor, hide_index=True, use_container_width=True)
+        if tab1.open:
+            col_tab1_1, col_tab1_2 = st.columns(2)
+            
+            with col_tab1_1:
+                st.subheader("Quantidade por Tamanho")
+                if COLUMN_TAMANHO in colunas and COLUMN_QUANTIDADE in colunas:
+                    tabela_tamanho = agregados["por_tamanho"][[COLUMN_TAMANHO, COLUMN_QUANTIDADE]]
+                    tabela_tamanho = tabela_tamanho.sort_values(COLUMN_QUANTIDADE, ascending=False)
+                    st.dataframe(tabela_tamanho, hide_index=True, use_container_width=True)
+            
+            with col_tab1_2:
+                st.subheader("Valor Total por Tamanho")
+                if COLUMN_TAMANHO in colunas and COLUMN_VALOR_TOTAL in colunas:
+                    tabela_tamanho_valor = agregados["por_tamanho"][[COLUMN_TAMANHO, COLUMN_VALOR_TOTAL]]
+                    tabela_tamanho_valor = tabela_tamanho_valor.sort_values(COLUMN_VALOR_TOTAL, ascending=False)
+                    st.dataframe(tabela_tamanho_valor, hide_index=True, use_container_width=True)
     
     with tab2:
-        st.subheader("Análise Temporal - Quantidade por Mês e Tamanho")
-        if 'mês' in df_filtrado.columns and COLUMN_TAMANHO in df_filtrado.columns and COLUMN_QUANTIDADE in df_filtrado.columns:
-            tabela_mes_tamanho = df_filtrado.groupby(['mês', COLUMN_TAMANHO])[COLUMN_QUANTIDADE].sum().reset_index()
-            tabela_pivot = tabela_mes_tamanho.pivot(index='mês', columns=COLUMN_TAMANHO, values=COLUMN_QUANTIDADE).fillna(0)
-            st.dataframe(tabela_pivot, use_container_width=True)
+        if tab2.open:
+            st.subheader("Análise Temporal - Quantidade por Mês e Tamanho")
+            if "mes_tamanho" in agregados:
+                tabela_mes_tamanho = agregados["mes_tamanho"]
+                tabela_pivot = tabela_mes_tamanho.pivot(index='mês', columns=COLUMN_TAMANHO, values=COLUMN_QUANTIDADE).fillna(0)
+                st.dataframe(tabela_pivot, use_container_width=True)
     
     with tab3:
-        st.subheader("Distribuição Geográfica - Produtos por UF")
-        if COLUMN_UF in df_filtrado.columns and COLUMN_PRODUTO in df_filtrado.columns and COLUMN_QUANTIDADE in df_filtrado.columns:
-            tabela_uf_produto = df_filtrado.groupby([COLUMN_UF, COLUMN_PRODUTO])[COLUMN_QUANTIDADE].sum().reset_index()
-            tabela_uf_produto = tabela_uf_produto.sort_values(COLUMN_QUANTIDADE, ascending=False)
-            st.dataframe(tabela_uf_produto, hide_index=True, use_container_width=True)
+        if tab3.open:
+            st.subheader("Distribuição Geográfica - Produtos por UF")
+            if "uf_produto" in agregados:
+                tabela_uf_produto = agregados["uf_produto"]
+                tabela_uf_produto = tabela_uf_produto.sort_values(COLUMN_QUANTIDADE, ascending=False)
+                st.dataframe(tabela_uf_produto, hide_index=True, use_container_width=True)
     
     with tab4:
-        st.subheader("Resumo Estatístico")
-        colunas_numericas_existentes = [col for col in colunas_numericas if col in df_filtrado.columns]
-        if colunas_numericas_existentes:
-            resumo_stats = df_filtrado[colunas_numericas_existentes].describe()
-            st.dataframe(resumo_stats, use_container_width=True)
-    
+        if tab4.open:
+            st.subheader("Resumo Estatístico")
+            colunas_numericas_existentes = [col for col in colunas_numericas if col in colunas]
+            if aproximador is not None:
+                exibir_resumo_aproximado(aproximador, versao, selecoes, colunas_numericas_existentes, colunas)
+            elif colunas_numericas_existentes:
+                resumo_stats = memorizar_filtro(
+                    "resumo", versao, selecoes, lambda: motor.resumo(selecoes, colunas_numericas_existentes), DATA_DIR
+                )
+                st.dataframe(resumo_stats, use_container_width=True)
+
+@st.fragment
+@perfil.medido("exploracao")
+def exibir_exploracao(motor, versao, selecoes, colunas, aproximador=None):
+    """
+    Exibe a exploração personalizada dos dados e o download. A tabela é
+    paginada no motor: só a página atual é lida, na ordem escolhida (veja
+    `pagina`). Os controles reexecutam apenas esta seção. Com o
+    `aproximador` (modo aproximado), a prévia é uma amostra estratificada.
+    """
     # ===== VISUALIZAÇÃO PERSONALIZADA =====
     st.markdown('<div class="section-header">🔍 Exploração Personalizada dos Dados</div>', unsafe_allow_html=True)
     
@@ -574,36 +783,334 @@ if not df.empty:
     
     with col_custom2:
         st.subheader("Configurações de Visualização")
-        all_columns = df.columns.tolist()
+        all_columns = colunas
         selected_columns = st.multiselect(
             "Escolha as colunas para exibir:",
             all_columns,
             default=all_columns[:10] if len(all_columns) > 10 else all_columns
         )
         
-        num_rows = st.slider("Número de linhas para exibir:", 5, 100, 20)
+        ordenar_por = st.selectbox(
+            "Ordenar por:",
+            [None] + (selected_columns or all_columns),
+            format_func=lambda coluna: "Ordem de gravação" if coluna is None else coluna,
+            disabled=aproximador is not None,
+        )
+        decrescente = st.toggle("Ordem decrescente", disabled=aproximador is not None or ordenar_por is None)
+        num_rows = st.selectbox("Linhas por página:", TAMANHOS_PAGINA, index=1)
+        
+        # Opção de download: gerado em blocos no disco só no clique e
+        # reaproveitado enquanto os dados, os filtros e as colunas não mudarem.
+        # O Streamlit não transmite o arquivo aos poucos: ele é lido de uma vez
+        # para a memória do servidor, então seleções grandes vão pela linha de comando
+        formato_exportacao = st.selectbox(
+            "Formato do download:",
+            list(FORMATOS_EXPORTACAO),
+            format_func=lambda formato: FORMATOS_EXPORTACAO[formato]["rotulo"]
+        )
+        colunas_exportacao = selected_columns or all_columns
+        total_exportacao = memorizar_filtro("totais", versao, selecoes, lambda: motor.totais(selecoes), DATA_DIR)
+        linhas_exportacao = int(total_exportacao.get(COLUNA_LINHAS, 0))
+        grande_demais = linhas_exportacao * len(colunas_exportacao) > LIMITE_CELULAS_DOWNLOAD
+        
+        def gerar_exportacao():
+            caminho = exportar(
+                motor, [os.path.abspath(DATA_DIR), versao], selecoes, colunas_exportacao, formato_exportacao
+            )
+            with open(caminho, "rb") as arquivo:
+                return arquivo.read()
         
-        # Opção de download
-        if st.button("📥 Preparar Download dos Dados Filtrados"):
-            csv = df_filtrado.to_csv(index=False)
-            st.download_button(
-                label="⬇️ Baixar CSV",
-                data=csv,
-                file_name=f"dados_filtrados_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv"
+        st.download_button(
+            label=f"⬇️ Baixar {FORMATOS_EXPORTACAO[formato_exportacao]['rotulo']}",
+            data=gerar_exportacao,
+            file_name=f"dados_filtrados_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.{formato_exportacao}",
+            mime=FORMATOS_EXPORTACAO[formato_exportacao]["mime"],
+            on_click="ignore",
+            disabled=grande_demais,
+        )
+        if grande_demais:
+            st.caption(
+                f"A seleção tem {linhas_exportacao:,} linhas e {len(colunas_exportacao)} colunas, acima do limite "
+                f"de {LIMITE_CELULAS_DOWNLOAD:,} células do download pelo navegador. Exporte pela linha de "
+                f"comando: `python -m vendas exportar --formato {formato_exportacao} --saida arquivo.{formato_exportacao}`, "
+                "com os filtros em `--filtro coluna=valor`."
             )
     
     with col_custom1:
         st.subheader("Dados Selecionados")
-        if selected_columns:
+        if selected_columns and aproximador is not None:
+            st.dataframe(aproximador.linhas(selecoes, selected_columns, num_rows), hide_index=True, use_container_width=True)
+            st.caption("≈ Amostra estratificada por mês: linhas sorteadas em cada mês em proporção às linhas selecionadas nele.")
+        elif selected_columns:
+            total = memorizar_filtro("totais", versao, selecoes, lambda: motor.totais(selecoes), DATA_DIR)
+            total_linhas = int(total.get(COLUNA_LINHAS, 0))
+            paginas = max(math.ceil(total_linhas / num_rows), 1)
+            
+            # Mudar os filtros, a ordem ou o tamanho da página volta à primeira página
+            consulta = (versao, normalizar_selecoes(selecoes), ordenar_por, decrescente, num_rows)
+            if st.session_state.get("consulta_exploracao") != consulta:
+                st.session_state.consulta_exploracao = consulta
+                st.session_state.pagina_exploracao = 1
+            st.session_state.pagina_exploracao = min(st.session_state.get("pagina_exploracao", 1), paginas)
+            
+            pagina = st.number_input("Página:", min_value=1, max_value=paginas, step=1, key="pagina_exploracao")
+            inicio = (pagina - 1) * num_rows
             st.dataframe(
-                df_filtrado[selected_columns].head(num_rows),
+                motor.pagina(selecoes, selected_columns, inicio, num_rows, ordenar_por, decrescente),
                 hide_index=True,
                 use_container_width=True
             )
+            if total_linhas:
+                st.caption(
+                    f"Linhas {inicio + 1:,} a {min(inicio + num_rows, total_linhas):,} de {total_linhas:,} "
+                    f"(página {pagina:,} de {paginas:,})".replace(",", ".")
+                )
         else:
             st.warning("⚠️ Por favor, selecione pelo menos uma coluna para visualizar.")
 
+def exibir_perfil(resumo):
+    """
+    Exibe na barra lateral o tempo de cada seção da última execução completa,
+    a memória dos DataFrames e o uso do cache por filtro.
+    """
+    with st.sidebar.expander("⏱️ Perfil de desempenho"):
+        st.caption(f"Execução completa em {resumo['total_ms']:,.0f} ms (pico de memória: {resumo['pico_memoria_mb']} MB)")
+        if resumo.get("primeira_execucao"):
+            st.caption(f"Primeira execução do processo: {resumo['desde_inicio_ms']:,.0f} ms desde a inicialização")
+        st.dataframe(
+            pd.DataFrame([
+                {"seção": nome, "ms": ms, "% do total": ms / resumo["total_ms"] * 100}
+                for nome, ms in resumo["secoes_ms"].items()
+            ]),
+            hide_index=True,
+            column_config={"ms": st.column_config.NumberColumn(format="%.1f"),
+                           "% do total": st.column_config.NumberColumn(format="%.1f%%")},
+        )
+        if resumo["memoria_bytes"]:
+            st.markdown("**Memória**")
+            for nome, tamanho in resumo["memoria_bytes"].items():
+                st.markdown(f"- {nome}: {tamanho / 1024:,.1f} KB" if tamanho < 1024 * 1024 else f"- {nome}: {tamanho / 1024 / 1024:,.1f} MB")
+        cache = resumo["cache"]
+        taxa = cache["taxa_acertos_execucao"]
+        st.markdown("**Cache por filtro**")
+        st.markdown(
+            f"- Nesta execução: {cache['acertos_execucao']} acertos, {cache['falhas_execucao']} falhas"
+            + (f" ({taxa:.0%})" if taxa is not None else "")
+        )
+        st.markdown(
+            f"- Total: {cache['taxa_acertos']:.0%} de acertos, {cache['itens']} itens, "
+            f"{cache['bytes'] / 1024 / 1024:,.1f} de {cache['limite_bytes'] / 1024 / 1024:,.0f} MB, "
+            f"{cache['despejos']} despejos"
+        )
+
+# ===== INTERFACE PRINCIPAL =====
+
+# Header principal
+st.markdown("""
+<div class="main-header">
+    <h1>📊 Dashboard de Análise de Vendas</h1>
+    <p>Transforme seus dados em insights poderosos com visualizações interativas</p>
+</div>
+""", unsafe_allow_html=True)
+
+# ===== UPLOAD DO ARQUIVO =====
+# Em modo somente leitura, a ingestão é feita fora do servidor pela linha de
+# comando (python -m vendas ingerir ...) e a página apenas consulta os dados
+if SOMENTE_LEITURA:
+    uploaded_files = []
+    st.info(f"ℹ️ Os dados são atualizados fora do dashboard (python -m vendas ingerir). Armazenamento: {DATA_DIR}")
+else:
+    st.markdown('<div class="section-header">📁 Upload do Arquivo de Dados</div>', unsafe_allow_html=True)
+    
+    col_upload1, col_upload2, col_upload3 = st.columns([1, 2, 1])
+    
+    with col_upload2:
+        st.markdown("""
+        <div class="upload-section">
+            <h3>📤 Faça o upload do seu arquivo</h3>
+            <p>Suportamos arquivos CSV, Excel (.xlsx) e Excel antigo (.xls)</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    uploaded_files = st.file_uploader(
+        "Escolha um ou mais arquivos",
+        type=["csv", "xlsx", "xls"],
+        accept_multiple_files=True,
+        help="Arraste e solte seus arquivos aqui ou clique para selecionar"
+    )
+
+
+if "tarefas" not in st.session_state:
+    st.session_state.tarefas = []
+
+# Motor de consulta da versão atual dos dados, compartilhado entre as sessões.
+# Enquanto uma tarefa em segundo plano prepara uma nova versão, as sessões
+# seguem com a versão já carregada; a tarefa publica a nova ao terminar.
+# As tarefas desta sessão que já terminaram são recolhidas antes da escolha
+with perfil.secao("motor"):
+    migrar_dados_legados()
+    coletar_tarefas_concluidas()
+    versao_dados = geracao_atual(DATA_DIR)
+    em_cache = versao_em_cache("motor", DATA_DIR)
+    if em_cache is not None and FILA_TAREFAS.ativas(DATA_DIR):
+        versao_dados = em_cache[0]
+    motor = obter_derivado("motor", versao_dados, lambda: criar_motor(versao_dados), DATA_DIR) if existe_armazem(DATA_DIR) else None
+if motor is not None:
+    perfil.contexto.update(motor=motor.nome, versao=versao_dados)
+    if isinstance(motor, MotorPandas):
+        perfil.registrar_memoria("dados", motor.df)
+        perfil.registrar_memoria("cubo", motor.cubo)
+
+if "arquivos_processados" not in st.session_state:
+    st.session_state.arquivos_processados = set()
+
+# O uploader mantém os arquivos entre reruns: cada upload é tratado uma única vez
+novos_arquivos = [
+    arquivo for arquivo in uploaded_files or []
+    if arquivo.file_id not in st.session_state.arquivos_processados
+]
+
+# Arquivos Excel com várias planilhas aguardam a escolha da planilha
+prontos, aguardando = [], []
+for arquivo in novos_arquivos:
+    planilhas, sugerida = planilhas_do_arquivo(arquivo)
+    if len(planilhas) > 1:
+        aguardando.append((arquivo, planilhas, sugerida))
+    else:
+        prontos.append((arquivo, None))
+
+if aguardando:
+    with st.form("escolha_planilhas"):
+        st.markdown("#### 📑 Escolha a planilha de cada arquivo Excel")
+        for arquivo, planilhas, sugerida in aguardando:
+            st.selectbox(
+                f"Planilha de {arquivo.name}",
+                planilhas,
+                index=planilhas.index(sugerida),
+                key=f"planilha_{arquivo.file_id}",
+            )
+        if st.form_submit_button("📥 Ingerir planilhas"):
+            prontos += [
+                (arquivo, st.session_state[f"planilha_{arquivo.file_id}"])
+                for arquivo, _, _ in aguardando
+            ]
+
+# A ingestão (gravação, compactação e preparação da nova versão) vai para a
+# fila de tarefas em segundo plano; a página segue respondendo enquanto isso
+if prontos:
+    st.session_state.arquivos_processados.update(arquivo.file_id for arquivo, _ in prontos)
+    tarefa = submeter_ingestao(
+        [(arquivo.getvalue(), arquivo.name, planilha) for arquivo, planilha in prontos], DATA_DIR
+    )
+    st.session_state.tarefas.append(tarefa.id)
+
+coletar_tarefas_concluidas()
+if st.session_state.tarefas or FILA_TAREFAS.ativas(DATA_DIR):
+    exibir_andamento_tarefas()
+elif geracao_atual(DATA_DIR) != versao_dados:
+    # Uma tarefa terminou depois da escolha da versão: sem tarefas ativas,
+    # o fragmento de andamento não reexecuta a página, então recomeça aqui
+    st.rerun()
+
+for erro in st.session_state.pop("erros_tarefas", []):
+    st.sidebar.error(f"❌ {erro}")
+if "ultima_ingestao" in st.session_state:
+    exibir_resumo_upload(st.session_state.pop("ultima_ingestao"))
+
+total_registros = motor.total_linhas() if motor is not None else 0
+
+if total_registros > 0:
+    colunas = motor.colunas()
+    inicio_periodo, fim_periodo = motor.periodo()
+    
+    exibir_informacoes_gerais(
+        total_registros,
+        len(colunas),
+        inicio_periodo,
+        fim_periodo,
+        sum(arquivo.size for arquivo in uploaded_files or []) / 1024,
+        motor.memoria,
+    )
+    
+    # ===== SIDEBAR DE FILTROS =====
+    st.sidebar.markdown("## 🔍 Filtros Avançados")
+    st.sidebar.markdown("---")
+    
+    # Filtro de período: o intervalo de datas é uma fatia do índice ordenado pela data
+    if inicio_periodo is not None:
+        selected_periodo = escolher_periodo(inicio_periodo.date(), fim_periodo.date())
+    else:
+        selected_periodo = []
+    
+    # Filtro de tamanho
+    if COLUMN_TAMANHO in colunas:
+        all_tamanhos = motor.valores(COLUMN_TAMANHO)
+        selected_tamanhos = st.sidebar.multiselect("📏 Selecione os Tamanhos:", all_tamanhos, default=[])
+    else:
+        selected_tamanhos = []
+    
+    # Filtro de produto: busca no dicionário de produtos, mantido na ingestão
+    if COLUMN_PRODUTO in colunas:
+        dicionario_produtos = obter_derivado(
+            "produtos", versao_dados, lambda: criar_dicionario_produtos(DATA_DIR), DATA_DIR
+        )
+        selected_produtos = escolher_produtos(dicionario_produtos)
+    else:
+        selected_produtos = []
+    
+    # Filtro de status
+    if COLUMN_STATUS in colunas:
+        all_status = motor.valores(COLUMN_STATUS)
+        selected_status = st.sidebar.multiselect("📊 Selecione o Status:", all_status, default=[])
+    else:
+        selected_status = []
+    
+    # Modo aproximado: resumo estatístico, contagens e prévia pelos esboços
+    # e amostras mantidos na ingestão, sem varrer as linhas selecionadas
+    modo_aproximado = st.sidebar.toggle(
+        "≈ Modo aproximado",
+        key="modo_aproximado",
+        help="Resumo estatístico, valores distintos, mais vendidos e prévia estimados, com margem de erro."
+    )
+    
+    selecoes = {
+        COLUMN_DATA: selected_periodo,
+        COLUMN_TAMANHO: selected_tamanhos,
+        COLUMN_PRODUTO: selected_produtos,
+        COLUMN_STATUS: selected_status,
+    }
+    
+    # Agregações da página: uma única consulta agrupada pela união das chaves,
+    # da qual saem os KPIs, os gráficos e as tabelas. O resultado fica no cache
+    # por filtro: voltar a uma combinação de filtros já vista não consulta o motor
+    with perfil.secao("agregacoes"):
+        plano = plano_da_pagina(colunas)
+        agregados = memorizar_filtro("agregados", versao_dados, selecoes, lambda: plano.executar(motor, selecoes), DATA_DIR)
+        
+        # Totais das seleções e do conjunto completo (para o "% do total")
+        totais = agregados["totais"]
+        totais_gerais = memorizar_filtro("totais", versao_dados, {}, lambda: motor.totais({}), DATA_DIR)
+    
+    aproximador = None
+    if modo_aproximado:
+        with perfil.secao("aproximador"):
+            aproximador = obter_derivado("aproximador", versao_dados, lambda: criar_aproximador(DATA_DIR), DATA_DIR)
+    
+    # Estatísticas dos filtros
+    st.sidebar.markdown("---")
+    st.sidebar.markdown(f"""
+    <div class="stats-container">
+        <h4>📊 Dados Filtrados</h4>
+        <p><strong>Registros:</strong> {int(totais.get(COLUNA_LINHAS, 0)):,}</p>
+        <p><strong>% do Total:</strong> {(totais.get(COLUNA_LINHAS, 0)/total_registros*100):.1f}%</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    exibir_kpis(totais, totais_gerais)
+    exibir_graficos(agregados, versao_dados, selecoes, colunas)
+    exibir_tabelas(agregados, motor, versao_dados, selecoes, colunas, aproximador)
+    exibir_exploracao(motor, versao_dados, selecoes, colunas, aproximador)
+
 else:
     # Mensagem quando não há arquivo carregado
     st.markdown("""
@@ -623,7 +1130,7 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-
-
-
-
+# ===== PERFIL DE DESEMPENHO =====
+resumo_perfil = perfil.concluir()
+if resumo_perfil is not None:
+    exibir_perfil(resumo_perfil)
@@ -0,0 +1,43 @@
+"""
+Utilitários comuns dos testes: exportações CSV pequenas no formato real
+(datas dd/mm/aaaa e decimais com vírgula) e um armazenamento temporário.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CABECALHO = "Data,Produto,Tamanho,Tipo,Status,UF,Quantidade,Valor Total"
+
+
+def ingerir(raiz, *caminhos):
+    """
+    Ingere os arquivos pela mesma função da linha de comando. Retorna, por
+    arquivo, o registro da ingestão ou a situação (ex.: já ingerido).
+    """
+    from vendas.cli import SITUACAO_INGERIDO, ingerir_caminhos
+
+    resumo = ingerir_caminhos(list(caminhos), raiz)
+    return [item["registro"] if item["situacao"] == SITUACAO_INGERIDO else item["situacao"] for item in resumo]
+
+
+def escrever_csv(caminho, linhas, sufixo=""):
+    """
+    Grava uma exportação com o cabeçalho padrão e as linhas informadas
+    (texto já separado por vírgulas). `sufixo` é acrescentado ao final do
+    arquivo, para gerar um conteúdo diferente com as mesmas linhas.
+    """
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        arquivo.write("\n".join([CABECALHO, *linhas]) + "\n" + sufixo)
+    return str(caminho)
+
+
+@pytest.fixture
+def raiz(tmp_path):
+    """
+    Diretório de um armazenamento vazio.
+    """
+    return str(tmp_path / "dados")
@@ -0,0 +1,28 @@
+from conftest import escrever_csv, ingerir
+from vendas.armazenamento import ler_manifesto, listar_arquivos
+from vendas.compactacao import compactar
+from vendas.consulta import criar_motor
+
+
+def _ordenadas(df):
+    return df.astype(str).sort_values(list(df.columns)).reset_index(drop=True)
+
+
+def test_compactar_mantem_linhas_e_geracao(tmp_path, raiz):
+    for numero in range(4):
+        linhas = [f'{dia:02d}/05/2024,Camisa,40,X,Concluído,MG,{numero + 1},"{dia},50"' for dia in range(1, 6)]
+        ingerir(raiz, escrever_csv(tmp_path / f"{numero}.csv", linhas))
+    ingerir(raiz, escrever_csv(tmp_path / "junho.csv", ['01/06/2024,Saia,38,X,Concluído,RJ,1,"10,00"']))
+    manifesto = ler_manifesto(raiz)
+    antes = criar_motor(raiz, "pandas").selecionadas({})
+    assert len(listar_arquivos(raiz)) == 5
+
+    assert compactar(raiz, minimo=4) == {"particoes": 1, "arquivos": 4}
+    assert len(listar_arquivos(raiz)) == 2
+    assert ler_manifesto(raiz) == manifesto
+    depois = criar_motor(raiz, "pandas").selecionadas({})
+    assert depois.shape == antes.shape == (21, antes.shape[1])
+    assert _ordenadas(depois[antes.columns]).equals(_ordenadas(antes))
+
+    # Nada mais a compactar
+    assert compactar(raiz, minimo=4) == {"particoes": 0, "arquivos": 0}
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+from conftest import escrever_csv, ingerir
+from vendas import diario
+from vendas.armazenamento import ler_manifesto, listar_arquivos
+from vendas.consulta import criar_motor
+from vendas.diario import ARQUIVO_DIARIO, DIR_PENDENTES, Transacao, recuperar, trava_escrita
+
+LINHAS = [
+    '25/05/2024,Camisa,40,X,Concluído,MG,3,"4,80"',
+    '18/06/2024,Calça,36,X,Concluído,SP,1,"65,63"',
+]
+
+
+def test_transacao_confirmada_e_concluida_pela_proxima_escrita(tmp_path, raiz, monkeypatch):
+    ingerir(raiz, escrever_csv(tmp_path / "a.csv", LINHAS[:1]))
+    geracao = ler_manifesto(raiz)["geracao"]
+    arquivos = listar_arquivos(raiz)
+
+    # O processo "morre" logo depois de gravar o diário
+    def falhar(*args):
+        raise RuntimeError("queda do processo")
+
+    monkeypatch.setattr(diario, "_aplicar", falhar)
+    assert ingerir(raiz, escrever_csv(tmp_path / "b.csv", LINHAS)) == ["erro"]
+    assert os.path.exists(os.path.join(raiz, ARQUIVO_DIARIO))
+    assert ler_manifesto(raiz)["geracao"] == geracao
+    assert listar_arquivos(raiz) == arquivos
+
+    monkeypatch.undo()
+    with trava_escrita(raiz):
+        pass
+    assert not os.path.exists(os.path.join(raiz, ARQUIVO_DIARIO))
+    assert not os.path.exists(os.path.join(raiz, DIR_PENDENTES))
+    manifesto = ler_manifesto(raiz)
+    assert manifesto["geracao"] == geracao + 1
+    assert [registro["arquivo"] for registro in manifesto["ingestoes"].values()] == ["a.csv", "b.csv"]
+    assert criar_motor(raiz, "pandas").total_linhas() == 2
+
+
+def test_transacao_nao_confirmada_e_descartada(tmp_path, raiz):
+    ingerir(raiz, escrever_csv(tmp_path / "a.csv", LINHAS))
+    manifesto = ler_manifesto(raiz)
+
+    # Arquivo pendente de uma transação que não chegou a confirmar
+    transacao = Transacao(raiz)
+    with open(transacao.caminho_pendente(os.path.join(raiz, "ano=2024", "mes=7", "parte-x.parquet")), "wb") as arquivo:
+        arquivo.write(b"incompleto")
+
+    assert not recuperar(raiz)
+    assert not os.path.exists(os.path.join(raiz, DIR_PENDENTES))
+    assert ler_manifesto(raiz) == manifesto
+    assert criar_motor(raiz, "pandas").total_linhas() == 2
+
+
+def test_transacao_descartada_ao_falhar_antes_de_confirmar(raiz):
+    with pytest.raises(RuntimeError):
+        with trava_escrita(raiz), Transacao(raiz) as transacao:
+            open(transacao.caminho_pendente(os.path.join(raiz, "_cubo.parquet")), "wb").close()
+            raise RuntimeError("falha na gravação")
+    assert not os.path.exists(os.path.join(raiz, "_cubo.parquet"))
+    assert not os.listdir(os.path.join(raiz, DIR_PENDENTES))
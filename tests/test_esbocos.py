@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from vendas.esbocos import EsbocoDistintos, EsbocoFrequentes, EsbocoQuantis
+
+FRACOES = [0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99]
+
+
+def _partes(quantidade, tamanho, semente=0):
+    rng = np.random.default_rng(semente)
+    return [pd.Series(rng.gamma(2, 100, tamanho)) for _ in range(quantidade)]
+
+
+def test_quantis_exatos_sem_compactacao():
+    valores = _partes(1, 200)[0]
+    esboco = EsbocoQuantis.de_valores(valores[:120]).mesclar(EsbocoQuantis.de_valores(valores[120:]))
+    assert esboco.erro_posto() == 0
+    assert esboco.quantis(FRACOES) == pytest.approx(valores.quantile(FRACOES).to_numpy())
+    assert (esboco.n, esboco.minimo, esboco.maximo) == (200, valores.min(), valores.max())
+    assert (esboco.media, esboco.desvio()) == pytest.approx((valores.mean(), valores.std()))
+
+
+@pytest.mark.parametrize("semente", range(5))
+def test_quantis_mesclados_dentro_do_erro(semente):
+    partes = _partes(40, 2500, semente)
+    esboco = None
+    for numero, parte in enumerate(partes):
+        novo = EsbocoQuantis.de_valores(parte, semente=numero)
+        esboco = novo if esboco is None else esboco.mesclar(novo)
+    todos = np.sort(pd.concat(partes).to_numpy())
+
+    assert esboco.n == len(todos)
+    assert sum(len(itens) for itens in esboco.niveis) < len(todos) / 20
+    erro = esboco.erro_posto()
+    assert 0 < erro < 0.05
+    postos = np.searchsorted(todos, esboco.quantis(FRACOES)) / len(todos)
+    assert np.abs(postos - FRACOES).max() <= erro
+    assert (esboco.media, esboco.desvio()) == pytest.approx((todos.mean(), todos.std(ddof=1)))
+
+
+def test_quantis_reproduziveis_e_serializaveis():
+    partes = _partes(3, 5000)
+    esbocos = [
+        [EsbocoQuantis.de_valores(parte, semente=7) for parte in partes]
+        for _ in range(2)
+    ]
+    mesclados = [primeiro.mesclar(segundo).mesclar(terceiro) for primeiro, segundo, terceiro in esbocos]
+    assert mesclados[0].para_dict() == mesclados[1].para_dict()
+    copia = EsbocoQuantis.de_dict(mesclados[0].para_dict())
+    assert copia.para_dict() == mesclados[0].para_dict()
+    assert copia.quantis(FRACOES) == pytest.approx(mesclados[0].quantis(FRACOES))
+
+
+def test_distintos_dentro_do_erro():
+    valores = pd.Series([f"produto {i}" for i in range(20000)])
+    esboco = EsbocoDistintos.de_valores(valores[:12000]).mesclar(EsbocoDistintos.de_valores(valores[8000:]))
+    assert abs(esboco.estimativa() - 20000) <= esboco.erro_relativo() * 20000
+
+
+def test_frequentes_limitam_a_contagem_real():
+    rng = np.random.default_rng(0)
+    valores = pd.Series(rng.zipf(1.5, 20000) % 500).astype(str)
+    reais = valores.value_counts()
+    esboco = EsbocoFrequentes.de_valores(valores[:7000], contadores=20).mesclar(
+        EsbocoFrequentes.de_valores(valores[7000:], contadores=20)
+    )
+    assert esboco.erro <= esboco.n / 21
+    for valor, contador in esboco.mais_frequentes(10):
+        assert contador <= reais[valor] <= contador + esboco.erro
+    assert [valor for valor, _ in esboco.mais_frequentes(3)] == reais.index[:3].tolist()
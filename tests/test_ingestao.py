@@ -0,0 +1,77 @@
+import pandas as pd
+
+from conftest import escrever_csv, ingerir
+from vendas import ingestao
+from vendas.cli import SITUACAO_IGNORADO
+from vendas.consulta import criar_motor
+from vendas.ingestao import calcular_chaves, hash_conteudo, ingerir_blocos
+from vendas.leitura import ler_em_blocos
+
+INTEIRAS = [
+    '25/05/2024,Camisa,40,X,Concluído,MG,3,"4,80"',
+    '18/05/2024,Calça,36,X,Concluído,SP,1,"65,63"',
+]
+FRACIONARIA = ['20/05/2024,Saia,38,X,Concluído,RJ,"1,5","10,00"']
+
+
+def test_reenvio_nao_duplica(tmp_path, raiz):
+    (registro,) = ingerir(raiz, escrever_csv(tmp_path / "a.csv", INTEIRAS))
+    assert (registro["novas"], registro["duplicadas"]) == (2, 0)
+
+    assert ingerir(raiz, str(tmp_path / "a.csv")) == [SITUACAO_IGNORADO]
+    (registro,) = ingerir(raiz, escrever_csv(tmp_path / "b.csv", INTEIRAS, sufixo="\n"))
+    assert (registro["novas"], registro["duplicadas"]) == (0, 2)
+
+
+def test_reenvio_depois_de_promover_o_esquema(tmp_path, raiz):
+    ingerir(raiz, escrever_csv(tmp_path / "c.csv", INTEIRAS))
+    (registro,) = ingerir(raiz, escrever_csv(tmp_path / "d.csv", FRACIONARIA))
+    assert registro["esquema"]["colunas_promovidas"] == {"quantidade": "Int64 -> float64"}
+
+    (registro,) = ingerir(raiz, escrever_csv(tmp_path / "c2.csv", INTEIRAS, sufixo="\n"))
+    assert (registro["novas"], registro["duplicadas"]) == (0, 2)
+    assert criar_motor(raiz, "pandas").total_linhas() == 3
+
+
+def test_vendas_repetidas_no_mesmo_arquivo_sao_mantidas(tmp_path, raiz):
+    linhas = INTEIRAS + INTEIRAS[:1]
+    (registro,) = ingerir(raiz, escrever_csv(tmp_path / "a.csv", linhas))
+    assert (registro["novas"], registro["duplicadas"]) == (3, 0)
+    (registro,) = ingerir(raiz, escrever_csv(tmp_path / "b.csv", linhas, sufixo="\n"))
+    assert (registro["novas"], registro["duplicadas"]) == (0, 3)
+
+
+def test_blocos_leem_cada_particao_uma_vez(tmp_path, raiz, monkeypatch):
+    ingerir(raiz, escrever_csv(tmp_path / "a.csv", INTEIRAS))
+    lidas = []
+    original = ingestao._chaves_existentes
+
+    def contar(particoes, *args):
+        lidas.append(particoes)
+        return original(particoes, *args)
+
+    monkeypatch.setattr(ingestao, "_chaves_existentes", contar)
+
+    caminho = escrever_csv(tmp_path / "b.csv", INTEIRAS + FRACIONARIA + INTEIRAS[:1])
+    with open(caminho, "rb") as arquivo:
+        conteudo = arquivo.read()
+        arquivo.seek(0)
+        blocos = (bloco for bloco, _ in ler_em_blocos(arquivo, "b.csv", tamanho_bloco=1))
+        registro = ingerir_blocos(blocos, hash_conteudo(conteudo), "b.csv", raiz)
+    assert (registro["novas"], registro["duplicadas"]) == (2, 2)
+    assert lidas == [{(2024, 5)}]
+
+
+def test_chaves_nao_dependem_dos_tipos():
+    datas = pd.to_datetime(["2024-01-01", None])
+    a = pd.DataFrame({
+        "quantidade": pd.array([1, None], dtype="Int64"),
+        "data": datas.astype("datetime64[us]"),
+        "produto": pd.Series(["Saia", "Camisa"], dtype="category"),
+    })
+    b = pd.DataFrame({
+        "quantidade": [1.0, float("nan")],
+        "data": datas.astype("datetime64[ns]"),
+        "produto": pd.Series(["Saia", "Camisa"], dtype="string"),
+    })
+    assert (calcular_chaves(a) == calcular_chaves(b)).all()
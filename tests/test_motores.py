@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import ingerir
+from vendas.consulta import criar_motor
+from vendas.cubo import COLUNA_LINHAS, METRICAS_CUBO
+from vendas.esquema import COLUMN_MES, COLUMN_PRODUTO, COLUMN_STATUS, COLUMN_UF, COLUMN_VALOR_TOTAL
+from vendas.motores import motor_duckdb_disponivel
+from vendas.sintetico import gerar_blocos, gravar_csv
+
+pytestmark = pytest.mark.skipif(not motor_duckdb_disponivel(), reason="duckdb não instalado")
+
+SELECOES = [
+    {},
+    {COLUMN_STATUS: ["Concluído"]},
+    {COLUMN_UF: ["SP", "RJ"], COLUMN_MES: ["March", "April"]},
+    {"data": ["2023-02-10", "2023-06-30"], COLUMN_STATUS: ["Concluído", "Cancelado"]},
+]
+
+
+@pytest.fixture(scope="module")
+def motores(tmp_path_factory):
+    pasta = tmp_path_factory.mktemp("motores")
+    raiz = str(pasta / "dados")
+    for numero in range(2):
+        caminho = str(pasta / f"{numero}.csv")
+        gravar_csv(caminho, gerar_blocos(5000, semente=numero, dias=365, fracao_invalidos=0.02))
+        ingerir(raiz, caminho)
+    return criar_motor(raiz, "pandas"), criar_motor(raiz, "duckdb")
+
+
+@pytest.mark.parametrize("selecoes", SELECOES)
+def test_totais(motores, selecoes):
+    pandas, duckdb = motores
+    esperado, obtido = pandas.totais(selecoes), duckdb.totais(selecoes)
+    assert obtido[COLUNA_LINHAS] == esperado[COLUNA_LINHAS] > 0
+    for col in METRICAS_CUBO:
+        assert obtido[col] == pytest.approx(esperado[col])
+
+
+@pytest.mark.parametrize("selecoes", SELECOES)
+def test_agrupar(motores, selecoes):
+    pandas, duckdb = motores
+    chaves = [COLUMN_PRODUTO, COLUMN_UF]
+    metricas = [COLUMN_VALOR_TOTAL, COLUNA_LINHAS]
+
+    def normalizar(df):
+        df = df.astype({col: str for col in chaves})
+        return df.sort_values(chaves).reset_index(drop=True)[chaves + metricas]
+
+    esperado = normalizar(pandas.agrupar(selecoes, chaves, metricas))
+    obtido = normalizar(duckdb.agrupar(selecoes, chaves, metricas))
+    pd.testing.assert_frame_equal(obtido, esperado, check_dtype=False)
+
+
+@pytest.mark.parametrize("selecoes", SELECOES)
+@pytest.mark.parametrize("decrescente", [False, True])
+def test_pagina_ordenada(motores, selecoes, decrescente):
+    pandas, duckdb = motores
+    colunas = [COLUMN_PRODUTO, COLUMN_VALOR_TOTAL, "data"]
+    for ordenar_por in (COLUMN_VALOR_TOTAL, "data", COLUMN_MES):
+        visiveis = colunas if ordenar_por in colunas else colunas + [ordenar_por]
+        esperado = pandas.pagina(selecoes, visiveis, 20, 25, ordenar_por, decrescente)
+        obtido = duckdb.pagina(selecoes, visiveis, 20, 25, ordenar_por, decrescente)
+        assert len(obtido) == len(esperado) == 25
+        # Empates podem vir em qualquer ordem: compara a coluna ordenada
+        assert obtido[ordenar_por].astype(str).tolist() == esperado[ordenar_por].astype(str).tolist()
+
+
+def test_pagina_sem_ordem_e_ultima_pagina(motores):
+    pandas, duckdb = motores
+    total = pandas.totais({})[COLUNA_LINHAS]
+    assert duckdb.totais({})[COLUNA_LINHAS] == total
+    for motor in motores:
+        assert len(motor.pagina({}, [COLUMN_PRODUTO], total - 10, 25)) == 10
+    valores = pandas.pagina({}, [COLUMN_VALOR_TOTAL], total - 30, 30, COLUMN_VALOR_TOTAL)[COLUMN_VALOR_TOTAL]
+    assert valores.isna().any() and np.isnan(valores.to_numpy(dtype="float64", na_value=np.nan)[-1])
+    ausentes = duckdb.pagina({}, [COLUMN_VALOR_TOTAL], total - 30, 30, COLUMN_VALOR_TOTAL)[COLUMN_VALOR_TOTAL]
+    assert ausentes.isna().sum() == valores.isna().sum()
@@ -0,0 +1,3 @@
+"""
+Núcleo de dados do Dashboard de Análise de Vendas.
+"""
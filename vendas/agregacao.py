@@ -0,0 +1,111 @@
+"""
+Planejador das agregações de uma página do dashboard.
+
+Cada gráfico ou tabela pede um agrupamento (chaves e métricas somadas). Em vez
+de uma consulta por pedido, o plano junta todas as chaves e métricas, consulta
+o motor uma única vez agrupando pela união das chaves e resolve cada pedido
+agregando esse resultado, que é pequeno, apenas quando ele é lido. Como todas
+as métricas são somas ou contagens, o resultado é o mesmo que o de consultas
+separadas.
+"""
+
+from .cubo import COLUNA_LINHAS, METRICAS_CUBO
+from .esquema import (
+    COLUMN_DEVOLUCAO, COLUMN_MES, COLUMN_PRODUTO, COLUMN_QUANTIDADE, COLUMN_STATUS, COLUMN_TAMANHO,
+    COLUMN_UF, COLUMN_VALOR_TOTAL,
+)
+
+
+class PlanoAgregacao:
+    """
+    Coleta os agrupamentos pedidos pela página e os resolve com uma única
+    consulta ao motor.
+    """
+
+    def __init__(self):
+        self._pedidos = {}
+
+    def pedir(self, nome, chaves, metricas):
+        """
+        Registra um agrupamento pelas `chaves`, somando as `metricas`.
+        Sem chaves, o pedido resulta em um dicionário métrica -> total.
+        """
+        self._pedidos[nome] = (list(chaves), list(metricas))
+
+    def chaves(self):
+        """
+        Retorna a união das chaves pedidas, na ordem em que apareceram.
+        """
+        return list(dict.fromkeys(col for chaves, _ in self._pedidos.values() for col in chaves))
+
+    def metricas(self):
+        """
+        Retorna a união das métricas pedidas, na ordem em que apareceram.
+        """
+        return list(dict.fromkeys(col for _, metricas in self._pedidos.values() for col in metricas))
+
+    def executar(self, motor, selecoes):
+        """
+        Executa o plano para as seleções. A consulta ao motor é feita aqui;
+        cada pedido é agregado apenas quando lido (veja `ResultadoAgregacao`).
+        """
+        chaves, metricas = self.chaves(), self.metricas()
+        if not chaves:
+            return ResultadoAgregacao(self._pedidos, totais=motor.totais(selecoes) if self._pedidos else {})
+        # A única passada sobre os dados: grupos com chave nula são mantidos
+        # aqui e descartados em cada pedido, como em um agrupamento direto
+        return ResultadoAgregacao(self._pedidos, fino=motor.agrupar(selecoes, chaves, metricas))
+
+
+class ResultadoAgregacao:
+    """
+    Resultado de um plano: o agrupamento pela união das chaves e os pedidos,
+    agregados sob demanda e guardados após a primeira leitura. Assim, uma
+    tabela que não é exibida (ex.: aba fechada) não é calculada.
+    """
+
+    def __init__(self, pedidos, fino=None, totais=None):
+        self._pedidos = dict(pedidos)
+        self._fino = fino
+        self._totais = totais
+        self._resultados = {}
+
+    def __contains__(self, nome):
+        return nome in self._pedidos
+
+    def __getitem__(self, nome):
+        if nome not in self._resultados:
+            self._resultados[nome] = self._resolver(*self._pedidos[nome])
+        return self._resultados[nome]
+
+    def _resolver(self, chaves, metricas):
+        """
+        Agrega o resultado fino pelas chaves de um pedido. Sem chaves, retorna
+        um dicionário métrica -> total.
+        """
+        if self._fino is None:
+            return {col: self._totais.get(col, 0) for col in metricas}
+        if not chaves:
+            return {col: self._fino[col].sum() for col in metricas}
+        return self._fino.groupby(chaves, observed=True)[metricas].sum().reset_index()
+
+
+def plano_da_pagina(colunas):
+    """
+    Monta o plano com os agrupamentos exibidos pelo dashboard (KPIs, gráficos
+    e tabelas), de acordo com as colunas disponíveis.
+    """
+    plano = PlanoAgregacao()
+    plano.pedir("totais", [], [col for col in METRICAS_CUBO if col in colunas] + [COLUNA_LINHAS])
+    if COLUMN_MES in colunas and COLUMN_VALOR_TOTAL in colunas:
+        plano.pedir("vendas_mes", [COLUMN_MES], [COLUMN_VALOR_TOTAL])
+    if COLUMN_STATUS in colunas:
+        plano.pedir("linhas_status", [COLUMN_STATUS], [COLUNA_LINHAS])
+    metricas_tamanho = [col for col in (COLUMN_QUANTIDADE, COLUMN_VALOR_TOTAL, COLUMN_DEVOLUCAO) if col in colunas]
+    if COLUMN_TAMANHO in colunas and metricas_tamanho:
+        plano.pedir("por_tamanho", [COLUMN_TAMANHO], metricas_tamanho)
+    if COLUMN_MES in colunas and COLUMN_TAMANHO in colunas and COLUMN_QUANTIDADE in colunas:
+        plano.pedir("mes_tamanho", [COLUMN_MES, COLUMN_TAMANHO], [COLUMN_QUANTIDADE])
+    if COLUMN_UF in colunas and COLUMN_PRODUTO in colunas and COLUMN_QUANTIDADE in colunas:
+        plano.pedir("uf_produto", [COLUMN_UF, COLUMN_PRODUTO], [COLUMN_QUANTIDADE])
+    return plano
@@ -0,0 +1,83 @@
+"""
+Aquecimento dos caches do processo na inicialização do servidor.
+
+Sem aquecimento, o primeiro visitante depois de um deploy paga a leitura das
+partições, a montagem dos índices e do cubo, a primeira agregação e a
+importação das bibliotecas de gráficos. `aquecer` faz esse trabalho antes de
+qualquer sessão, guardando o motor, o dicionário de produtos e as agregações
+sem filtros nos mesmos caches usados pela página (veja `obter_derivado` e `memorizar_filtro`).
+
+Para que a página encontre os caches, o aquecimento precisa rodar no mesmo
+processo do servidor: use `python -m vendas servir`, que aquece e inicia o
+Streamlit.
+
+Depois de uma ingestão pelo dashboard, a nova versão é preparada da mesma
+forma em segundo plano (`preparar_versao`, veja `vendas.tarefas`).
+"""
+
+import time
+
+from .agregacao import plano_da_pagina
+from .armazenamento import DATA_DIR, existe_armazem
+from .cache import geracao_atual, memorizar_filtro, obter_derivado, publicar_derivado
+from .consulta import criar_dicionario_produtos, criar_motor
+from .motores import MOTOR_CONFIGURADO
+
+
+def aquecer(raiz=DATA_DIR, motor=MOTOR_CONFIGURADO, graficos=True):
+    """
+    Carrega o motor da versão atual e as agregações da página sem filtros e,
+    com `graficos`, importa o Plotly Express. Retorna o tempo de cada etapa,
+    em segundos (vazio se não houver armazenamento).
+    """
+    tempos = {}
+    if graficos:
+        inicio = time.perf_counter()
+        import plotly.express  # noqa: F401
+        tempos["graficos"] = time.perf_counter() - inicio
+    if not existe_armazem(raiz):
+        return tempos
+
+    versao = geracao_atual(raiz)
+    inicio = time.perf_counter()
+    motor_consulta = obter_derivado("motor", versao, lambda: criar_motor(raiz, motor, versao), raiz)
+    tempos["motor"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    obter_derivado("produtos", versao, lambda: criar_dicionario_produtos(raiz), raiz)
+    tempos["produtos"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    _aquecer_agregacoes(motor_consulta, versao, raiz)
+    tempos["agregacoes"] = time.perf_counter() - inicio
+    return tempos
+
+
+def _aquecer_agregacoes(motor_consulta, versao, raiz):
+    """
+    Calcula as agregações da página sem filtros no cache por filtro.
+    """
+    plano = plano_da_pagina(motor_consulta.colunas())
+    agregados = memorizar_filtro("agregados", versao, {}, lambda: plano.executar(motor_consulta, {}), raiz)
+    memorizar_filtro("totais", versao, {}, lambda: motor_consulta.totais({}), raiz)
+    for nome in ("vendas_mes", "linhas_status", "por_tamanho"):
+        if nome in agregados:
+            agregados[nome]
+
+
+def preparar_versao(raiz=DATA_DIR, motor=MOTOR_CONFIGURADO):
+    """
+    Monta o motor, o dicionário de produtos e as agregações sem filtros da
+    versão atual e só então os publica no cache (veja `publicar_derivado`).
+    Enquanto isso, as sessões seguem com a versão anterior, sem esperar.
+    Retorna a versão publicada (None se não houver armazenamento).
+    """
+    if not existe_armazem(raiz):
+        return None
+    versao = geracao_atual(raiz)
+    motor_consulta = criar_motor(raiz, motor, versao)
+    dicionario = criar_dicionario_produtos(raiz)
+    _aquecer_agregacoes(motor_consulta, versao, raiz)
+    publicar_derivado("produtos", versao, dicionario, raiz)
+    publicar_derivado("motor", versao, motor_consulta, raiz)
+    return versao
@@ -0,0 +1,299 @@
+"""
+Armazenamento colunar particionado dos dados consolidados.
+
+Os dados ficam em arquivos Parquet comprimidos, particionados por ano e mês
+da coluna de data:
+
+    <raiz>/ano=2024/mes=3/parte-20240315T101500-1a2b3c4d.parquet
+
+Cada novo lote gera novos arquivos de partição, sem reescrever o histórico.
+Linhas sem data válida ficam na partição ``ano=NA/mes=NA``.
+
+O arquivo ``_manifesto.json`` na raiz guarda a geração atual do
+armazenamento, o esquema de tipos mesclado e o registro de ingestões.
+
+As escritas passam por transações (veja `vendas.diario`): os arquivos novos
+só aparecem nas partições quando a transação é aplicada, com a trava de
+publicação exclusiva. A leitura das partições usa a mesma trava em modo
+compartilhado e, por isso, nunca vê uma transação pela metade.
+"""
+
+import json
+import os
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from .esquema import COLUMN_DATA, aplicar_esquema
+
+# ===== CONSTANTES =====
+DATA_DIR = "dados_consolidados"
+COMPRESSAO = "zstd"
+PARTICAO_SEM_DATA = "NA"
+PREFIXO_PARTE = "parte-"
+ARQUIVO_MANIFESTO = "_manifesto.json"
+ARQUIVO_PUBLICACAO = "_publicacao.lock"
+COLUNA_CHAVE = "_chave"
+
+
+# ===== TRAVAS =====
+
+@contextmanager
+def travar_arquivo(caminho, exclusiva=True):
+    """
+    Trava o arquivo `caminho` (criado se não existir) entre processos enquanto
+    o bloco executa. Travas compartilhadas convivem entre si; a exclusiva
+    espera todas as outras. No Windows toda trava é exclusiva.
+    """
+    with open(caminho, "a+b") as arquivo:
+        descritor = arquivo.fileno()
+        if fcntl is not None:
+            fcntl.flock(descritor, fcntl.LOCK_EX if exclusiva else fcntl.LOCK_SH)
+        else:
+            # LK_LOCK desiste depois de 10 tentativas; insiste até conseguir
+            while True:
+                try:
+                    msvcrt.locking(descritor, msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(descritor, fcntl.LOCK_UN)
+            else:
+                arquivo.seek(0)
+                msvcrt.locking(descritor, msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def trava_publicacao(raiz=DATA_DIR, exclusiva=False):
+    """
+    Trava de publicação do armazenamento: compartilhada para ler as
+    partições, exclusiva para aplicar uma transação. Sem permissão de escrita
+    na raiz (ex.: disco somente leitura) não há escritores, e a leitura
+    dispensa a trava.
+    """
+    if exclusiva or os.access(raiz, os.W_OK):
+        with travar_arquivo(os.path.join(raiz, ARQUIVO_PUBLICACAO), exclusiva):
+            yield
+    else:
+        yield
+
+
+# ===== MANIFESTO =====
+
+def ler_manifesto(raiz=DATA_DIR):
+    """
+    Lê o manifesto do armazenamento. Retorna um manifesto vazio se não existir.
+    """
+    caminho = os.path.join(raiz, ARQUIVO_MANIFESTO)
+    manifesto = {"geracao": 0, "esquema": {}, "ingestoes": {}}
+    if os.path.exists(caminho):
+        with open(caminho, encoding="utf-8") as arquivo:
+            manifesto.update(json.load(arquivo))
+    return manifesto
+
+
+def gravar_manifesto(manifesto, raiz=DATA_DIR):
+    """
+    Grava o manifesto de forma atômica (arquivo temporário + rename).
+    """
+    os.makedirs(raiz, exist_ok=True)
+    caminho = os.path.join(raiz, ARQUIVO_MANIFESTO)
+    temporario = caminho + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as arquivo:
+        json.dump(manifesto, arquivo, ensure_ascii=False, indent=2)
+    os.replace(temporario, caminho)
+
+
+# ===== PARTIÇÕES =====
+
+def _diretorio_particao(raiz, ano, mes):
+    """
+    Retorna o diretório de uma partição ano/mês.
+    """
+    return os.path.join(raiz, f"ano={ano}", f"mes={mes}")
+
+
+def _valor_particao(nome):
+    """
+    Extrai o valor de um diretório no formato ``chave=valor``.
+    """
+    valor = nome.split("=", 1)[1]
+    return None if valor == PARTICAO_SEM_DATA else int(valor)
+
+
+def listar_particoes(raiz=DATA_DIR):
+    """
+    Lista as partições existentes como tuplas (ano, mês, diretório),
+    em ordem cronológica. A partição sem data vem por último.
+    """
+    if not os.path.isdir(raiz):
+        return []
+
+    particoes = []
+    for nome_ano in os.listdir(raiz):
+        dir_ano = os.path.join(raiz, nome_ano)
+        if not nome_ano.startswith("ano=") or not os.path.isdir(dir_ano):
+            continue
+        for nome_mes in os.listdir(dir_ano):
+            dir_mes = os.path.join(dir_ano, nome_mes)
+            if not nome_mes.startswith("mes=") or not os.path.isdir(dir_mes):
+                continue
+            particoes.append((_valor_particao(nome_ano), _valor_particao(nome_mes), dir_mes))
+
+    particoes.sort(key=lambda p: (p[0] is None, p[0] or 0, p[1] or 0))
+    return particoes
+
+
+def listar_arquivos(raiz=DATA_DIR, anos=None, meses=None, particoes=None):
+    """
+    Lista os arquivos Parquet das partições selecionadas.
+    `anos` e `meses` restringem as partições lidas; `particoes` restringe a um
+    conjunto de tuplas (ano, mês). None significa todas.
+    """
+    arquivos = []
+    for ano, mes, diretorio in listar_particoes(raiz):
+        if anos is not None and ano not in anos:
+            continue
+        if meses is not None and mes not in meses:
+            continue
+        if particoes is not None and (ano, mes) not in particoes:
+            continue
+        arquivos.extend(
+            os.path.join(diretorio, nome)
+            for nome in sorted(os.listdir(diretorio))
+            if nome.startswith(PREFIXO_PARTE) and nome.endswith(".parquet")
+        )
+    return arquivos
+
+
+def existe_armazem(raiz=DATA_DIR):
+    """
+    Indica se já existe ao menos um arquivo de partição gravado.
+    """
+    return bool(listar_arquivos(raiz))
+
+
+# ===== LEITURA =====
+
+def carregar_particoes(raiz=DATA_DIR, colunas=None, anos=None, meses=None):
+    """
+    Carrega os dados do armazenamento lendo apenas as colunas e partições pedidas.
+    Colunas pedidas que não existem em um arquivo são ignoradas nesse arquivo.
+    O resultado é convertido para o esquema mesclado do manifesto, lido com
+    a lista de arquivos sob a mesma trava: os dois são da mesma geração.
+    """
+    partes = []
+    with trava_publicacao(raiz):
+        esquema = ler_manifesto(raiz)["esquema"]
+        for arquivo in listar_arquivos(raiz, anos=anos, meses=meses):
+            if colunas is None:
+                colunas_arquivo = None
+            else:
+                existentes = set(pq.ParquetFile(arquivo).schema_arrow.names)
+                colunas_arquivo = [col for col in colunas if col in existentes]
+            partes.append(pq.read_table(arquivo, columns=colunas_arquivo).to_pandas())
+
+    if not partes:
+        return pd.DataFrame()
+    return aplicar_esquema(pd.concat(partes, ignore_index=True), esquema)
+
+
+# ===== ESCRITA =====
+
+def _chaves_particao(df):
+    """
+    Retorna as séries de ano e mês (como texto) que definem a partição de cada linha.
+    """
+    if COLUMN_DATA not in df.columns:
+        sem_data = pd.Series(PARTICAO_SEM_DATA, index=df.index)
+        return sem_data, sem_data
+    datas = df[COLUMN_DATA]
+    anos = datas.dt.year.astype("Int64").astype("string").fillna(PARTICAO_SEM_DATA)
+    meses = datas.dt.month.astype("Int64").astype("string").fillna(PARTICAO_SEM_DATA)
+    return anos, meses
+
+
+def particoes_do_lote(df):
+    """
+    Retorna o conjunto de partições (ano, mês) tocadas por um lote já tipado,
+    no mesmo formato de `listar_particoes`.
+    """
+    anos, meses = _chaves_particao(df)
+    pares = pd.DataFrame({"ano": anos, "mes": meses}).drop_duplicates()
+    return {
+        (_valor_particao(f"ano={ano}"), _valor_particao(f"mes={mes}"))
+        for ano, mes in pares.itertuples(index=False)
+    }
+
+
+def preparar_tipos(df):
+    """
+    Converte a data para datetime e colunas de texto para string,
+    garantindo um tipo único por coluna em cada arquivo Parquet.
+    """
+    df = df.copy()
+    if COLUMN_DATA in df.columns:
+        df[COLUMN_DATA] = pd.to_datetime(df[COLUMN_DATA], format='%d/%m/%Y', errors='coerce')
+    for col in df.columns:
+        if df[col].dtype == object:
+            df[col] = df[col].astype("string")
+    return df
+
+
+def _gravar_arquivo(df, diretorio, transacao=None):
+    """
+    Grava um arquivo de partição de forma atômica (arquivo temporário + rename).
+    Com `transacao`, o arquivo é gravado na área pendente da transação e só
+    aparece na partição quando ela for aplicada. Retorna o caminho de destino.
+    """
+    carimbo = pd.Timestamp.now().strftime("%Y%m%dT%H%M%S")
+    nome = f"{PREFIXO_PARTE}{carimbo}-{uuid.uuid4().hex[:8]}.parquet"
+    destino = os.path.join(diretorio, nome)
+    if transacao is not None:
+        df.to_parquet(transacao.caminho_pendente(destino), index=False, compression=COMPRESSAO)
+        return destino
+    os.makedirs(diretorio, exist_ok=True)
+    temporario = os.path.join(diretorio, f".{nome}.tmp")
+    df.to_parquet(temporario, index=False, compression=COMPRESSAO)
+    os.replace(temporario, destino)
+    return destino
+
+
+def gravar_particao(df, ano, mes, raiz=DATA_DIR, transacao=None):
+    """
+    Grava um DataFrame já tipado como um novo arquivo da partição (ano, mês),
+    ordenado pela data. Retorna o caminho de destino.
+    """
+    if COLUMN_DATA in df.columns:
+        df = df.sort_values(COLUMN_DATA, kind="stable")
+    ano = PARTICAO_SEM_DATA if ano is None else ano
+    mes = PARTICAO_SEM_DATA if mes is None else mes
+    return _gravar_arquivo(df, _diretorio_particao(raiz, ano, mes), transacao)
+
+
+def anexar_particoes(df, raiz=DATA_DIR, transacao=None):
+    """
+    Anexa um lote ao armazenamento, gravando um novo arquivo por partição
+    ano/mês presente no lote (na `transacao`, se informada).
+    Retorna a lista de arquivos gravados.
+    """
+    if df.empty:
+        return []
+
+    df = preparar_tipos(df)
+    gravados = []
+    for (ano, mes), grupo in df.groupby(list(_chaves_particao(df)), sort=True):
+        gravados.append(gravar_particao(grupo, ano, mes, raiz, transacao))
+    return gravados
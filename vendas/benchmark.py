@@ -0,0 +1,331 @@
+"""
+Benchmark de ponta a ponta, sem interface, sobre dados sintéticos.
+
+Para cada tamanho pedido, gera uma exportação com `vendas.sintetico` e mede
+separadamente cada etapa do caminho do dashboard:
+
+    geracao       gravação do arquivo sintético (não faz parte do dashboard)
+    leitura       leitura do arquivo em blocos (`ler_em_blocos`)
+    normalizacao  normalização dos blocos (`normalizar_blocos`)
+    persistencia  deduplicação, partições, cubo e manifesto (`ingerir_arquivos`)
+    carga         leitura das partições e montagem do motor de consulta
+    filtragem     seleção das linhas de um conjunto de filtros
+    kpis          plano de agregação da página e totais, para os mesmos filtros
+    graficos      construção das figuras da página
+
+Com `--primeira-pintura`, mede também a primeira execução completa da página
+em um processo novo (importações, carga e renderização, via o AppTest do
+Streamlit), sem e com o aquecimento (`vendas.aquecimento`) antes dela:
+
+    primeira_pintura            processo frio
+    primeira_pintura_aquecida   depois de `aquecer` (o aquecimento não conta)
+
+As etapas de consulta (carga em diante) são repetidas `repeticoes` vezes; os
+caches de filtro não são usados, para medir o custo sem reaproveitamento.
+Os resultados são acrescentados a um arquivo JSON, uma execução por entrada,
+para acompanhar regressões ao longo do tempo:
+
+    python -m vendas.benchmark --linhas 100000 1000000 --saida benchmark.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from .agregacao import plano_da_pagina
+from .armazenamento import DATA_DIR
+from .consulta import criar_motor
+from .cubo import COLUNA_LINHAS
+from .esquema import (
+    COLUMN_DATA, COLUMN_DEVOLUCAO, COLUMN_MES, COLUMN_PRODUTO, COLUMN_STATUS, COLUMN_TAMANHO, COLUMN_UF, COLUMN_VALOR_TOTAL,
+)
+from .graficos import criar_grafico_barras, criar_grafico_pizza
+from .ingestao import hash_fluxo, ingerir_arquivos, normalizar_blocos
+from .leitura import ler_em_blocos
+from .motores import MOTOR_DUCKDB, MOTOR_PANDAS, motor_duckdb_disponivel
+from .perfil import pico_memoria_mb
+from .sintetico import gerar_arquivo
+
+# ===== CONFIGURAÇÃO =====
+ETAPAS = ["geracao", "leitura", "normalizacao", "persistencia", "carga", "filtragem", "kpis", "graficos"]
+ETAPAS_PRIMEIRA_PINTURA = ["primeira_pintura", "primeira_pintura_aquecida"]
+APP_DASHBOARD = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app_melhorado.py")
+
+# Executado em um processo novo, no diretório de trabalho: imprime em JSON o
+# tempo da primeira execução completa da página
+_SCRIPT_PRIMEIRA_PINTURA = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+if sys.argv[2] == "1":
+    from vendas.aquecimento import aquecer
+    aquecer()
+inicio = time.perf_counter()
+pagina = AppTest.from_file(sys.argv[1], default_timeout=3600)
+pagina.run()
+print(json.dumps({"segundos": time.perf_counter() - inicio, "erros": [e.message for e in pagina.exception]}))
+"""
+TAMANHOS_PADRAO = [100_000, 1_000_000]
+FILTROS_POR_RODADA = 20
+COLUNAS_FILTRO = [COLUMN_TAMANHO, COLUMN_STATUS, COLUMN_UF, COLUMN_PRODUTO]
+
+
+def _medir(funcao):
+    """
+    Executa `funcao` sem argumentos e retorna (segundos, resultado).
+    """
+    inicio = time.perf_counter()
+    resultado = funcao()
+    return time.perf_counter() - inicio, resultado
+
+
+def _resumir(etapa, tempos, operacoes=1):
+    """
+    Resume as medições de uma etapa (em segundos) em um dicionário.
+    """
+    return {
+        "etapa": etapa,
+        "segundos": [round(t, 6) for t in tempos],
+        "mediana": round(statistics.median(tempos), 6),
+        "minimo": round(min(tempos), 6),
+        "operacoes": operacoes,
+        "pico_memoria_mb": pico_memoria_mb(),
+    }
+
+
+# ===== ETAPAS =====
+
+def sortear_selecoes(motor, quantidade, semente=0):
+    """
+    Sorteia combinações de filtros: em cada uma, de uma a três colunas com
+    alguns valores selecionados e, em metade delas, um intervalo de datas
+    qualquer. A primeira combinação é sem filtros.
+    """
+    rng = np.random.default_rng(semente)
+    colunas = [col for col in COLUNAS_FILTRO if col in motor.colunas()]
+    valores = {col: motor.valores(col) for col in colunas}
+    inicio, fim = motor.periodo()
+    selecoes = [{}]
+    while len(selecoes) < quantidade and colunas:
+        escolhidas = rng.choice(colunas, min(len(colunas), rng.integers(1, 4)), replace=False).tolist()
+        selecao = {
+            col: rng.choice(valores[col], rng.integers(1, min(len(valores[col]), 3) + 1), replace=False).tolist()
+            for col in escolhidas
+        }
+        if inicio is not None and rng.random() < 0.5:
+            dias = sorted(rng.integers(0, (fim - inicio).days + 1, 2))
+            selecao[COLUMN_DATA] = [(inicio + pd.Timedelta(days=int(d))).date().isoformat() for d in dias]
+        selecoes.append(selecao)
+    return selecoes
+
+
+def _agregar_pagina(motor, selecoes):
+    """
+    Executa o plano da página e resolve todos os pedidos, como se todas as
+    seções estivessem visíveis.
+    """
+    colunas = motor.colunas()
+    plano = plano_da_pagina(colunas)
+    agregados = plano.executar(motor, selecoes)
+    for nome in ("totais", "vendas_mes", "linhas_status", "por_tamanho", "mes_tamanho", "uf_produto"):
+        if nome in agregados:
+            agregados[nome]
+    return agregados
+
+
+def _graficos_pagina(agregados):
+    """
+    Constrói as figuras da página a partir das agregações.
+    """
+    figuras = []
+    if "vendas_mes" in agregados:
+        figuras.append(criar_grafico_barras(agregados["vendas_mes"], COLUMN_MES, COLUMN_VALOR_TOTAL, "Vendas por Mês"))
+    if "linhas_status" in agregados:
+        figuras.append(criar_grafico_pizza(
+            agregados["linhas_status"], COLUMN_STATUS, "Distribuição por Status", coluna_contagem=COLUNA_LINHAS
+        ))
+    if "por_tamanho" in agregados and COLUMN_DEVOLUCAO in agregados["por_tamanho"].columns:
+        figuras.append(criar_grafico_barras(
+            agregados["por_tamanho"], COLUMN_TAMANHO, COLUMN_DEVOLUCAO, "Devoluções por Tamanho"
+        ))
+    return figuras
+
+
+def medir_primeira_pintura(trabalho, motor=MOTOR_PANDAS, aquecido=False):
+    """
+    Mede, em um processo novo com `trabalho` como diretório atual, a primeira
+    execução completa da página sobre o armazenamento em `trabalho/DATA_DIR`.
+    Retorna os segundos.
+    """
+    pacote = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ambiente = {
+        **os.environ,
+        "DASHBOARD_MOTOR": motor,
+        "PYTHONPATH": os.pathsep.join(filter(None, [pacote, os.environ.get("PYTHONPATH")])),
+    }
+    processo = subprocess.run(
+        [sys.executable, "-c", _SCRIPT_PRIMEIRA_PINTURA, APP_DASHBOARD, "1" if aquecido else "0"],
+        cwd=trabalho, env=ambiente, capture_output=True, text=True, check=True,
+    )
+    resultado = json.loads(processo.stdout.strip().splitlines()[-1])
+    if resultado["erros"]:
+        raise RuntimeError(f"A página falhou na primeira execução: {resultado['erros'][0]}")
+    return resultado["segundos"]
+
+
+def medir_tamanho(linhas, formato="csv", motor=MOTOR_PANDAS, repeticoes=3, semente=0, diretorio=None,
+                  filtros=FILTROS_POR_RODADA, primeira_pintura=False):
+    """
+    Mede todas as etapas para um arquivo de `linhas` linhas. Retorna a lista
+    de resultados por etapa (veja `_resumir`).
+    """
+    trabalho = tempfile.mkdtemp(prefix="benchmark_vendas_", dir=diretorio)
+    try:
+        nome = f"vendas_{linhas}.{formato}"
+        caminho = os.path.join(trabalho, nome)
+        raiz = os.path.join(trabalho, DATA_DIR)
+        resultados = []
+
+        segundos, _ = _medir(lambda: gerar_arquivo(caminho, linhas, semente))
+        resultados.append(_resumir("geracao", [segundos]))
+
+        segundos, blocos = _medir(lambda: [bloco for bloco, _ in ler_em_blocos(caminho, nome)])
+        resultados.append(_resumir("leitura", [segundos]))
+
+        segundos, preparado = _medir(lambda: normalizar_blocos(blocos, nome))
+        resultados.append(_resumir("normalizacao", [segundos]))
+        del blocos
+
+        with open(caminho, "rb") as arquivo:
+            preparado.update(hash=hash_fluxo(arquivo), arquivo=nome)
+        segundos, _ = _medir(lambda: ingerir_arquivos([preparado], raiz))
+        resultados.append(_resumir("persistencia", [segundos]))
+        del preparado
+
+        tempos = {etapa: [] for etapa in ("carga", "filtragem", "kpis", "graficos")}
+        for _ in range(repeticoes):
+            segundos, motor_consulta = _medir(lambda: criar_motor(raiz, motor))
+            tempos["carga"].append(segundos)
+            selecoes = sortear_selecoes(motor_consulta, filtros, semente)
+
+            segundos, _ = _medir(lambda: [motor_consulta.selecionadas(selecao) for selecao in selecoes])
+            tempos["filtragem"].append(segundos)
+
+            segundos, agregados = _medir(lambda: [_agregar_pagina(motor_consulta, selecao) for selecao in selecoes])
+            tempos["kpis"].append(segundos)
+
+            segundos, _ = _medir(lambda: [_graficos_pagina(agregado) for agregado in agregados])
+            tempos["graficos"].append(segundos)
+            del motor_consulta, agregados
+
+        resultados.append(_resumir("carga", tempos["carga"]))
+        for etapa in ("filtragem", "kpis", "graficos"):
+            resultados.append(_resumir(etapa, tempos[etapa], operacoes=len(selecoes)))
+
+        if primeira_pintura:
+            for etapa, aquecido in zip(ETAPAS_PRIMEIRA_PINTURA, (False, True)):
+                tempos = [medir_primeira_pintura(trabalho, motor, aquecido) for _ in range(repeticoes)]
+                resultados.append(_resumir(etapa, tempos))
+        return resultados
+    finally:
+        shutil.rmtree(trabalho, ignore_errors=True)
+
+
+# ===== EXECUÇÃO =====
+
+def executar_benchmark(tamanhos=TAMANHOS_PADRAO, formato="csv", motor=MOTOR_PANDAS, repeticoes=3, semente=0,
+                       diretorio=None, filtros=FILTROS_POR_RODADA, primeira_pintura=False):
+    """
+    Mede todos os tamanhos e retorna a execução: metadados do ambiente e um
+    resultado por tamanho (com "erro" quando o tamanho não pôde ser medido).
+    """
+    execucao = {
+        "inicio": pd.Timestamp.now().isoformat(timespec="seconds"),
+        "ambiente": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "parametros": {"formato": formato, "motor": motor, "repeticoes": repeticoes, "semente": semente,
+                       "filtros": filtros, "primeira_pintura": primeira_pintura},
+        "resultados": [],
+    }
+    for linhas in tamanhos:
+        resultado = {"linhas": linhas}
+        try:
+            resultado["etapas"] = medir_tamanho(
+                linhas, formato, motor, repeticoes, semente, diretorio, filtros, primeira_pintura
+            )
+        except (ValueError, MemoryError, RuntimeError, subprocess.CalledProcessError) as e:
+            resultado["erro"] = str(e) or type(e).__name__
+        execucao["resultados"].append(resultado)
+    return execucao
+
+
+def gravar_resultados(execucao, caminho):
+    """
+    Acrescenta a execução ao arquivo JSON de resultados (uma lista de
+    execuções), de forma atômica.
+    """
+    execucoes = []
+    if os.path.exists(caminho):
+        with open(caminho, encoding="utf-8") as arquivo:
+            execucoes = json.load(arquivo)
+    execucoes.append(execucao)
+    temporario = f"{caminho}.tmp"
+    with open(temporario, "w", encoding="utf-8") as arquivo:
+        json.dump(execucoes, arquivo, ensure_ascii=False, indent=2)
+    os.replace(temporario, caminho)
+
+
+def _imprimir(execucao):
+    """
+    Imprime a mediana de cada etapa por tamanho, em segundos.
+    """
+    etapas = ETAPAS + (ETAPAS_PRIMEIRA_PINTURA if execucao["parametros"]["primeira_pintura"] else [])
+    print(f"{'linhas':>12}  " + "  ".join(f"{etapa:>12}" for etapa in etapas))
+    for resultado in execucao["resultados"]:
+        if "erro" in resultado:
+            print(f"{resultado['linhas']:>12,}  erro: {resultado['erro']}")
+            continue
+        medianas = {etapa["etapa"]: etapa["mediana"] for etapa in resultado["etapas"]}
+        print(f"{resultado['linhas']:>12,}  " + "  ".join(f"{medianas[etapa]:>12.3f}" for etapa in etapas))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de ponta a ponta do dashboard com dados sintéticos.")
+    parser.add_argument("--linhas", type=int, nargs="+", default=TAMANHOS_PADRAO, help="tamanhos a medir")
+    parser.add_argument("--formato", choices=["csv", "xlsx"], default="csv", help="formato do arquivo gerado")
+    parser.add_argument("--motor", choices=[MOTOR_PANDAS, MOTOR_DUCKDB], default=MOTOR_PANDAS)
+    parser.add_argument("--repeticoes", type=int, default=3, help="repetições das etapas de consulta")
+    parser.add_argument("--filtros", type=int, default=FILTROS_POR_RODADA, help="combinações de filtros por rodada")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--diretorio", help="diretório de trabalho (padrão: temporário do sistema)")
+    parser.add_argument("--saida", default="benchmark.json", help="arquivo JSON de resultados")
+    parser.add_argument("--primeira-pintura", action="store_true",
+                        help="mede a primeira execução da página em um processo novo (requer streamlit)")
+    args = parser.parse_args(argv)
+
+    if args.motor == MOTOR_DUCKDB and not motor_duckdb_disponivel():
+        parser.error("o motor duckdb requer o pacote duckdb instalado")
+    execucao = executar_benchmark(
+        args.linhas, args.formato, args.motor, args.repeticoes, args.semente, args.diretorio, args.filtros,
+        args.primeira_pintura,
+    )
+    gravar_resultados(execucao, args.saida)
+    _imprimir(execucao)
+    print(f"Resultados acrescentados a {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
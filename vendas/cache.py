@@ -0,0 +1,205 @@
+"""
+Cache de processo para o conjunto de dados consolidado.
+
+Todas as sessões do Streamlit compartilham a mesma instância do DataFrame,
+identificada pela geração do armazenamento (incrementada a cada ingestão).
+O DataFrame compartilhado é somente leitura: quem precisar de outra forma
+dos dados deve derivar um novo objeto (índices, seleções, agregações) em vez
+de alterá-lo. Estruturas derivadas também podem ser guardadas por versão com
+`obter_derivado`, ou construídas em segundo plano e trocadas de uma só vez
+com `publicar_derivado`.
+
+Resultados que dependem dos filtros (posições selecionadas, agregações,
+figuras e tabelas) ficam em um cache LRU limitado por tamanho, com chave
+(versão dos dados, filtros normalizados), de modo que voltar a uma combinação
+de filtros já vista não recalcula nada (`memorizar_filtro`).
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from .armazenamento import DATA_DIR, ler_manifesto
+
+# ===== CONFIGURAÇÃO =====
+LIMITE_CACHE_FILTROS = int(os.environ.get("DASHBOARD_CACHE_MB", "128")) * 1024 * 1024
+
+_trava = threading.Lock()
+_conjuntos = {}
+# Uma trava por estrutura derivada, detida durante a construção
+_construcoes = {}
+
+
+def geracao_atual(raiz=DATA_DIR):
+    """
+    Retorna a geração atual do armazenamento.
+    """
+    return ler_manifesto(raiz)["geracao"]
+
+
+def obter_derivado(nome, geracao, construir, raiz=DATA_DIR):
+    """
+    Retorna a estrutura `nome` construída para a geração informada.
+
+    `construir` é chamado sem argumentos apenas quando a geração em cache é
+    diferente. A construção detém só a trava da estrutura: construções
+    concorrentes da mesma estrutura esperam a primeira, as demais estruturas
+    seguem acessíveis e a versão anterior continua em cache (e em uso pelas
+    outras sessões) até a nova ficar pronta. Se `construir` falhar, a versão
+    anterior é mantida.
+    """
+    chave = (raiz, nome)
+    with _trava:
+        em_cache = _conjuntos.get(chave)
+        if em_cache is not None and em_cache[0] == geracao:
+            return em_cache[1]
+        trava_construcao = _construcoes.setdefault(chave, threading.Lock())
+
+    with trava_construcao:
+        with _trava:
+            em_cache = _conjuntos.get(chave)
+        if em_cache is not None and em_cache[0] == geracao:
+            return em_cache[1]
+        valor = construir()
+        with _trava:
+            # Uma versão mais nova publicada durante a construção é mantida
+            atual = _conjuntos.get(chave)
+            if atual is None or atual[0] <= geracao:
+                _conjuntos[chave] = (geracao, valor)
+        return valor
+
+
+def versao_em_cache(nome, raiz=DATA_DIR):
+    """
+    Retorna a tupla (geração, valor) da estrutura `nome` em cache, sem
+    construí-la (None se não houver).
+    """
+    with _trava:
+        return _conjuntos.get((raiz, nome))
+
+
+def publicar_derivado(nome, geracao, valor, raiz=DATA_DIR):
+    """
+    Substitui a estrutura `nome` em cache por uma já construída em outro
+    lugar (ex.: em uma tarefa em segundo plano): as sessões seguem usando a
+    versão anterior até a troca, que é atômica.
+    """
+    with _trava:
+        _conjuntos[(raiz, nome)] = (geracao, valor)
+
+
+# ===== CACHE POR FILTRO =====
+
+def tamanho_aproximado(valor):
+    """
+    Estima a memória ocupada por um valor em bytes: DataFrames e arrays pelo
+    tamanho dos dados; contêineres e objetos somando o conteúdo.
+    """
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        uso = valor.memory_usage(deep=True, index=True)
+        return int(uso.sum() if isinstance(uso, pd.Series) else uso)
+    if isinstance(valor, np.ndarray):
+        return int(valor.nbytes)
+    if isinstance(valor, (str, bytes)):
+        return sys.getsizeof(valor)
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(tamanho_aproximado(k) + tamanho_aproximado(v) for k, v in valor.items())
+    if isinstance(valor, (list, tuple, set)):
+        return sys.getsizeof(valor) + sum(tamanho_aproximado(item) for item in valor)
+    if hasattr(valor, "__dict__"):
+        return sys.getsizeof(valor) + tamanho_aproximado(vars(valor))
+    return sys.getsizeof(valor)
+
+
+def normalizar_selecoes(selecoes):
+    """
+    Converte as seleções em uma tupla ordenada e imutável, ignorando as
+    colunas sem valores selecionados, para uso como chave de cache.
+    """
+    return tuple(
+        (coluna, tuple(sorted(map(str, valores))))
+        for coluna, valores in sorted(selecoes.items())
+        if valores
+    )
+
+
+class CacheLRU:
+    """
+    Cache LRU limitado pela soma do tamanho aproximado dos valores.
+    Conta acertos, falhas e despejos. Seguro para uso entre threads.
+    """
+
+    def __init__(self, limite_bytes):
+        self.limite_bytes = limite_bytes
+        self._itens = OrderedDict()
+        self._trava = threading.Lock()
+        self.bytes = 0
+        self.acertos = 0
+        self.falhas = 0
+        self.despejos = 0
+
+    def obter(self, chave, construir):
+        """
+        Retorna o valor da chave, construindo-o (sem argumentos) em caso de falha.
+        Valores maiores que o limite são retornados sem serem guardados.
+        """
+        with self._trava:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+                return self._itens[chave][0]
+            self.falhas += 1
+
+        valor = construir()
+        tamanho = tamanho_aproximado(valor)
+        if tamanho > self.limite_bytes:
+            return valor
+        with self._trava:
+            if chave in self._itens:
+                self.bytes -= self._itens.pop(chave)[1]
+            self._itens[chave] = (valor, tamanho)
+            self.bytes += tamanho
+            while self.bytes > self.limite_bytes:
+                _, (_, liberado) = self._itens.popitem(last=False)
+                self.bytes -= liberado
+                self.despejos += 1
+        return valor
+
+    def descartar(self, condicao):
+        """
+        Remove as entradas cujas chaves atendem à condição.
+        """
+        with self._trava:
+            for chave in [chave for chave in self._itens if condicao(chave)]:
+                self.bytes -= self._itens.pop(chave)[1]
+
+    def estatisticas(self):
+        """
+        Retorna um dicionário com os contadores e a ocupação do cache.
+        """
+        with self._trava:
+            consultas = self.acertos + self.falhas
+            return {
+                "itens": len(self._itens),
+                "bytes": self.bytes,
+                "limite_bytes": self.limite_bytes,
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "despejos": self.despejos,
+                "taxa_acertos": self.acertos / consultas if consultas else 0.0,
+            }
+
+
+CACHE_FILTROS = CacheLRU(LIMITE_CACHE_FILTROS)
+
+
+def memorizar_filtro(nome, versao, selecoes, construir, raiz=DATA_DIR):
+    """
+    Retorna o resultado `nome` para a versão dos dados e as seleções
+    informadas, construindo-o (sem argumentos) apenas na primeira vez.
+    """
+    return CACHE_FILTROS.obter((raiz, versao, nome, normalizar_selecoes(selecoes)), construir)
@@ -0,0 +1,261 @@
+"""
+Linha de comando para o trabalho pesado fora do dashboard.
+
+    python -m vendas ingerir exportacoes/*.csv           (alias: ingest)
+    python -m vendas reconstruir-agregados               (alias: rebuild-aggregates)
+    python -m vendas compactar                           (alias: compact)
+    python -m vendas exportar --formato parquet --filtro status=Concluído --saida vendas.parquet
+                                                         (alias: export)
+    python -m vendas servir --porta 8501                 (alias: serve)
+
+Os comandos usam o mesmo armazenamento do dashboard (`--dados`, padrão
+DATA_DIR). Uma ingestão feita aqui incrementa a geração do armazenamento e as
+sessões abertas passam a ver os novos dados na próxima interação, sem
+processar nada no servidor.
+"""
+
+import argparse
+import glob
+import os
+import shutil
+import sys
+import threading
+
+from .aquecimento import aquecer
+from .armazenamento import DATA_DIR, existe_armazem, ler_manifesto
+from .compactacao import LIMITE_SEGMENTO_MB, MINIMO_SEGMENTOS, compactar
+from .consulta import criar_motor
+from .cubo import cubo_em_dia, reconstruir_cubo
+from .esbocos import esbocos_em_dia, reconstruir_esbocos
+from .exportacao import FORMATOS_EXPORTACAO, exportar
+from .ingestao import SITUACAO_ERRO, SITUACAO_IGNORADO, SITUACAO_INGERIDO, ingerir_fontes
+from .leitura import extensao
+from .motores import MOTOR_CONFIGURADO, MOTOR_DUCKDB, MOTOR_PANDAS
+from .perfil import emitir
+from .produtos import produtos_em_dia, reconstruir_produtos
+
+APP_PADRAO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app_melhorado.py")
+
+
+# ===== INGESTÃO =====
+
+def expandir_caminhos(entradas):
+    """
+    Expande padrões e diretórios em uma lista ordenada de arquivos suportados.
+    """
+    caminhos = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            candidatos = [os.path.join(entrada, nome) for nome in os.listdir(entrada)]
+        else:
+            candidatos = glob.glob(entrada) or [entrada]
+        caminhos += [caminho for caminho in candidatos if not os.path.isdir(caminho)]
+    return sorted(dict.fromkeys(caminhos))
+
+
+def ingerir_caminhos(caminhos, raiz=DATA_DIR, planilha=None, max_processos=None):
+    """
+    Ingere arquivos do disco por `ingerir_fontes`, com a planilha pedida (ou
+    a sugerida) nos arquivos Excel. Retorna o resumo de `ingerir_fontes`,
+    na ordem dos caminhos, com o caminho de cada arquivo em "caminho".
+    """
+    arquivos = [(caminho, os.path.basename(caminho), planilha) for caminho in caminhos]
+    resumo = ingerir_fontes(arquivos, raiz, max_processos=max_processos)
+    for caminho, item in zip(caminhos, resumo):
+        item["caminho"] = caminho
+    return resumo
+
+
+def comando_ingerir(args):
+    caminhos = expandir_caminhos(args.arquivos)
+    if not caminhos:
+        print("Nenhum arquivo encontrado.", file=sys.stderr)
+        return 1
+    resumo = ingerir_caminhos(caminhos, args.dados, args.planilha, args.processos)
+    for item in resumo:
+        if item["situacao"] == SITUACAO_INGERIDO:
+            registro = item["registro"]
+            print(
+                f"{item['caminho']}: {registro['novas']} linhas novas, {registro['duplicadas']} duplicadas, "
+                f"{registro['normalizacao']['linhas_descartadas']} descartadas"
+            )
+        elif item["situacao"] == SITUACAO_IGNORADO:
+            print(f"{item['caminho']}: já ingerido, ignorado")
+        else:
+            print(f"{item['caminho']}: erro: {item['erro']}", file=sys.stderr)
+    return 1 if any(item["situacao"] == SITUACAO_ERRO for item in resumo) else 0
+
+
+# ===== AGREGADOS =====
+
+def comando_reconstruir_agregados(args):
+    if not existe_armazem(args.dados):
+        print(f"Nenhum armazenamento em {args.dados}.", file=sys.stderr)
+        return 1
+    manifesto = ler_manifesto(args.dados)
+    if args.se_defasado and cubo_em_dia(manifesto, args.dados):
+        print("O cubo está em dia; nada a fazer.")
+    else:
+        cubo = reconstruir_cubo(args.dados)
+        print(f"Cubo reconstruído: {cubo.shape[0]} combinações.")
+    if args.se_defasado and esbocos_em_dia(manifesto, args.dados):
+        print("Os esboços do modo aproximado estão em dia; nada a fazer.")
+    else:
+        esbocos = reconstruir_esbocos(args.dados)
+        print(f"Esboços reconstruídos: {len(esbocos)} partições.")
+    if args.se_defasado and produtos_em_dia(manifesto, args.dados):
+        print("O dicionário de produtos está em dia; nada a fazer.")
+    else:
+        produtos = reconstruir_produtos(args.dados)
+        print(f"Dicionário de produtos reconstruído: {produtos.shape[0]} produtos.")
+    return 0
+
+
+def comando_compactar(args):
+    if not existe_armazem(args.dados):
+        print(f"Nenhum armazenamento em {args.dados}.", file=sys.stderr)
+        return 1
+    resultado = compactar(args.dados, args.limite_mb, args.minimo)
+    if not resultado["arquivos"]:
+        print("Nenhuma partição com arquivos pequenos suficientes; nada a fazer.")
+    else:
+        print(f"{resultado['arquivos']} arquivos compactados em {resultado['particoes']} partições.")
+    return 0
+
+
+# ===== EXPORTAÇÃO =====
+
+def ler_filtros(filtros):
+    """
+    Converte filtros "coluna=valor1,valor2" em um dicionário de seleções.
+    Repetir a coluna acrescenta valores.
+    """
+    selecoes = {}
+    for filtro in filtros or []:
+        coluna, separador, valores = filtro.partition("=")
+        if not separador or not coluna.strip():
+            raise ValueError(f"Filtro inválido: {filtro!r} (use coluna=valor1,valor2)")
+        selecoes.setdefault(coluna.strip().lower(), []).extend(
+            valor.strip() for valor in valores.split(",") if valor.strip()
+        )
+    return selecoes
+
+
+def comando_exportar(args):
+    if not existe_armazem(args.dados):
+        print(f"Nenhum armazenamento em {args.dados}.", file=sys.stderr)
+        return 1
+    try:
+        selecoes = ler_filtros(args.filtro)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    formato = args.formato or extensao(args.saida)
+    if formato not in FORMATOS_EXPORTACAO:
+        print(f"Formato de exportação desconhecido: {formato}", file=sys.stderr)
+        return 2
+
+    motor = criar_motor(args.dados, args.motor)
+    disponiveis = motor.colunas()
+    colunas = [col.strip().lower() for col in args.colunas.split(",")] if args.colunas else disponiveis
+    desconhecidas = [col for col in list(selecoes) + colunas if col not in disponiveis]
+    if desconhecidas:
+        print(f"Colunas desconhecidas: {', '.join(desconhecidas)}", file=sys.stderr)
+        return 2
+
+    versao = [os.path.abspath(args.dados), ler_manifesto(args.dados)["geracao"]]
+    shutil.copyfile(exportar(motor, versao, selecoes, colunas, formato), args.saida)
+    print(f"Exportado para {args.saida}")
+    return 0
+
+
+# ===== SERVIDOR =====
+
+def _aquecer_e_registrar():
+    """
+    Aquece os caches do processo e registra o tempo de cada etapa no log.
+    """
+    try:
+        tempos = aquecer(DATA_DIR)
+        emitir({"evento": "aquecimento", **{f"{etapa}_ms": round(s * 1000, 2) for etapa, s in tempos.items()}})
+    except Exception as e:
+        emitir({"evento": "aquecimento", "erro": str(e)})
+
+
+def comando_servir(args):
+    from streamlit.web import bootstrap
+
+    if not os.path.exists(args.app):
+        print(f"Arquivo do dashboard não encontrado: {args.app}", file=sys.stderr)
+        return 1
+    # Sessões que chegam durante o aquecimento esperam o motor em construção
+    # (veja `obter_derivado`) em vez de carregá-lo de novo
+    aquecimento = threading.Thread(target=_aquecer_e_registrar, name="aquecimento", daemon=True)
+    aquecimento.start()
+    if args.esperar:
+        aquecimento.join()
+
+    opcoes = {"server_headless": True}
+    if args.porta is not None:
+        opcoes["server_port"] = args.porta
+    if args.endereco is not None:
+        opcoes["server_address"] = args.endereco
+    bootstrap.load_config_options(flag_options=opcoes)
+    bootstrap.run(args.app, False, [], opcoes)
+    return 0
+
+
+# ===== ENTRADA =====
+
+def criar_parser():
+    parser = argparse.ArgumentParser(prog="python -m vendas", description="Dados do Dashboard de Análise de Vendas.")
+    parser.add_argument("--dados", default=DATA_DIR, help=f"diretório do armazenamento (padrão: {DATA_DIR})")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    ingerir = subparsers.add_parser("ingerir", aliases=["ingest"], help="ingere arquivos CSV ou Excel")
+    ingerir.add_argument("arquivos", nargs="+", help="arquivos, padrões (*.csv) ou diretórios")
+    ingerir.add_argument("--planilha", help="planilha dos arquivos Excel (padrão: a sugerida)")
+    ingerir.add_argument("--processos", type=int, help="processos para preparar vários arquivos")
+    ingerir.set_defaults(funcao=comando_ingerir)
+
+    reconstruir = subparsers.add_parser(
+        "reconstruir-agregados", aliases=["rebuild-aggregates"], help="reconstrói o cubo de agregação, os esboços do modo aproximado e o dicionário de produtos"
+    )
+    reconstruir.add_argument("--se-defasado", action="store_true", help="só reconstrói o que estiver defasado")
+    reconstruir.set_defaults(funcao=comando_reconstruir_agregados)
+
+    compactacao = subparsers.add_parser(
+        "compactar", aliases=["compact"], help="junta os arquivos pequenos de cada partição"
+    )
+    compactacao.add_argument(
+        "--limite-mb", type=float, default=LIMITE_SEGMENTO_MB,
+        help=f"tamanho abaixo do qual um arquivo é compactado (padrão: {LIMITE_SEGMENTO_MB})",
+    )
+    compactacao.add_argument(
+        "--minimo", type=int, default=MINIMO_SEGMENTOS,
+        help=f"arquivos pequenos por partição para compactá-la (padrão: {MINIMO_SEGMENTOS})",
+    )
+    compactacao.set_defaults(funcao=comando_compactar)
+
+    exportacao = subparsers.add_parser("exportar", aliases=["export"], help="exporta as linhas filtradas")
+    exportacao.add_argument("--saida", required=True, help="arquivo de saída")
+    exportacao.add_argument("--formato", choices=list(FORMATOS_EXPORTACAO), help="padrão: pela extensão da saída")
+    exportacao.add_argument("--filtro", action="append", help="coluna=valor1,valor2 (pode ser repetido)")
+    exportacao.add_argument("--colunas", help="colunas separadas por vírgula (padrão: todas)")
+    exportacao.add_argument("--motor", choices=[MOTOR_PANDAS, MOTOR_DUCKDB], default=MOTOR_CONFIGURADO)
+    exportacao.set_defaults(funcao=comando_exportar)
+
+    servir = subparsers.add_parser(
+        "servir", aliases=["serve"], help=f"aquece os caches e inicia o dashboard (dados em {DATA_DIR})"
+    )
+    servir.add_argument("--app", default=APP_PADRAO, help="script do dashboard")
+    servir.add_argument("--porta", type=int, help="porta do servidor")
+    servir.add_argument("--endereco", help="endereço do servidor")
+    servir.add_argument("--esperar", action="store_true", help="só aceita conexões depois do aquecimento")
+    servir.set_defaults(funcao=comando_servir)
+    return parser
+
+
+def main(argv=None):
+    args = criar_parser().parse_args(argv)
+    return args.funcao(args)
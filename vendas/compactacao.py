@@ -0,0 +1,88 @@
+"""
+Compactação dos segmentos pequenos do armazenamento.
+
+Cada ingestão grava um arquivo novo por partição tocada, de modo que o custo
+de um upload é proporcional ao tamanho do upload. O preço é que partições
+que recebem muitos uploads pequenos acumulam muitos arquivos, e a leitura
+paga a abertura de cada um. A compactação junta os arquivos pequenos de uma
+partição em um só, em uma transação (veja `vendas.diario`): o arquivo novo
+e a remoção dos antigos são publicados juntos.
+
+Roda na tarefa de ingestão de um upload no dashboard (veja `vendas.tarefas`)
+ou pela linha de comando (``python -m vendas compactar``).
+"""
+
+import os
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+from .armazenamento import (
+    COLUNA_CHAVE, DATA_DIR, PREFIXO_PARTE, gravar_particao, ler_manifesto, listar_particoes, preparar_tipos,
+)
+from .diario import Transacao, trava_escrita
+from .esquema import aplicar_esquema
+
+# ===== CONSTANTES =====
+# Arquivos menores que o limite são candidatos à compactação
+LIMITE_SEGMENTO_MB = 16
+# Uma partição só é compactada a partir deste número de arquivos pequenos
+MINIMO_SEGMENTOS = 4
+
+
+def _listar_pequenos(diretorio, limite_bytes):
+    """
+    Lista os arquivos da partição menores que o limite. Arquivos gravados
+    antes da coluna `_chave` (e da normalização na ingestão) ficam de fora.
+    """
+    pequenos = []
+    for nome in sorted(os.listdir(diretorio)):
+        arquivo = os.path.join(diretorio, nome)
+        if not nome.startswith(PREFIXO_PARTE) or not nome.endswith(".parquet"):
+            continue
+        if os.path.getsize(arquivo) >= limite_bytes:
+            continue
+        if COLUNA_CHAVE in pq.ParquetFile(arquivo).schema_arrow.names:
+            pequenos.append(arquivo)
+    return pequenos
+
+
+def segmentos_a_compactar(raiz=DATA_DIR, limite_mb=LIMITE_SEGMENTO_MB, minimo=MINIMO_SEGMENTOS):
+    """
+    Retorna as partições com ao menos `minimo` arquivos menores que
+    `limite_mb`, como tuplas (ano, mês, arquivos).
+    """
+    candidatas = []
+    for ano, mes, diretorio in listar_particoes(raiz):
+        pequenos = _listar_pequenos(diretorio, limite_mb * 1024 * 1024)
+        if len(pequenos) >= max(minimo, 2):
+            candidatas.append((ano, mes, pequenos))
+    return candidatas
+
+
+def compactar(raiz=DATA_DIR, limite_mb=LIMITE_SEGMENTO_MB, minimo=MINIMO_SEGMENTOS):
+    """
+    Junta os arquivos pequenos de cada partição candidata em um único arquivo,
+    em uma transação. As linhas não mudam, então a geração do armazenamento
+    também não: motores, agregados e caches da geração atual continuam
+    válidos (o motor DuckDB volta a listar os arquivos, veja `_fixar`).
+    Retorna um dicionário com o número de partições e de arquivos compactados.
+    """
+    resultado = {"particoes": 0, "arquivos": 0}
+    with trava_escrita(raiz):
+        candidatas = segmentos_a_compactar(raiz, limite_mb, minimo)
+        if not candidatas:
+            return resultado
+
+        manifesto = ler_manifesto(raiz)
+        with Transacao(raiz) as transacao:
+            for ano, mes, arquivos in candidatas:
+                partes = [pq.read_table(arquivo).to_pandas() for arquivo in arquivos]
+                df = aplicar_esquema(preparar_tipos(pd.concat(partes, ignore_index=True)), manifesto["esquema"])
+                gravar_particao(df, ano, mes, raiz, transacao)
+                for arquivo in arquivos:
+                    transacao.remover(arquivo)
+                resultado["particoes"] += 1
+                resultado["arquivos"] += len(arquivos)
+            transacao.confirmar(manifesto)
+    return resultado
@@ -0,0 +1,94 @@
+"""
+Carregamento do armazenamento e montagem do motor de consulta, sem interface.
+
+Usado pelo dashboard, pela linha de comando (`python -m vendas`) e pelo
+benchmark, para que todos consultem os dados da mesma forma.
+"""
+
+import pandas as pd
+
+from .armazenamento import DATA_DIR, carregar_particoes, existe_armazem
+from .cubo import DIMENSOES_CUBO, carregar_cubo
+from .esbocos import Aproximador, carregar_esbocos
+from .esquema import COLUMN_DATA, COLUNAS_CATEGORICAS, COLUNAS_DASHBOARD
+from .indices import IndiceCategorias
+from .memoria import compactar_tipos
+from .motores import MOTOR_CONFIGURADO, MOTOR_DUCKDB, MotorPandas, motor_duckdb_disponivel
+from .normalizacao import normalizar_lote, precisa_normalizar
+from .perfil import Perfil
+from .produtos import DicionarioProdutos, carregar_produtos
+
+_SEM_PERFIL = Perfil(False)
+
+
+def ordenar_por_data(df):
+    """
+    Ordena as linhas pela data, com as datas ausentes no fim e a ordem de
+    gravação mantida entre datas iguais. Como cada arquivo é gravado ordenado
+    e as partições são lidas em ordem cronológica, só uma partição com vários
+    arquivos precisa ser reordenada; se nada estiver fora de ordem, o próprio
+    DataFrame é retornado.
+    """
+    if COLUMN_DATA not in df.columns:
+        return df
+    datas = df[COLUMN_DATA]
+    validas = int(datas.notna().sum())
+    if datas.iloc[:validas].notna().all() and datas.iloc[:validas].is_monotonic_increasing:
+        return df
+    return df.sort_values(COLUMN_DATA, kind="stable", na_position="last", ignore_index=True)
+
+
+def carregar_dados(raiz=DATA_DIR, perfil=_SEM_PERFIL):
+    """
+    Carrega o DataFrame consolidado do armazenamento (vazio se não existir),
+    ordenado pela data (veja `ordenar_por_data`). Linhas gravadas antes da
+    normalização na ingestão são normalizadas aqui.
+    """
+    if not existe_armazem(raiz):
+        return pd.DataFrame()
+    with perfil.secao("carregar_particoes"):
+        df = carregar_particoes(raiz, colunas=COLUNAS_DASHBOARD)
+    if precisa_normalizar(df):
+        with perfil.secao("normalizacao"):
+            df, _ = normalizar_lote(df)
+    with perfil.secao("ordenacao"):
+        return ordenar_por_data(df)
+
+
+def criar_motor(raiz=DATA_DIR, motor=MOTOR_CONFIGURADO, versao=None, perfil=_SEM_PERFIL, df=None):
+    """
+    Cria o motor de consulta: DuckDB sobre as partições, se pedido e
+    instalado, ou pandas em memória com índice e cubo. Com `versao`, o motor
+    pandas usa o cache por filtro. `df` reaproveita dados já carregados.
+    Os dados e as dimensões do cubo do motor pandas são compactados (veja
+    `vendas.memoria`); o relatório fica em `motor.memoria`.
+    """
+    if motor == MOTOR_DUCKDB and motor_duckdb_disponivel():
+        from .motor_duckdb import MotorDuckDB
+        return MotorDuckDB(raiz)
+
+    if df is None:
+        df = carregar_dados(raiz, perfil)
+    with perfil.secao("compactacao"):
+        df, memoria = compactar_tipos(df)
+    with perfil.secao("indices"):
+        indice = IndiceCategorias(df, COLUNAS_CATEGORICAS, COLUMN_DATA)
+    with perfil.secao("cubo"):
+        cubo, _ = compactar_tipos(carregar_cubo(raiz), DIMENSOES_CUBO)
+    return MotorPandas(df, indice, cubo, versao, memoria)
+
+
+def criar_aproximador(raiz=DATA_DIR):
+    """
+    Cria o `Aproximador` do modo aproximado a partir dos esboços gravados
+    (reconstruídos, se defasados).
+    """
+    return Aproximador(carregar_esbocos(raiz))
+
+
+def criar_dicionario_produtos(raiz=DATA_DIR):
+    """
+    Cria o `DicionarioProdutos` do filtro de produtos a partir do dicionário
+    gravado (reconstruído, se defasado).
+    """
+    return DicionarioProdutos(carregar_produtos(raiz))
@@ -0,0 +1,218 @@
+"""
+Cubo de agregação materializado das vendas.
+
+O cubo guarda, para cada combinação de (ano, mês, tamanho, produto, status,
+uf), a soma das métricas e o número de linhas originais. Como toda métrica
+do dashboard é uma soma ou uma contagem, qualquer filtro da barra lateral e
+qualquer tabela ou gráfico agrupado por essas dimensões pode ser respondido
+a partir do cubo, cujo tamanho não depende do número de linhas brutas.
+
+O cubo é gravado em ``<raiz>/_cubo.parquet`` e atualizado incrementalmente a
+cada ingestão, somando o cubo do novo lote ao existente, na mesma transação
+que publica as partições do lote.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from .armazenamento import COMPRESSAO, DATA_DIR, existe_armazem, listar_arquivos, ler_manifesto
+from .diario import Transacao, trava_escrita
+from .esquema import (
+    COLUMN_ANO, COLUMN_DATA, COLUMN_DEVOLUCAO, COLUMN_MES, COLUMN_PRODUTO, COLUMN_QUANTIDADE,
+    COLUMN_RENDA_ESTIMADA, COLUMN_STATUS, COLUMN_SUBTOTAL_PRODUTO, COLUMN_TAMANHO,
+    COLUMN_TAXA, COLUMN_UF, COLUMN_VALOR_TOTAL, NOMES_MESES,
+)
+from .filtros import intervalo_de_datas
+from .normalizacao import normalizar_lote, precisa_normalizar
+
+# ===== CONSTANTES =====
+ARQUIVO_CUBO = "_cubo.parquet"
+COLUNA_LINHAS = "linhas"
+NUMERO_MES = {nome: numero for numero, nome in enumerate(NOMES_MESES, start=1)}
+
+DIMENSOES_CUBO = [COLUMN_ANO, COLUMN_MES, COLUMN_TAMANHO, COLUMN_PRODUTO, COLUMN_STATUS, COLUMN_UF]
+METRICAS_CUBO = [
+    COLUMN_VALOR_TOTAL,
+    COLUMN_QUANTIDADE,
+    COLUMN_TAXA,
+    COLUMN_RENDA_ESTIMADA,
+    COLUMN_SUBTOTAL_PRODUTO,
+    COLUMN_DEVOLUCAO,
+]
+
+
+# ===== CONSTRUÇÃO =====
+
+def agregar_cubo(df):
+    """
+    Agrega linhas brutas (ou outro cubo) nas dimensões do cubo, somando as
+    métricas e o número de linhas. Dimensões e métricas ausentes são ignoradas.
+    """
+    dimensoes = [col for col in DIMENSOES_CUBO if col in df.columns]
+    metricas = [col for col in METRICAS_CUBO if col in df.columns]
+    if not dimensoes:
+        return pd.DataFrame(columns=metricas + [COLUNA_LINHAS])
+
+    if COLUNA_LINHAS in df.columns:
+        linhas = df[COLUNA_LINHAS]
+    else:
+        linhas = pd.Series(1, index=df.index, dtype="int64")
+
+    agrupado = df[dimensoes + metricas].assign(**{COLUNA_LINHAS: linhas}).groupby(
+        dimensoes, observed=True, dropna=False, sort=False
+    )
+    return agrupado.sum(min_count=1).reset_index()
+
+
+def mesclar_cubos(*cubos):
+    """
+    Soma cubos parciais em um único cubo.
+    """
+    cubos = [cubo for cubo in cubos if cubo is not None and not cubo.empty]
+    if not cubos:
+        return pd.DataFrame()
+    if len(cubos) == 1:
+        return cubos[0]
+    # Categorias diferentes entre os cubos viram texto no concat
+    combinado = pd.concat(cubos, ignore_index=True)
+    for col in DIMENSOES_CUBO:
+        if col != COLUMN_ANO and col in combinado.columns:
+            combinado[col] = combinado[col].astype("category")
+    return agregar_cubo(combinado)
+
+
+# ===== PERSISTÊNCIA =====
+
+def _caminho_cubo(raiz):
+    """
+    Retorna o caminho do arquivo do cubo.
+    """
+    return os.path.join(raiz, ARQUIVO_CUBO)
+
+
+def gravar_cubo(cubo, raiz=DATA_DIR, transacao=None):
+    """
+    Grava o cubo de forma atômica (arquivo temporário + rename). Com
+    `transacao`, o cubo é publicado quando ela for aplicada.
+    """
+    if transacao is not None:
+        cubo.to_parquet(transacao.caminho_pendente(_caminho_cubo(raiz)), index=False, compression=COMPRESSAO)
+        return
+    os.makedirs(raiz, exist_ok=True)
+    caminho = _caminho_cubo(raiz)
+    temporario = caminho + ".tmp"
+    cubo.to_parquet(temporario, index=False, compression=COMPRESSAO)
+    os.replace(temporario, caminho)
+
+
+def cubo_em_dia(manifesto, raiz=DATA_DIR):
+    """
+    Indica se o cubo gravado corresponde à geração do manifesto informado.
+    Um armazenamento vazio tem, por definição, o cubo em dia.
+    """
+    if not os.path.exists(_caminho_cubo(raiz)):
+        return not existe_armazem(raiz)
+    return manifesto.get("geracao_cubo") == manifesto["geracao"]
+
+
+def atualizar_cubo(cubo_lote, raiz=DATA_DIR, transacao=None):
+    """
+    Soma o cubo de um lote (veja `agregar_cubo`) ao cubo gravado e grava o
+    resultado (na `transacao`, se informada).
+    """
+    existente = pd.read_parquet(_caminho_cubo(raiz)) if os.path.exists(_caminho_cubo(raiz)) else None
+    cubo = mesclar_cubos(existente, cubo_lote)
+    gravar_cubo(cubo, raiz, transacao)
+    return cubo
+
+
+def reconstruir_cubo(raiz=DATA_DIR):
+    """
+    Reconstrói o cubo a partir de todas as partições, arquivo por arquivo,
+    sem carregar o armazenamento inteiro em memória. Usa a trava de escrita,
+    de modo que nenhuma transação altera as partições durante a leitura, e
+    publica o cubo e o manifesto em uma transação (veja `vendas.diario`).
+    """
+    with trava_escrita(raiz):
+        manifesto = ler_manifesto(raiz)
+        colunas = DIMENSOES_CUBO + METRICAS_CUBO
+        parciais = []
+        for arquivo in listar_arquivos(raiz):
+            existentes = pq.ParquetFile(arquivo).schema_arrow.names
+            if COLUMN_MES in existentes:
+                parte = pq.read_table(arquivo, columns=[col for col in colunas if col in existentes]).to_pandas()
+            else:
+                parte = pq.read_table(arquivo).to_pandas()
+            if precisa_normalizar(parte):
+                parte, _ = normalizar_lote(parte)
+            parciais.append(agregar_cubo(parte))
+
+        cubo = mesclar_cubos(*parciais)
+        with Transacao(raiz) as transacao:
+            gravar_cubo(cubo, raiz, transacao)
+            manifesto["geracao_cubo"] = manifesto["geracao"]
+            transacao.confirmar(manifesto)
+    return cubo
+
+
+def carregar_cubo(raiz=DATA_DIR):
+    """
+    Carrega o cubo gravado. Se ele não existir ou estiver defasado em relação
+    à geração do armazenamento, é reconstruído.
+    """
+    if not cubo_em_dia(ler_manifesto(raiz), raiz):
+        return reconstruir_cubo(raiz)
+    if not os.path.exists(_caminho_cubo(raiz)):
+        return pd.DataFrame()
+    return pd.read_parquet(_caminho_cubo(raiz))
+
+
+# ===== CONSULTA =====
+
+def meses_do_intervalo(valores):
+    """
+    Retorna os meses cobertos por uma seleção de datas [início, fim] como
+    números ano * 12 + mês, se ela começa no primeiro dia de um mês e termina
+    no último dia de outro; caso contrário, retorna None (o cubo, que guarda
+    meses inteiros, não responde ao intervalo).
+    """
+    inicio, fim = intervalo_de_datas(valores)
+    if inicio.day != 1 or not fim.is_month_end:
+        return None
+    return list(range(inicio.year * 12 + inicio.month, fim.year * 12 + fim.month + 1))
+
+
+def filtrar_cubo(cubo, selecoes):
+    """
+    Retorna as células do cubo que atendem às seleções (dicionário
+    dimensão -> valores aceitos). Seleções vazias são ignoradas. Um intervalo
+    de datas alinhado aos meses (veja `meses_do_intervalo`) seleciona as
+    células de ano e mês correspondentes; um intervalo não alinhado levanta
+    ValueError.
+    """
+    mascara = None
+    for coluna, valores in selecoes.items():
+        if not valores:
+            continue
+        if coluna == COLUMN_DATA:
+            meses = meses_do_intervalo(valores)
+            if meses is None:
+                raise ValueError("O cubo só responde a intervalos de meses inteiros.")
+            mes = cubo[COLUMN_MES].map(NUMERO_MES).astype("float64").to_numpy()
+            condicao = np.isin(cubo[COLUMN_ANO].astype("float64").to_numpy() * 12 + mes, meses)
+        elif coluna in cubo.columns:
+            condicao = cubo[coluna].isin(valores).to_numpy()
+        else:
+            continue
+        mascara = condicao if mascara is None else mascara & condicao
+    return cubo if mascara is None else cubo[mascara]
+
+
+def totais_cubo(cubo):
+    """
+    Retorna um dicionário com a soma de cada métrica e o total de linhas.
+    """
+    return {col: cubo[col].sum() for col in METRICAS_CUBO + [COLUNA_LINHAS] if col in cubo.columns}
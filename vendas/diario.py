@@ -0,0 +1,177 @@
+"""
+Diário de escrita antecipada (write-ahead) e trava de escrita do armazenamento.
+
+Toda escrita no armazenamento (ingestão, compactação, reconstrução do cubo)
+acontece dentro de `trava_escrita`, uma trava de arquivo (``_trava.lock``)
+que vale entre processos: dois uploads simultâneos, ou um upload e uma
+ingestão pela linha de comando, são gravados um depois do outro, e cada um
+lê o manifesto deixado pelo anterior.
+
+Uma `Transacao` grava os arquivos novos em ``_pendentes/<id>/``, fora das
+partições lidas pelo dashboard. `confirmar` grava o diário ``_diario.json``
+(arquivos a publicar, arquivos a remover e o novo manifesto) de forma atômica;
+é o ponto de confirmação. Em seguida a transação é aplicada com a trava de
+publicação exclusiva: cada arquivo pendente é renomeado para o destino, os
+substituídos são removidos, o manifesto é gravado e o diário é apagado.
+
+Se o processo morrer no meio do caminho, a próxima escrita encontra o diário
+e termina de aplicá-lo (transação confirmada) ou apenas descarta os
+pendentes (transação não confirmada).
+"""
+
+import json
+import os
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+
+from .armazenamento import DATA_DIR, gravar_manifesto, trava_publicacao, travar_arquivo
+
+# ===== CONSTANTES =====
+ARQUIVO_TRAVA = "_trava.lock"
+ARQUIVO_DIARIO = "_diario.json"
+DIR_PENDENTES = "_pendentes"
+
+# Raízes cuja trava de escrita a thread atual já detém
+_local = threading.local()
+
+
+# ===== TRAVA DE ESCRITA =====
+
+@contextmanager
+def trava_escrita(raiz=DATA_DIR):
+    """
+    Detém a trava de escrita do armazenamento enquanto o bloco executa.
+    A trava é reentrante na mesma thread. Ao obtê-la, uma transação
+    interrompida por falha é recuperada (veja `recuperar`).
+    """
+    chave = os.path.abspath(raiz)
+    detidas = _local.__dict__.setdefault("detidas", set())
+    if chave in detidas:
+        yield
+        return
+
+    os.makedirs(raiz, exist_ok=True)
+    with travar_arquivo(os.path.join(raiz, ARQUIVO_TRAVA)):
+        detidas.add(chave)
+        try:
+            recuperar(raiz)
+            yield
+        finally:
+            detidas.discard(chave)
+
+
+# ===== TRANSAÇÕES =====
+
+def _aplicar(diario, raiz):
+    """
+    Publica os arquivos de um diário confirmado, remove os substituídos e
+    grava o manifesto. Pode ser repetida após uma falha: os passos já feitos
+    são ignorados. Os caminhos do diário são relativos à raiz.
+    """
+    with trava_publicacao(raiz, exclusiva=True):
+        for pendente, destino in diario["arquivos"]:
+            pendente, destino = os.path.join(raiz, pendente), os.path.join(raiz, destino)
+            if os.path.exists(pendente):
+                os.makedirs(os.path.dirname(destino), exist_ok=True)
+                os.replace(pendente, destino)
+        for arquivo in diario["removidos"]:
+            arquivo = os.path.join(raiz, arquivo)
+            if os.path.exists(arquivo):
+                os.remove(arquivo)
+        gravar_manifesto(diario["manifesto"], raiz)
+    os.remove(os.path.join(raiz, ARQUIVO_DIARIO))
+
+
+def recuperar(raiz=DATA_DIR):
+    """
+    Termina de aplicar uma transação confirmada e descarta os arquivos
+    pendentes de transações não confirmadas. Deve ser chamada com a trava
+    de escrita. Retorna True se havia uma transação a aplicar.
+    """
+    caminho = os.path.join(raiz, ARQUIVO_DIARIO)
+    aplicada = os.path.exists(caminho)
+    if aplicada:
+        with open(caminho, encoding="utf-8") as arquivo:
+            _aplicar(json.load(arquivo), raiz)
+    shutil.rmtree(os.path.join(raiz, DIR_PENDENTES), ignore_errors=True)
+    return aplicada
+
+
+class Transacao:
+    """
+    Conjunto de arquivos novos e removidos publicados de uma só vez junto com
+    um novo manifesto. Deve ser usada com a trava de escrita:
+
+        with trava_escrita(raiz), Transacao(raiz) as transacao:
+            anexar_particoes(lote, raiz, transacao)
+            transacao.confirmar(manifesto)
+
+    Uma transação não confirmada ao sair do bloco é descartada.
+    """
+
+    def __init__(self, raiz=DATA_DIR):
+        self.raiz = raiz
+        self.pendentes = os.path.join(DIR_PENDENTES, uuid.uuid4().hex)
+        self.diretorio = os.path.join(raiz, self.pendentes)
+        self.arquivos = []
+        self.removidos = []
+        self.confirmada = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, rastro):
+        if not self.confirmada:
+            self.descartar()
+        return False
+
+    def caminho_pendente(self, destino):
+        """
+        Registra um arquivo a publicar em `destino` e retorna o caminho onde
+        ele deve ser gravado até a confirmação.
+        """
+        relativo = self._relativo(destino)
+        self.arquivos.append((os.path.join(self.pendentes, relativo), relativo))
+        pendente = os.path.join(self.diretorio, relativo)
+        os.makedirs(os.path.dirname(pendente), exist_ok=True)
+        return pendente
+
+    def remover(self, arquivo):
+        """
+        Registra um arquivo a remover na confirmação.
+        """
+        self.removidos.append(self._relativo(arquivo))
+
+    def _relativo(self, caminho):
+        """
+        Retorna o caminho relativo à raiz do armazenamento.
+        """
+        return os.path.relpath(os.path.abspath(caminho), os.path.abspath(self.raiz))
+
+    def confirmar(self, manifesto):
+        """
+        Grava o diário da transação (ponto de confirmação) e a aplica.
+        """
+        diario = {
+            "arquivos": [list(par) for par in self.arquivos],
+            "removidos": self.removidos,
+            "manifesto": manifesto,
+        }
+        caminho = os.path.join(self.raiz, ARQUIVO_DIARIO)
+        temporario = caminho + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            json.dump(diario, arquivo, ensure_ascii=False)
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        os.replace(temporario, caminho)
+        self.confirmada = True
+        _aplicar(diario, self.raiz)
+        self.descartar()
+
+    def descartar(self):
+        """
+        Apaga os arquivos pendentes da transação.
+        """
+        shutil.rmtree(self.diretorio, ignore_errors=True)
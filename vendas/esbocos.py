@@ -0,0 +1,807 @@
+"""
+Esboços mescláveis para o modo aproximado do dashboard.
+
+Para cada partição (ano, mês) o armazenamento guarda, junto com o cubo, um
+conjunto de esboços de tamanho limitado, independente do número de linhas:
+
+- quantis das colunas numéricas (`EsbocoQuantis`, um compactador no estilo
+  KLL), com contagem, média, desvio, mínimo e máximo exatos;
+- valores distintos das colunas de texto (`EsbocoDistintos`, HyperLogLog);
+- valores mais frequentes (`EsbocoFrequentes`, Misra-Gries);
+- uma amostra das linhas: as de menor chave (`_chave`). Como a chave é um
+  hash, é uma amostra uniforme, e a amostra de duas partes é a de menor
+  chave da união.
+
+Todos os esboços de uma partição são somados aos do lote a cada ingestão
+(`atualizar_esbocos`), na mesma transação que publica as partições, como o
+cubo. Um `Aproximador` responde às seleções da barra lateral: com os
+esboços das partições, se a seleção for um conjunto de meses inteiros, ou
+com a amostra estratificada por mês (cada linha pesa pelo tamanho da sua
+partição), se houver outros filtros. Todo resultado vem com o seu limite de
+erro, com 95% de confiança.
+"""
+
+import base64
+import json
+import math
+import os
+import zlib
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from .armazenamento import (
+    COLUNA_CHAVE, COMPRESSAO, DATA_DIR, PARTICAO_SEM_DATA, existe_armazem, listar_arquivos, ler_manifesto,
+)
+from .cubo import METRICAS_CUBO, meses_do_intervalo
+from .diario import Transacao, trava_escrita
+from .esquema import COLUMN_DATA, COLUMN_PRODUTO, COLUMN_STATUS, COLUMN_TAMANHO, COLUMN_TIPO, COLUMN_UF
+from .filtros import intervalo_de_datas
+from .normalizacao import normalizar_lote, precisa_normalizar
+
+# ===== CONSTANTES =====
+ARQUIVO_ESBOCOS = "_esbocos.json"
+ARQUIVO_AMOSTRA = "_amostra.parquet"
+COLUNA_PARTICAO = "_particao"
+COLUNA_PESO = "_peso"
+
+# Itens por nível do esboço de quantis, registros do HyperLogLog (2 ** precisão),
+# contadores do Misra-Gries e linhas da amostra, por partição
+CAPACIDADE_QUANTIS = 256
+PRECISAO_DISTINTOS = 12
+CONTADORES_FREQUENTES = 64
+AMOSTRA_POR_PARTICAO = 2000
+
+CONFIANCA = 0.95
+Z_CONFIANCA = 1.96
+
+COLUNAS_QUANTIS = METRICAS_CUBO
+COLUNAS_CONTAGEM = [COLUMN_PRODUTO, COLUMN_TAMANHO, COLUMN_TIPO, COLUMN_STATUS, COLUMN_UF]
+
+# Linhas do resumo estatístico, na ordem do DataFrame.describe()
+LINHAS_RESUMO = ["count", "mean", "std", "min", "25%", "50%", "75%", "max"]
+FONTE_ESBOCOS = "esboços"
+FONTE_AMOSTRA = "amostra"
+
+def _numeros(serie):
+    """
+    Retorna os valores numéricos válidos de uma série como array float64.
+    """
+    valores = pd.to_numeric(serie, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+    return valores[~np.isnan(valores)]
+
+
+def _contagens(serie):
+    """
+    Retorna o número de linhas de cada valor válido da série, indexado pelo
+    valor como texto, para que o mesmo valor tenha o mesmo hash qualquer que
+    seja o tipo da coluna. Só os valores distintos são convertidos.
+    """
+    contagens = serie.value_counts(dropna=True, sort=False)
+    contagens = contagens[contagens > 0]
+    contagens.index = contagens.index.astype(str)
+    return contagens.groupby(level=0, sort=False).sum()
+
+
+def _quantis_ponderados(valores, pesos, fracoes):
+    """
+    Retorna os quantis de valores com pesos, interpolando linearmente entre
+    os postos: o valor ordenado de peso acumulado p ocupa o posto p - 1 e o
+    quantil q é o posto q * (peso total - 1). Com pesos unitários, é a
+    interpolação do DataFrame.describe().
+    """
+    ordem = np.argsort(valores, kind="stable")
+    postos = np.cumsum(pesos[ordem]) - 1
+    return np.interp(np.asarray(fracoes) * postos[-1], postos, valores[ordem])
+
+
+# ===== ESBOÇOS =====
+
+class EsbocoQuantis:
+    """
+    Esboço de quantis de uma coluna numérica. Os valores ficam em níveis:
+    um item do nível h representa 2 ** h valores. Quando um nível passa da
+    capacidade, ele é ordenado e metade dos itens (os de posição par ou
+    ímpar, ao acaso) sobe para o nível seguinte. O sorteio usa a `semente`
+    (a da partição, em `esbocar_lote`) e o número de valores, de modo que
+    os mesmos dados dão sempre o mesmo esboço. Cada compactação desloca a
+    posição estimada de um valor em no máximo 2 ** h, para cima ou para
+    baixo com a mesma chance; a variância desses deslocamentos é acumulada
+    e dá o erro de posto (`erro_posto`).
+
+    A contagem, a média, o desvio (pelo M2 de Welford), o mínimo e o máximo
+    são exatos e também se somam entre esboços.
+    """
+
+    def __init__(self, capacidade=CAPACIDADE_QUANTIS, semente=0):
+        self.capacidade = capacidade
+        self.semente = semente
+        self.niveis = []
+        self.variancia = 0.0
+        self.n = 0
+        self.media = 0.0
+        self.m2 = 0.0
+        self.minimo = None
+        self.maximo = None
+
+    @classmethod
+    def de_valores(cls, serie, capacidade=CAPACIDADE_QUANTIS, semente=0):
+        """
+        Cria o esboço dos valores válidos de uma série.
+        """
+        esboco = cls(capacidade, semente)
+        valores = _numeros(serie)
+        if len(valores):
+            esboco.niveis = [valores]
+            esboco.n = len(valores)
+            esboco.media = float(valores.mean())
+            esboco.m2 = float(((valores - esboco.media) ** 2).sum())
+            esboco.minimo, esboco.maximo = float(valores.min()), float(valores.max())
+            esboco._compactar()
+        return esboco
+
+    def _compactar(self):
+        """
+        Compacta os níveis acima da capacidade, do mais baixo ao mais alto.
+        """
+        aleatorio = np.random.default_rng([self.semente, self.n])
+        nivel = 0
+        while nivel < len(self.niveis):
+            itens = self.niveis[nivel]
+            if len(itens) > self.capacidade:
+                itens = np.sort(itens)
+                pares = len(itens) - len(itens) % 2
+                promovidos = itens[:pares][aleatorio.integers(2)::2]
+                self.niveis[nivel] = itens[pares:]
+                if nivel + 1 == len(self.niveis):
+                    self.niveis.append(promovidos)
+                else:
+                    self.niveis[nivel + 1] = np.concatenate([self.niveis[nivel + 1], promovidos])
+                self.variancia += 4.0 ** nivel
+            nivel += 1
+
+    def mesclar(self, outro):
+        """
+        Retorna um novo esboço com os valores dos dois esboços.
+        """
+        esboco = EsbocoQuantis(self.capacidade, self.semente)
+        altura = max(len(self.niveis), len(outro.niveis))
+        esboco.niveis = [
+            np.concatenate([lista[nivel] for lista in (self.niveis, outro.niveis) if nivel < len(lista)])
+            for nivel in range(altura)
+        ]
+        esboco.variancia = self.variancia + outro.variancia
+        esboco.n = self.n + outro.n
+        if esboco.n:
+            delta = outro.media - self.media
+            esboco.media = self.media + delta * outro.n / esboco.n
+            esboco.m2 = self.m2 + outro.m2 + delta ** 2 * self.n * outro.n / esboco.n
+        extremos = [valor for valor in (self.minimo, outro.minimo) if valor is not None]
+        esboco.minimo = min(extremos) if extremos else None
+        extremos = [valor for valor in (self.maximo, outro.maximo) if valor is not None]
+        esboco.maximo = max(extremos) if extremos else None
+        esboco._compactar()
+        return esboco
+
+    def quantis(self, fracoes):
+        """
+        Retorna os valores estimados nas frações pedidas (ex.: 0.25, 0.5, 0.75).
+        """
+        if not self.n:
+            return np.full(len(fracoes), np.nan)
+        valores = np.concatenate(self.niveis)
+        pesos = np.concatenate([np.full(len(itens), 2.0 ** nivel) for nivel, itens in enumerate(self.niveis)])
+        return _quantis_ponderados(valores, pesos, fracoes)
+
+    def desvio(self):
+        """
+        Retorna o desvio-padrão amostral (NaN com menos de dois valores).
+        """
+        return math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else np.nan
+
+    def erro_posto(self):
+        """
+        Retorna o erro de posto dos quantis como fração do total de valores:
+        a posição real do valor estimado para o quantil q está entre
+        q - erro e q + erro, com 95% de confiança. Zero sem compactações.
+        """
+        return Z_CONFIANCA * math.sqrt(self.variancia) / self.n if self.n else 0.0
+
+    def para_dict(self):
+        """
+        Serializa o esboço em um dicionário compatível com JSON.
+        """
+        return {
+            "capacidade": self.capacidade,
+            "semente": self.semente,
+            "niveis": [itens.tolist() for itens in self.niveis],
+            "variancia": self.variancia,
+            "n": self.n,
+            "media": self.media,
+            "m2": self.m2,
+            "minimo": self.minimo,
+            "maximo": self.maximo,
+        }
+
+    @classmethod
+    def de_dict(cls, dados):
+        """
+        Recria o esboço serializado por `para_dict`.
+        """
+        esboco = cls(dados["capacidade"], dados.get("semente", 0))
+        esboco.niveis = [np.asarray(itens, dtype="float64") for itens in dados["niveis"]]
+        for campo in ("variancia", "n", "media", "m2", "minimo", "maximo"):
+            setattr(esboco, campo, dados[campo])
+        return esboco
+
+
+class EsbocoDistintos:
+    """
+    Esboço HyperLogLog do número de valores distintos de uma coluna. Cada
+    valor é reduzido a um hash de 64 bits: os primeiros bits escolhem um
+    registro, que guarda o maior número de zeros à esquerda visto no
+    restante. Somar dois esboços é tomar o máximo de cada registro.
+    """
+
+    def __init__(self, precisao=PRECISAO_DISTINTOS):
+        self.precisao = precisao
+        self.registros = np.zeros(2 ** precisao, dtype="uint8")
+
+    @classmethod
+    def de_valores(cls, serie, precisao=PRECISAO_DISTINTOS):
+        """
+        Cria o esboço dos valores válidos de uma série.
+        """
+        esboco = cls(precisao)
+        # Repetir um valor não muda os registros: basta o hash dos distintos
+        textos = _contagens(serie).index.to_numpy(dtype=object)
+        if len(textos):
+            hashes = pd.util.hash_array(textos)
+            bits = 64 - precisao
+            indices = (hashes >> np.uint64(bits)).astype("int64")
+            restos = hashes & np.uint64((1 << bits) - 1)
+            # Posição do primeiro bit 1 do restante: frexp dá o número de bits
+            # significativos (o restante tem menos de 53 bits e cabe em um float)
+            posicoes = bits - np.frexp(restos.astype("float64"))[1] + 1
+            np.maximum.at(esboco.registros, indices, posicoes.astype("uint8"))
+        return esboco
+
+    def mesclar(self, outro):
+        """
+        Retorna um novo esboço com os valores dos dois esboços.
+        """
+        esboco = EsbocoDistintos(self.precisao)
+        esboco.registros = np.maximum(self.registros, outro.registros)
+        return esboco
+
+    def estimativa(self):
+        """
+        Retorna o número estimado de valores distintos. Com poucos valores
+        (muitos registros vazios), usa a contagem linear dos registros vazios.
+        """
+        m = len(self.registros)
+        alfa = 0.7213 / (1 + 1.079 / m)
+        estimativa = alfa * m * m / np.sum(np.ldexp(1.0, -self.registros.astype("int64")))
+        vazios = int(np.count_nonzero(self.registros == 0))
+        if estimativa <= 2.5 * m and vazios:
+            estimativa = m * math.log(m / vazios)
+        return int(round(estimativa))
+
+    def erro_relativo(self):
+        """
+        Retorna o erro relativo da estimativa, com 95% de confiança.
+        """
+        return Z_CONFIANCA * 1.04 / math.sqrt(len(self.registros))
+
+    def para_dict(self):
+        """
+        Serializa o esboço, com os registros em base64.
+        """
+        return {"precisao": self.precisao, "registros": base64.b64encode(self.registros.tobytes()).decode("ascii")}
+
+    @classmethod
+    def de_dict(cls, dados):
+        """
+        Recria o esboço serializado por `para_dict`.
+        """
+        esboco = cls(dados["precisao"])
+        esboco.registros = np.frombuffer(base64.b64decode(dados["registros"]), dtype="uint8").copy()
+        return esboco
+
+
+class EsbocoFrequentes:
+    """
+    Esboço Misra-Gries dos valores mais frequentes de uma coluna: guarda no
+    máximo `contadores` valores. Quando passa disso, o (contadores + 1)-ésimo
+    maior contador é subtraído de todos e os que zeram saem. A contagem real
+    de um valor fica entre o contador guardado e o contador mais `erro` (a
+    soma do que foi subtraído), que nunca passa de n / (contadores + 1).
+    """
+
+    def __init__(self, contadores=CONTADORES_FREQUENTES):
+        self.contadores = contadores
+        self.contagens = {}
+        self.erro = 0
+        self.n = 0
+
+    @classmethod
+    def de_valores(cls, serie, contadores=CONTADORES_FREQUENTES):
+        """
+        Cria o esboço dos valores válidos de uma série.
+        """
+        esboco = cls(contadores)
+        contagens = _contagens(serie)
+        esboco.contagens = {valor: int(total) for valor, total in contagens.items()}
+        esboco.n = int(contagens.sum())
+        esboco._podar()
+        return esboco
+
+    def _podar(self):
+        """
+        Reduz o esboço aos `contadores` maiores contadores.
+        """
+        if len(self.contagens) <= self.contadores:
+            return
+        corte = sorted(self.contagens.values(), reverse=True)[self.contadores]
+        self.contagens = {valor: total - corte for valor, total in self.contagens.items() if total > corte}
+        self.erro += corte
+
+    def mesclar(self, outro):
+        """
+        Retorna um novo esboço com os valores dos dois esboços.
+        """
+        esboco = EsbocoFrequentes(self.contadores)
+        esboco.contagens = dict(self.contagens)
+        for valor, total in outro.contagens.items():
+            esboco.contagens[valor] = esboco.contagens.get(valor, 0) + total
+        esboco.erro = self.erro + outro.erro
+        esboco.n = self.n + outro.n
+        esboco._podar()
+        return esboco
+
+    def mais_frequentes(self, quantidade):
+        """
+        Retorna os `quantidade` valores de maior contador, como tuplas
+        (valor, contador).
+        """
+        return sorted(self.contagens.items(), key=lambda item: (-item[1], item[0]))[:quantidade]
+
+    def para_dict(self):
+        """
+        Serializa o esboço em um dicionário compatível com JSON.
+        """
+        return {"contadores": self.contadores, "contagens": self.contagens, "erro": self.erro, "n": self.n}
+
+    @classmethod
+    def de_dict(cls, dados):
+        """
+        Recria o esboço serializado por `para_dict`.
+        """
+        esboco = cls(dados["contadores"])
+        esboco.contagens = dict(dados["contagens"])
+        esboco.erro, esboco.n = dados["erro"], dados["n"]
+        return esboco
+
+
+class Esbocos:
+    """
+    Esboços de uma partição: o número de linhas, um esboço por coluna
+    (quantis, distintos e frequentes) e a amostra das linhas de menor chave.
+    """
+
+    def __init__(self):
+        self.linhas = 0
+        self.quantis = {}
+        self.distintos = {}
+        self.frequentes = {}
+        self.amostra = pd.DataFrame()
+
+    @classmethod
+    def de_linhas(cls, df, tamanho_amostra=AMOSTRA_POR_PARTICAO, semente=0):
+        """
+        Cria os esboços de linhas brutas com a coluna `_chave`. A `semente`
+        é a dos esboços de quantis.
+        """
+        esbocos = cls()
+        esbocos.linhas = df.shape[0]
+        esbocos.quantis = {col: EsbocoQuantis.de_valores(df[col], semente=semente) for col in COLUNAS_QUANTIS if col in df.columns}
+        esbocos.distintos = {col: EsbocoDistintos.de_valores(df[col]) for col in COLUNAS_CONTAGEM if col in df.columns}
+        esbocos.frequentes = {col: EsbocoFrequentes.de_valores(df[col]) for col in COLUNAS_CONTAGEM if col in df.columns}
+        esbocos.amostra = _menores_chaves(df, tamanho_amostra)
+        return esbocos
+
+    def mesclar(self, outro):
+        """
+        Retorna os esboços da união das linhas das duas partes.
+        """
+        esbocos = Esbocos()
+        esbocos.linhas = self.linhas + outro.linhas
+        for atributo in ("quantis", "distintos", "frequentes"):
+            meus, outros = getattr(self, atributo), getattr(outro, atributo)
+            setattr(esbocos, atributo, {
+                col: meus[col].mesclar(outros[col]) if col in meus and col in outros else meus.get(col, outros.get(col))
+                for col in list(dict.fromkeys(list(meus) + list(outros)))
+            })
+        partes = [amostra for amostra in (self.amostra, outro.amostra) if not amostra.empty]
+        if len(partes) == 2:
+            esbocos.amostra = _menores_chaves(pd.concat(partes, ignore_index=True), AMOSTRA_POR_PARTICAO)
+        else:
+            esbocos.amostra = partes[0] if partes else pd.DataFrame()
+        return esbocos
+
+    def para_dict(self):
+        """
+        Serializa os esboços (sem a amostra, gravada à parte em Parquet).
+        """
+        return {
+            "linhas": self.linhas,
+            "quantis": {col: esboco.para_dict() for col, esboco in self.quantis.items()},
+            "distintos": {col: esboco.para_dict() for col, esboco in self.distintos.items()},
+            "frequentes": {col: esboco.para_dict() for col, esboco in self.frequentes.items()},
+        }
+
+    @classmethod
+    def de_dict(cls, dados, amostra=None):
+        """
+        Recria os esboços serializados por `para_dict`, com a amostra lida à parte.
+        """
+        esbocos = cls()
+        esbocos.linhas = dados["linhas"]
+        esbocos.quantis = {col: EsbocoQuantis.de_dict(d) for col, d in dados["quantis"].items()}
+        esbocos.distintos = {col: EsbocoDistintos.de_dict(d) for col, d in dados["distintos"].items()}
+        esbocos.frequentes = {col: EsbocoFrequentes.de_dict(d) for col, d in dados["frequentes"].items()}
+        esbocos.amostra = amostra if amostra is not None else pd.DataFrame()
+        return esbocos
+
+
+def _menores_chaves(df, tamanho):
+    """
+    Retorna as `tamanho` linhas de menor chave (sem chaves repetidas).
+    """
+    if df.empty:
+        return pd.DataFrame()
+    return df.drop_duplicates(COLUNA_CHAVE).nsmallest(tamanho, COLUNA_CHAVE).reset_index(drop=True)
+
+
+# ===== CONSTRUÇÃO =====
+
+def _particoes_das_linhas(df):
+    """
+    Retorna a chave da partição de cada linha ("2024-3", ou "NA" sem data).
+    """
+    if COLUMN_DATA not in df.columns:
+        return pd.Series(PARTICAO_SEM_DATA, index=df.index, dtype="string")
+    datas = df[COLUMN_DATA]
+    chaves = datas.dt.year.astype("Int64").astype("string") + "-" + datas.dt.month.astype("Int64").astype("string")
+    return chaves.fillna(PARTICAO_SEM_DATA)
+
+
+def esbocar_lote(df):
+    """
+    Cria os esboços das linhas de um lote (com a coluna `_chave`), por
+    partição. Retorna um dicionário partição -> `Esbocos`. A semente dos
+    sorteios de cada partição vem da sua chave, para que reconstruir os
+    esboços dê os mesmos arquivos.
+    """
+    if df.empty:
+        return {}
+    return {
+        chave: Esbocos.de_linhas(grupo, semente=zlib.crc32(chave.encode()))
+        for chave, grupo in df.groupby(_particoes_das_linhas(df), sort=False, observed=True)
+    }
+
+
+def mesclar_esbocos(*conjuntos):
+    """
+    Soma os esboços de vários dicionários partição -> `Esbocos`.
+    """
+    resultado = {}
+    for conjunto in conjuntos:
+        for chave, esbocos in (conjunto or {}).items():
+            resultado[chave] = resultado[chave].mesclar(esbocos) if chave in resultado else esbocos
+    return resultado
+
+
+# ===== PERSISTÊNCIA =====
+
+def gravar_esbocos(esbocos, raiz=DATA_DIR, transacao=None):
+    """
+    Grava os esboços em ``_esbocos.json`` e as amostras em
+    ``_amostra.parquet``, de forma atômica (ou na `transacao`, se informada).
+    """
+    caminho_esbocos = os.path.join(raiz, ARQUIVO_ESBOCOS)
+    caminho_amostra = os.path.join(raiz, ARQUIVO_AMOSTRA)
+    amostras = [
+        esbocos_particao.amostra.assign(**{COLUNA_PARTICAO: chave})
+        for chave, esbocos_particao in esbocos.items()
+        if not esbocos_particao.amostra.empty
+    ]
+    amostra = pd.concat(amostras, ignore_index=True) if amostras else pd.DataFrame({COLUNA_PARTICAO: []})
+    dados = {chave: esbocos_particao.para_dict() for chave, esbocos_particao in esbocos.items()}
+
+    if transacao is not None:
+        destinos = transacao.caminho_pendente(caminho_esbocos), transacao.caminho_pendente(caminho_amostra)
+    else:
+        os.makedirs(raiz, exist_ok=True)
+        destinos = caminho_esbocos + ".tmp", caminho_amostra + ".tmp"
+    with open(destinos[0], "w", encoding="utf-8") as arquivo:
+        json.dump(dados, arquivo, ensure_ascii=False)
+    amostra.to_parquet(destinos[1], index=False, compression=COMPRESSAO)
+    if transacao is None:
+        os.replace(destinos[0], caminho_esbocos)
+        os.replace(destinos[1], caminho_amostra)
+
+
+def _ler_esbocos(raiz):
+    """
+    Lê os esboços gravados (dicionário vazio se não existirem).
+    """
+    caminho = os.path.join(raiz, ARQUIVO_ESBOCOS)
+    if not os.path.exists(caminho):
+        return {}
+    with open(caminho, encoding="utf-8") as arquivo:
+        dados = json.load(arquivo)
+    amostras = {}
+    caminho_amostra = os.path.join(raiz, ARQUIVO_AMOSTRA)
+    if os.path.exists(caminho_amostra):
+        amostra = pd.read_parquet(caminho_amostra)
+        amostras = {
+            chave: grupo.drop(columns=COLUNA_PARTICAO).reset_index(drop=True)
+            for chave, grupo in amostra.groupby(COLUNA_PARTICAO, sort=False, observed=True)
+        }
+    return {chave: Esbocos.de_dict(d, amostras.get(chave)) for chave, d in dados.items()}
+
+
+def esbocos_em_dia(manifesto, raiz=DATA_DIR):
+    """
+    Indica se os esboços gravados correspondem à geração do manifesto.
+    Um armazenamento vazio tem, por definição, os esboços em dia.
+    """
+    if not os.path.exists(os.path.join(raiz, ARQUIVO_ESBOCOS)):
+        return not existe_armazem(raiz)
+    return manifesto.get("geracao_esbocos") == manifesto["geracao"]
+
+
+def atualizar_esbocos(esbocos_lote, raiz=DATA_DIR, transacao=None):
+    """
+    Soma os esboços de um lote (veja `esbocar_lote`) aos gravados e grava o
+    resultado (na `transacao`, se informada).
+    """
+    esbocos = mesclar_esbocos(_ler_esbocos(raiz), esbocos_lote)
+    gravar_esbocos(esbocos, raiz, transacao)
+    return esbocos
+
+
+def reconstruir_esbocos(raiz=DATA_DIR):
+    """
+    Reconstrói os esboços a partir de todas as partições, arquivo por
+    arquivo. Usa a trava de escrita e uma transação, como `reconstruir_cubo`.
+    """
+    from .ingestao import calcular_chaves
+
+    with trava_escrita(raiz):
+        manifesto = ler_manifesto(raiz)
+        esbocos = {}
+        for arquivo in listar_arquivos(raiz):
+            parte = pq.read_table(arquivo).to_pandas()
+            if precisa_normalizar(parte):
+                parte, _ = normalizar_lote(parte)
+            if COLUNA_CHAVE not in parte.columns:
+                parte[COLUNA_CHAVE] = calcular_chaves(parte)
+            esbocos = mesclar_esbocos(esbocos, esbocar_lote(parte))
+
+        with Transacao(raiz) as transacao:
+            gravar_esbocos(esbocos, raiz, transacao)
+            manifesto["geracao_esbocos"] = manifesto["geracao"]
+            transacao.confirmar(manifesto)
+    return esbocos
+
+
+def carregar_esbocos(raiz=DATA_DIR):
+    """
+    Carrega os esboços gravados. Se eles não existirem ou estiverem
+    defasados em relação à geração do armazenamento, são reconstruídos.
+    """
+    if not esbocos_em_dia(ler_manifesto(raiz), raiz):
+        return reconstruir_esbocos(raiz)
+    return _ler_esbocos(raiz)
+
+
+# ===== CONSULTA =====
+
+class Aproximador:
+    """
+    Respostas aproximadas para as seleções da barra lateral, com limite de
+    erro. Seleções que cobrem meses inteiros (sem filtro, ou só um intervalo
+    de datas alinhado aos meses) são respondidas pelos esboços das
+    partições; as demais, pela amostra estratificada por mês, em que cada
+    linha pesa linhas da partição / linhas da amostra da partição.
+    """
+
+    def __init__(self, esbocos):
+        self.esbocos = esbocos
+        partes = [
+            esbocos_particao.amostra.assign(**{
+                COLUNA_PARTICAO: chave, COLUNA_PESO: esbocos_particao.linhas / esbocos_particao.amostra.shape[0],
+            })
+            for chave, esbocos_particao in esbocos.items()
+            if not esbocos_particao.amostra.empty
+        ]
+        self.amostra = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
+
+    def _particoes(self, selecoes):
+        """
+        Retorna as partições que respondem exatamente às seleções, ou None se
+        elas precisarem da amostra.
+        """
+        if any(valores for coluna, valores in selecoes.items() if coluna != COLUMN_DATA):
+            return None
+        intervalo = selecoes.get(COLUMN_DATA)
+        if not intervalo:
+            return list(self.esbocos)
+        meses = meses_do_intervalo(intervalo)
+        if meses is None:
+            return None
+        chaves = (f"{(numero - 1) // 12}-{(numero - 1) % 12 + 1}" for numero in meses)
+        return [chave for chave in chaves if chave in self.esbocos]
+
+    def _combinar(self, particoes, atributo, coluna):
+        """
+        Soma os esboços `atributo` da coluna nas partições (None se nenhuma o tiver).
+        """
+        combinado = None
+        for chave in particoes:
+            esboco = getattr(self.esbocos[chave], atributo).get(coluna)
+            if esboco is not None:
+                combinado = esboco if combinado is None else combinado.mesclar(esboco)
+        return combinado
+
+    def _selecionar_amostra(self, selecoes):
+        """
+        Retorna as linhas da amostra que atendem às seleções.
+        """
+        amostra = self.amostra
+        if amostra.empty:
+            return amostra
+        mascara = np.ones(amostra.shape[0], dtype=bool)
+        for coluna, valores in selecoes.items():
+            if not valores or coluna not in amostra.columns:
+                continue
+            if coluna == COLUMN_DATA:
+                inicio, fim = intervalo_de_datas(valores)
+                datas = amostra[COLUMN_DATA]
+                condicao = (datas >= inicio) & (datas < fim + pd.Timedelta(days=1))
+                mascara &= condicao.fillna(False).to_numpy(dtype=bool)
+            else:
+                mascara &= amostra[coluna].astype(object).isin(valores).to_numpy()
+        return amostra[mascara]
+
+    def resumo(self, selecoes, colunas):
+        """
+        Retorna o resumo estatístico aproximado das colunas como um dicionário:
+        "tabela" (no formato do describe), "fonte" (esboços ou amostra),
+        "erro_posto" (erro de posto dos percentis, em fração do total),
+        "exatas" (linhas da tabela que são exatas) e "base" (linhas usadas:
+        as das partições ou as da amostra).
+        """
+        fracoes = [0.25, 0.5, 0.75]
+        tabela = {}
+        particoes = self._particoes(selecoes)
+        if particoes is not None:
+            erros = [0.0]
+            for col in colunas:
+                esboco = self._combinar(particoes, "quantis", col)
+                if esboco is None or not esboco.n:
+                    continue
+                tabela[col] = [esboco.n, esboco.media, esboco.desvio(), esboco.minimo,
+                               *esboco.quantis(fracoes), esboco.maximo]
+                erros.append(esboco.erro_posto())
+            return {
+                "tabela": pd.DataFrame(tabela, index=LINHAS_RESUMO, dtype="float64"),
+                "fonte": FONTE_ESBOCOS,
+                "erro_posto": max(erros),
+                "exatas": ["count", "mean", "std", "min", "max"],
+                "base": sum(self.esbocos[chave].linhas for chave in particoes),
+            }
+
+        amostra = self._selecionar_amostra(selecoes)
+        efetivas = []
+        for col in colunas:
+            if col not in amostra.columns:
+                continue
+            valores = pd.to_numeric(amostra[col], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+            validos = ~np.isnan(valores)
+            valores, pesos = valores[validos], amostra[COLUNA_PESO].to_numpy()[validos]
+            if not len(valores):
+                continue
+            total = pesos.sum()
+            media = float((valores * pesos).sum() / total)
+            desvio = math.sqrt((pesos * (valores - media) ** 2).sum() / (total - 1)) if total > 1 else np.nan
+            tabela[col] = [total, media, desvio, valores.min(), *_quantis_ponderados(valores, pesos, fracoes), valores.max()]
+            # Tamanho efetivo da amostra ponderada (Kish)
+            efetivas.append(total ** 2 / (pesos ** 2).sum())
+        # Desigualdade de Dvoretzky-Kiefer-Wolfowitz para a função de distribuição
+        erro = math.sqrt(math.log(2 / (1 - CONFIANCA)) / (2 * min(efetivas))) if efetivas else 0.0
+        return {
+            "tabela": pd.DataFrame(tabela, index=LINHAS_RESUMO, dtype="float64"),
+            "fonte": FONTE_AMOSTRA,
+            "erro_posto": min(erro, 1.0),
+            "exatas": [],
+            "base": amostra.shape[0],
+        }
+
+    def distintos(self, selecoes, colunas):
+        """
+        Retorna o número de valores distintos de cada coluna, com as colunas
+        "coluna", "estimativa", "inferior" e "superior". Pela amostra, só há
+        o limite inferior (os distintos vistos na amostra).
+        """
+        linhas = []
+        particoes = self._particoes(selecoes)
+        amostra = self._selecionar_amostra(selecoes) if particoes is None else None
+        for col in colunas:
+            if particoes is not None:
+                esboco = self._combinar(particoes, "distintos", col)
+                if esboco is None:
+                    continue
+                estimativa, erro = esboco.estimativa(), esboco.erro_relativo()
+                linhas.append([col, estimativa, estimativa * (1 - erro), estimativa * (1 + erro)])
+            elif col in amostra.columns:
+                vistos = amostra[col].nunique()
+                linhas.append([col, vistos, vistos, np.nan])
+        return pd.DataFrame(linhas, columns=["coluna", "estimativa", "inferior", "superior"])
+
+    def frequentes(self, selecoes, coluna, quantidade=10):
+        """
+        Retorna os `quantidade` valores mais frequentes da coluna, com as
+        colunas `coluna`, "estimativa", "inferior" e "superior" (número de linhas).
+        """
+        colunas = [coluna, "estimativa", "inferior", "superior"]
+        particoes = self._particoes(selecoes)
+        if particoes is not None:
+            esboco = self._combinar(particoes, "frequentes", coluna)
+            if esboco is None:
+                return pd.DataFrame(columns=colunas)
+            return pd.DataFrame(
+                [[valor, total, total, total + esboco.erro] for valor, total in esboco.mais_frequentes(quantidade)],
+                columns=colunas,
+            )
+
+        amostra = self._selecionar_amostra(selecoes)
+        if coluna not in amostra.columns or amostra.empty:
+            return pd.DataFrame(columns=colunas)
+        pesos = amostra[COLUNA_PESO]
+        grupos = pd.DataFrame({"valor": amostra[coluna].astype(object), "peso": pesos, "quadrado": pesos ** 2})
+        somas = grupos.dropna(subset=["valor"]).groupby("valor")[["peso", "quadrado"]].sum()
+        somas = somas.sort_values("peso", ascending=False).head(quantidade)
+        margem = Z_CONFIANCA * np.sqrt(somas["quadrado"])
+        return pd.DataFrame({
+            coluna: somas.index,
+            "estimativa": somas["peso"].to_numpy(),
+            "inferior": np.maximum(somas["peso"] - margem, 0).to_numpy(),
+            "superior": (somas["peso"] + margem).to_numpy(),
+        })
+
+    def linhas(self, selecoes, colunas, limite):
+        """
+        Retorna até `limite` linhas da amostra das seleções, repartidas entre
+        os meses em proporção ao número estimado de linhas selecionadas em
+        cada um, em ordem de data.
+        """
+        amostra = self._selecionar_amostra(selecoes)
+        if amostra.empty:
+            return pd.DataFrame(columns=colunas)
+        estimadas = amostra.groupby(COLUNA_PARTICAO, sort=False)[COLUNA_PESO].sum()
+        cotas = estimadas / estimadas.sum() * min(limite, amostra.shape[0])
+        inteiras = np.floor(cotas).astype(int)
+        # Maiores restos: as linhas que sobram vão para os meses mais prejudicados pelo arredondamento
+        sobra = min(limite, amostra.shape[0]) - int(inteiras.sum())
+        inteiras[(cotas - inteiras).sort_values(ascending=False).index[:sobra]] += 1
+        escolhidas = pd.concat([
+            grupo.head(int(inteiras[chave]))
+            for chave, grupo in amostra.groupby(COLUNA_PARTICAO, sort=False)
+        ])
+        if COLUMN_DATA in escolhidas.columns:
+            escolhidas = escolhidas.sort_values(COLUMN_DATA, kind="stable")
+        return escolhidas[[col for col in colunas if col in escolhidas.columns]].reset_index(drop=True)
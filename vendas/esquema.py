@@ -0,0 +1,152 @@
+"""
+Definição das colunas conhecidas dos dados de vendas e do esquema de tipos
+do armazenamento.
+"""
+
+import pandas as pd
+
+# ===== DEFINIÇÃO DAS COLUNAS =====
+COLUMN_DATA = 'data'
+COLUMN_VALOR_TOTAL = 'valor total'
+COLUMN_QUANTIDADE = 'quantidade'
+COLUMN_TAXA = 'taxa'
+COLUMN_RENDA_ESTIMADA = 'renda estimada'
+COLUMN_SUBTOTAL_PRODUTO = 'subtotal do produto'
+COLUMN_TAMANHO = 'tamanho'
+COLUMN_PRODUTO = 'produto'
+COLUMN_TIPO = 'tipo'
+COLUMN_STATUS = 'status'
+COLUMN_DEVOLUCAO = 'quantidade devolução'
+COLUMN_UF = 'uf'
+COLUMN_MES = 'mês'
+COLUMN_ANO = 'ano'
+
+# Colunas lidas dos arquivos e usadas pelo dashboard, na ordem de exibição
+COLUNAS_ORIGEM = [
+    COLUMN_DATA,
+    COLUMN_PRODUTO,
+    COLUMN_TAMANHO,
+    COLUMN_TIPO,
+    COLUMN_STATUS,
+    COLUMN_UF,
+    COLUMN_QUANTIDADE,
+    COLUMN_VALOR_TOTAL,
+    COLUMN_SUBTOTAL_PRODUTO,
+    COLUMN_TAXA,
+    COLUMN_RENDA_ESTIMADA,
+    COLUMN_DEVOLUCAO,
+]
+
+# Colunas derivadas da data durante a normalização
+COLUNAS_DERIVADAS = [COLUMN_MES, COLUMN_ANO]
+
+# Valores da coluna de mês (nomes em inglês, como em Series.dt.month_name()), em ordem
+NOMES_MESES = [
+    'January', 'February', 'March', 'April', 'May', 'June',
+    'July', 'August', 'September', 'October', 'November', 'December',
+]
+
+COLUNAS_DASHBOARD = COLUNAS_ORIGEM + COLUNAS_DERIVADAS
+
+# Colunas de baixa cardinalidade gravadas como categóricas (dicionário) e
+# indexadas por valor para os filtros da barra lateral
+COLUNAS_CATEGORICAS = [COLUMN_PRODUTO, COLUMN_STATUS, COLUMN_TAMANHO, COLUMN_UF, COLUMN_MES]
+
+# Tipo esperado de cada coluna de origem, aplicado uma vez na ingestão:
+#   "data"     -> datetime no formato dd/mm/aaaa
+#   "decimal"  -> float
+#   "inteiro"  -> inteiro (float se houver valores fracionários)
+#   "codigo"   -> inteiro representado como texto ("38"); inválidos viram "NaN"
+#   "texto"    -> texto
+ESQUEMA_NORMALIZACAO = {
+    COLUMN_DATA: "data",
+    COLUMN_VALOR_TOTAL: "decimal",
+    COLUMN_QUANTIDADE: "inteiro",
+    COLUMN_TAXA: "decimal",
+    COLUMN_RENDA_ESTIMADA: "decimal",
+    COLUMN_SUBTOTAL_PRODUTO: "decimal",
+    COLUMN_DEVOLUCAO: "decimal",
+    COLUMN_TAMANHO: "codigo",
+    COLUMN_PRODUTO: "texto",
+    COLUMN_STATUS: "texto",
+    COLUMN_TIPO: "texto",
+    COLUMN_UF: "texto",
+}
+
+
+# ===== ESQUEMA =====
+
+def tipo_coluna(serie):
+    """
+    Classifica o tipo de uma coluna em um dos tipos lógicos do armazenamento.
+    """
+    if pd.api.types.is_bool_dtype(serie):
+        return "boolean"
+    if pd.api.types.is_integer_dtype(serie):
+        return "Int64"
+    if pd.api.types.is_float_dtype(serie):
+        return "float64"
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return "datetime64[ns]"
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        return "category"
+    return "string"
+
+
+def _combinar_tipos(tipo_atual, tipo_novo):
+    """
+    Retorna o tipo mais estreito capaz de representar os dois tipos.
+    """
+    if tipo_atual == tipo_novo:
+        return tipo_atual
+    if {tipo_atual, tipo_novo} == {"Int64", "float64"}:
+        return "float64"
+    if {tipo_atual, tipo_novo} == {"category", "string"}:
+        return "category"
+    return "string"
+
+
+def mesclar_esquema(esquema_atual, df):
+    """
+    Mescla o esquema do armazenamento com as colunas de um novo lote.
+
+    Colunas novas são adicionadas ao esquema; colunas com tipos divergentes
+    são promovidas ao tipo comum mais estreito. Retorna o novo esquema e um
+    relatório com as colunas novas, ausentes no lote e promovidas. O primeiro
+    lote apenas cria o esquema e não reporta colunas novas.
+    """
+    esquema = dict(esquema_atual)
+    relatorio = {"colunas_novas": [], "colunas_ausentes": [], "colunas_promovidas": {}}
+
+    for col in df.columns:
+        tipo_lote = tipo_coluna(df[col])
+        if col not in esquema:
+            esquema[col] = tipo_lote
+            if esquema_atual:
+                relatorio["colunas_novas"].append(col)
+            continue
+        tipo_comum = _combinar_tipos(esquema[col], tipo_lote)
+        if tipo_comum != esquema[col]:
+            relatorio["colunas_promovidas"][col] = f"{esquema[col]} -> {tipo_comum}"
+            esquema[col] = tipo_comum
+
+    relatorio["colunas_ausentes"] = [col for col in esquema_atual if col not in df.columns]
+    return esquema, relatorio
+
+
+def aplicar_esquema(df, esquema):
+    """
+    Converte as colunas do DataFrame para os tipos do esquema.
+    Colunas fora do esquema são mantidas como estão.
+    """
+    for col, tipo in esquema.items():
+        if col not in df.columns or tipo_coluna(df[col]) == tipo:
+            continue
+        if tipo == "string" and pd.api.types.is_float_dtype(df[col]):
+            # Evita "38.0" quando a coluna contém apenas inteiros
+            serie = df[col]
+            if serie.dropna().mod(1).eq(0).all():
+                df[col] = serie.astype("Int64").astype("string")
+                continue
+        df[col] = df[col].astype(tipo)
+    return df
@@ -0,0 +1,178 @@
+"""
+Exportação dos dados filtrados em CSV, Parquet ou Excel.
+
+Os arquivos são gerados em blocos a partir do motor de consulta, sem montar
+o resultado inteiro em memória, e gravados em um diretório temporário. O nome
+do arquivo é derivado da versão dos dados, das seleções, das colunas e do
+formato, de modo que uma exportação já gerada para o mesmo estado dos filtros
+é reaproveitada.
+
+O CSV segue o padrão usado na entrada (decimal "," e datas dd/mm/aaaa) e pode
+ser enviado de volta ao dashboard.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import uuid
+
+import pandas as pd
+
+# ===== CONSTANTES =====
+FORMATOS_EXPORTACAO = {
+    "csv": {"rotulo": "CSV", "mime": "text/csv"},
+    "parquet": {"rotulo": "Parquet", "mime": "application/vnd.apache.parquet"},
+    "xlsx": {
+        "rotulo": "Excel (.xlsx)",
+        "mime": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    },
+}
+DIRETORIO_EXPORTACOES = os.path.join(tempfile.gettempdir(), "dashboard_vendas_exportacoes")
+TAMANHO_BLOCO_EXPORTACAO = 50_000
+MAX_EXPORTACOES = 20
+LIMITE_LINHAS_EXCEL = 1_048_575  # Limite de linhas de uma planilha, sem o cabeçalho
+
+
+def chave_exportacao(versao, selecoes, colunas, formato):
+    """
+    Calcula a chave de uma exportação a partir da versão dos dados, das
+    seleções (sem depender da ordem), das colunas e do formato.
+    """
+    estado = {
+        "versao": versao,
+        "selecoes": {col: sorted(map(str, valores)) for col, valores in selecoes.items() if valores},
+        "colunas": list(colunas),
+        "formato": formato,
+    }
+    texto = json.dumps(estado, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()[:16]
+
+
+def _preparar_bloco(bloco):
+    """
+    Converte colunas categóricas para texto, para que todos os blocos tenham
+    o mesmo tipo independentemente das categorias presentes.
+    """
+    categoricas = [col for col in bloco.columns if isinstance(bloco[col].dtype, pd.CategoricalDtype)]
+    if not categoricas:
+        return bloco
+    return bloco.astype({col: "string" for col in categoricas})
+
+
+def _blocos_exportacao(motor, selecoes, colunas):
+    """
+    Gera os blocos a exportar. Um resultado vazio gera um único bloco vazio,
+    para que o arquivo tenha ao menos o cabeçalho.
+    """
+    vazio = True
+    for bloco in motor.blocos(selecoes, colunas, TAMANHO_BLOCO_EXPORTACAO):
+        vazio = False
+        yield _preparar_bloco(bloco)
+    if vazio:
+        yield pd.DataFrame(columns=list(colunas))
+
+
+# ===== ESCRITORES =====
+
+def _gravar_csv(blocos, caminho):
+    """
+    Grava os blocos em CSV (UTF-8, decimal "," e datas dd/mm/aaaa).
+    """
+    with open(caminho, "w", encoding="utf-8", newline="") as arquivo:
+        for i, bloco in enumerate(blocos):
+            bloco.to_csv(arquivo, index=False, header=i == 0, decimal=",", date_format="%d/%m/%Y")
+
+
+def _gravar_parquet(blocos, caminho):
+    """
+    Grava os blocos em Parquet, um grupo de linhas por bloco.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    escritor = None
+    try:
+        for bloco in blocos:
+            if escritor is None:
+                tabela = pa.Table.from_pandas(bloco, preserve_index=False)
+                escritor = pq.ParquetWriter(caminho, tabela.schema, compression="zstd")
+            else:
+                tabela = pa.Table.from_pandas(bloco, schema=escritor.schema, preserve_index=False)
+            escritor.write_table(tabela)
+    finally:
+        if escritor is not None:
+            escritor.close()
+
+
+def _gravar_xlsx(blocos, caminho, colunas):
+    """
+    Grava os blocos em uma planilha Excel, em modo de escrita contínua.
+    """
+    from openpyxl import Workbook
+
+    pasta = Workbook(write_only=True)
+    planilha = pasta.create_sheet("dados")
+    planilha.append(list(colunas))
+    linhas = 0
+    for bloco in blocos:
+        linhas += bloco.shape[0]
+        if linhas > LIMITE_LINHAS_EXCEL:
+            raise ValueError(
+                f"O resultado tem mais de {LIMITE_LINHAS_EXCEL:,} linhas, o limite de uma planilha Excel. "
+                "Use CSV ou Parquet."
+            )
+        valores = bloco.astype(object).where(bloco.notna(), None)
+        for linha in valores.itertuples(index=False, name=None):
+            planilha.append(linha)
+    pasta.save(caminho)
+
+
+# ===== EXPORTAÇÃO =====
+
+def _limpar_antigas(diretorio, manter=MAX_EXPORTACOES):
+    """
+    Remove as exportações mais antigas, mantendo as `manter` mais recentes.
+    """
+    arquivos = [
+        os.path.join(diretorio, nome) for nome in os.listdir(diretorio) if not nome.startswith(".")
+    ]
+    arquivos.sort(key=os.path.getmtime, reverse=True)
+    for caminho in arquivos[manter:]:
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
+
+
+def exportar(motor, versao, selecoes, colunas, formato, diretorio=DIRETORIO_EXPORTACOES):
+    """
+    Exporta as linhas selecionadas, nas colunas pedidas, no formato informado
+    ("csv", "parquet" ou "xlsx"). Retorna o caminho do arquivo gerado; se a
+    mesma exportação já existir, ela é reaproveitada sem consultar o motor.
+    """
+    if formato not in FORMATOS_EXPORTACAO:
+        raise ValueError(f"Formato de exportação desconhecido: {formato}")
+
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = os.path.join(diretorio, f"{chave_exportacao(versao, selecoes, colunas, formato)}.{formato}")
+    if os.path.exists(caminho):
+        os.utime(caminho)
+        return caminho
+
+    blocos = _blocos_exportacao(motor, selecoes, colunas)
+    temporario = os.path.join(diretorio, f".{uuid.uuid4().hex}.{formato}.tmp")
+    try:
+        if formato == "csv":
+            _gravar_csv(blocos, temporario)
+        elif formato == "parquet":
+            _gravar_parquet(blocos, temporario)
+        else:
+            _gravar_xlsx(blocos, temporario, colunas)
+        os.replace(temporario, caminho)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+
+    _limpar_antigas(diretorio)
+    return caminho
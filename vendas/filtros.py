@@ -0,0 +1,34 @@
+"""
+Aplicação dos filtros da barra lateral sobre o conjunto compartilhado.
+
+Os filtros são resolvidos pelo índice de posições das colunas categóricas
+(`vendas.indices`) em vez de cópias do DataFrame; apenas as linhas
+selecionadas são materializadas, e somente quando há filtro.
+
+A coluna de data é filtrada por intervalo: a seleção é a lista
+[início, fim] (datas, inclusive), em vez dos valores aceitos.
+"""
+
+import pandas as pd
+
+
+def intervalo_de_datas(valores):
+    """
+    Converte a seleção da coluna de data em uma tupla (início, fim) de
+    Timestamps à meia-noite. Um único valor seleciona um dia.
+    """
+    datas = [pd.Timestamp(valor).normalize() for valor in valores]
+    return min(datas), max(datas)
+
+
+def aplicar_posicoes(df, posicoes):
+    """
+    Retorna as linhas nas posições informadas; sem posições (nenhum filtro),
+    o próprio DataFrame compartilhado é retornado, sem cópia.
+    """
+    if posicoes is None:
+        return df
+    if isinstance(posicoes, range):
+        return df.iloc[posicoes.start:posicoes.stop]
+    return df.take(posicoes)
+
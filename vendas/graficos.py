@@ -0,0 +1,70 @@
+"""
+Gráficos do dashboard (Plotly), construídos a partir das agregações.
+
+O Plotly Express é importado apenas quando o primeiro gráfico é construído,
+para não pesar na inicialização de quem não desenha gráficos (linha de
+comando, páginas sem dados).
+"""
+
+
+def criar_grafico_pizza(df, coluna, titulo, coluna_contagem=None):
+    """
+    Cria um gráfico de pizza usando Plotly.
+    Com `coluna_contagem`, as contagens já agregadas (ex.: linhas do cubo) são somadas.
+    """
+    import plotly.express as px
+
+    if coluna not in df.columns:
+        return None
+
+    if coluna_contagem is not None:
+        dados = df.groupby(coluna, observed=True)[coluna_contagem].sum().sort_values(ascending=False).head(10)
+    else:
+        dados = df[coluna].value_counts().head(10)
+    dados = dados[dados > 0]
+
+    fig = px.pie(
+        values=dados.values,
+        names=dados.index,
+        title=titulo,
+        color_discrete_sequence=px.colors.qualitative.Set3
+    )
+
+    fig.update_traces(textposition='inside', textinfo='percent+label')
+    fig.update_layout(
+        font=dict(size=12),
+        showlegend=True,
+        height=400
+    )
+
+    return fig
+
+
+def criar_grafico_barras(df, x_col, y_col, titulo):
+    """
+    Cria um gráfico de barras usando Plotly.
+    """
+    import plotly.express as px
+
+    if x_col not in df.columns or y_col not in df.columns:
+        return None
+
+    dados = df.groupby(x_col, observed=True)[y_col].sum().reset_index()
+
+    fig = px.bar(
+        dados,
+        x=x_col,
+        y=y_col,
+        title=titulo,
+        color=y_col,
+        color_continuous_scale='Viridis'
+    )
+
+    fig.update_layout(
+        xaxis_title=x_col.title(),
+        yaxis_title=y_col.title(),
+        font=dict(size=12),
+        height=400
+    )
+
+    return fig
@@ -0,0 +1,140 @@
+"""
+Índices de posições por valor para as colunas categóricas.
+
+Para cada coluna, as linhas são ordenadas uma única vez pelo código da
+categoria; as posições de um valor formam então uma fatia contígua dessa
+ordem. Um filtro com k valores selecionados custa k fatias, e filtros em
+colunas diferentes são combinados pela interseção das posições, sem
+comparar textos linha a linha.
+
+A coluna de data dispensa a ordenação: o DataFrame já vem ordenado pela data
+(veja `carregar_dados`), e um intervalo de datas é uma fatia contígua das
+linhas, encontrada por busca binária.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .filtros import intervalo_de_datas
+
+
+class IndicePosicoes:
+    """
+    Índice de posições das linhas por valor de uma coluna categórica.
+    """
+
+    def __init__(self, serie):
+        if not isinstance(serie.dtype, pd.CategoricalDtype):
+            serie = serie.astype("category")
+        # Código 0 reservado para valores ausentes
+        codigos = serie.cat.codes.to_numpy().astype(np.int64) + 1
+        contagens = np.bincount(codigos, minlength=len(serie.cat.categories) + 1)
+        tipo_posicao = np.int32 if len(serie) < np.iinfo(np.int32).max else np.int64
+
+        self.ordem = np.argsort(codigos, kind="stable").astype(tipo_posicao)
+        self.inicios = np.concatenate([[0], np.cumsum(contagens)])
+        self.codigos = {valor: i + 1 for i, valor in enumerate(serie.cat.categories)}
+        self.contagens = {valor: int(contagens[i + 1]) for i, valor in enumerate(serie.cat.categories)}
+
+    def valores(self):
+        """
+        Retorna os valores presentes na coluna, em ordem crescente.
+        """
+        return sorted(valor for valor, contagem in self.contagens.items() if contagem > 0)
+
+    def posicoes(self, valores):
+        """
+        Retorna as posições (ordenadas) das linhas com qualquer um dos valores.
+        """
+        fatias = [
+            self.ordem[self.inicios[codigo]:self.inicios[codigo + 1]]
+            for codigo in (self.codigos.get(valor) for valor in valores)
+            if codigo is not None
+        ]
+        if not fatias:
+            return np.array([], dtype=self.ordem.dtype)
+        if len(fatias) == 1:
+            return fatias[0]
+        return np.sort(np.concatenate(fatias))
+
+
+class IndiceDatas:
+    """
+    Índice de uma coluna de datas já ordenada (datas ausentes no fim).
+    """
+
+    def __init__(self, serie):
+        self.datas = serie.to_numpy()
+        self.unidade = np.datetime_data(self.datas.dtype)[0]
+        # As datas ausentes (NaT) ficam depois da última data válida
+        self.validas = int(serie.notna().sum())
+
+    def extremos(self):
+        """
+        Retorna a primeira e a última data (ou None, None se não houver datas).
+        """
+        if not self.validas:
+            return None, None
+        return pd.Timestamp(self.datas[0]), pd.Timestamp(self.datas[self.validas - 1])
+
+    def fatia(self, inicio, fim):
+        """
+        Retorna o intervalo de posições [a, b) das linhas com data entre
+        `inicio` e `fim` (Timestamps à meia-noite), inclusive o dia `fim` inteiro.
+        """
+        validas = self.datas[:self.validas]
+        inicio = inicio.to_datetime64().astype(f"datetime64[{self.unidade}]")
+        depois_do_fim = (fim + pd.Timedelta(days=1)).to_datetime64().astype(f"datetime64[{self.unidade}]")
+        return (
+            int(np.searchsorted(validas, inicio, side="left")),
+            int(np.searchsorted(validas, depois_do_fim, side="left")),
+        )
+
+
+class IndiceCategorias:
+    """
+    Conjunto de índices de posições das colunas categóricas de um DataFrame
+    e, com `coluna_data`, da coluna de datas (o DataFrame deve estar ordenado
+    por ela).
+    """
+
+    def __init__(self, df, colunas, coluna_data=None):
+        self.total_linhas = df.shape[0]
+        self.indices = {col: IndicePosicoes(df[col]) for col in colunas if col in df.columns}
+        datas = coluna_data in df.columns and pd.api.types.is_datetime64_any_dtype(df[coluna_data])
+        self.coluna_data = coluna_data if datas else None
+        self.datas = IndiceDatas(df[coluna_data]) if self.coluna_data else None
+
+    def valores(self, coluna):
+        """
+        Retorna os valores presentes em uma coluna indexada.
+        """
+        return self.indices[coluna].valores()
+
+    def selecionar(self, selecoes):
+        """
+        Combina as seleções (dicionário coluna -> valores aceitos): valores de
+        uma mesma coluna são unidos (OU) e colunas diferentes são intersectadas
+        (E). Na coluna de datas, a seleção é o intervalo [início, fim].
+        Seleções vazias são ignoradas. Retorna as posições selecionadas, em
+        ordem crescente (um `range` quando só há o intervalo de datas), ou
+        None quando nenhum filtro está ativo.
+        """
+        candidatos = [
+            self.indices[coluna].posicoes(valores)
+            for coluna, valores in selecoes.items()
+            if valores and coluna in self.indices
+        ]
+        intervalo = selecoes.get(self.coluna_data) if self.coluna_data else None
+        fatia = self.datas.fatia(*intervalo_de_datas(intervalo)) if intervalo else None
+        if not candidatos:
+            return None if fatia is None else range(*fatia)
+
+        candidatos.sort(key=len)
+        posicoes = candidatos[0]
+        for outras in candidatos[1:]:
+            posicoes = np.intersect1d(posicoes, outras, assume_unique=True)
+        if fatia is not None:
+            # As posições estão em ordem crescente, como as datas
+            posicoes = posicoes[np.searchsorted(posicoes, fatia[0]):np.searchsorted(posicoes, fatia[1])]
+        return posicoes
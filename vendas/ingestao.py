@@ -0,0 +1,595 @@
+"""
+Ingestão incremental e idempotente de lotes no armazenamento.
+
+Cada arquivo recebido é identificado pelo hash SHA-256 do seu conteúdo e
+registrado no manifesto; um arquivo já ingerido é ignorado sem ser lido.
+Arquivos novos são ingeridos em blocos: cada bloco passa por uma mesclagem
+explícita de esquema e tem descartadas as linhas que já existem no
+armazenamento, comparando a chave de linha (`_chave`) apenas nas partições
+tocadas pelo bloco.
+
+Cada ingestão detém a trava de escrita do armazenamento do começo ao fim e
+grava o arquivo em uma única transação (veja `vendas.diario`): as partições,
+o cubo, os esboços do modo aproximado, o dicionário de produtos e o manifesto
+são publicados juntos na confirmação, e um upload simultâneo espera a vez em
+vez de sobrescrever o manifesto deste.
+
+A linha de comando e a fila de tarefas do dashboard ingerem os arquivos
+recebidos pela mesma função, `ingerir_fontes`.
+"""
+
+import hashlib
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from .armazenamento import (
+    COLUNA_CHAVE, DATA_DIR, anexar_particoes, existe_armazem,
+    ler_manifesto, listar_arquivos, particoes_do_lote, preparar_tipos,
+)
+from .cubo import agregar_cubo, atualizar_cubo, cubo_em_dia, mesclar_cubos, reconstruir_cubo
+from .diario import Transacao, trava_escrita
+from .esbocos import atualizar_esbocos, esbocar_lote, esbocos_em_dia, mesclar_esbocos, reconstruir_esbocos
+from .esquema import COLUNAS_CATEGORICAS, COLUNAS_ORIGEM, aplicar_esquema, mesclar_esquema
+from .leitura import (
+    EXTENSOES_EXCEL, TAMANHO_BLOCO, extensao, formato_suportado, ler_csv_em_blocos, ler_em_blocos,
+    listar_planilhas, sugerir_planilha,
+)
+from .normalizacao import EXEMPLOS_POR_COLUNA, normalizar_lote
+from .produtos import agregar_produtos, atualizar_produtos, mesclar_produtos, produtos_em_dia, reconstruir_produtos
+
+# ===== CONSTANTES =====
+# Situação de cada arquivo em `ingerir_fontes`
+SITUACAO_INGERIDO = "ingerido"
+SITUACAO_IGNORADO = "já ingerido"
+SITUACAO_ERRO = "erro"
+# Fração do andamento de `ingerir_fontes` ocupada pela preparação de vários arquivos
+FRACAO_PREPARACAO = 0.75
+
+
+# ===== IDENTIFICAÇÃO =====
+
+def hash_conteudo(conteudo):
+    """
+    Calcula o hash SHA-256 do conteúdo bruto de um arquivo.
+    """
+    return hashlib.sha256(conteudo).hexdigest()
+
+
+def hash_fluxo(arquivo, tamanho_leitura=1 << 20):
+    """
+    Calcula o hash SHA-256 de um arquivo aberto em modo binário, lendo-o em
+    pedaços. O arquivo volta para o início ao final.
+    """
+    resumo = hashlib.sha256()
+    arquivo.seek(0)
+    for pedaco in iter(lambda: arquivo.read(tamanho_leitura), b""):
+        resumo.update(pedaco)
+    arquivo.seek(0)
+    return resumo.hexdigest()
+
+
+def hash_planilha(hash_arquivo, planilha):
+    """
+    Identifica a ingestão de uma planilha específica de um arquivo Excel,
+    para que planilhas diferentes do mesmo arquivo possam ser ingeridas.
+    """
+    return hash_arquivo if planilha is None else f"{hash_arquivo}:{planilha}"
+
+
+def ja_ingerido(hash_arquivo, raiz=DATA_DIR):
+    """
+    Indica se um arquivo com este hash já foi ingerido.
+    """
+    return hash_arquivo in ler_manifesto(raiz)["ingestoes"]
+
+
+def _forma_canonica(df, colunas):
+    """
+    Retorna as colunas em tipos que não dependem do esquema de quem gravou o
+    arquivo: números (inteiros, decimais e booleanos) em float64 e datas em
+    datetime64[ns]. Textos já têm o mesmo hash em qualquer tipo de texto ou
+    categórico. Assim, uma linha mantém a chave depois que o esquema
+    promove uma coluna (ex.: quantidade de Int64 para float64).
+    """
+    canonica = {}
+    for col in colunas:
+        serie = df[col]
+        categorica = isinstance(serie.dtype, pd.CategoricalDtype)
+        if not categorica and (pd.api.types.is_bool_dtype(serie) or pd.api.types.is_numeric_dtype(serie)):
+            serie = serie.astype("float64")
+        elif pd.api.types.is_datetime64_any_dtype(serie):
+            serie = serie.astype("datetime64[ns]")
+        canonica[col] = serie.reset_index(drop=True)
+    return pd.DataFrame(canonica)
+
+
+def calcular_chaves(df, ocorrencias=None):
+    """
+    Calcula a chave de cada linha (hash de 64 bits) a partir das colunas
+    de origem conhecidas, em ordem alfabética para não depender da ordem do
+    arquivo, na forma canônica (veja `_forma_canonica`). As colunas
+    derivadas não entram na chave.
+
+    A exportação não tem identificador de pedido: duas vendas iguais (mesma
+    data, produto, tamanho, valor...) do mesmo arquivo são numeradas pela
+    ocorrência. A primeira fica com o hash das colunas e as seguintes com o
+    hash combinado ao número da ocorrência, de modo que reenviar o arquivo
+    gera as mesmas chaves sem descartar as vendas repetidas. `ocorrencias`
+    (dicionário hash -> linhas já vistas) continua a contagem dos blocos
+    anteriores do mesmo arquivo e é atualizado.
+    """
+    colunas = sorted(col for col in df.columns if col in COLUNAS_ORIGEM)
+    if not colunas:
+        colunas = sorted(col for col in df.columns if col != COLUNA_CHAVE)
+    hashes = pd.Series(pd.util.hash_pandas_object(_forma_canonica(df, colunas), index=False).to_numpy(dtype="uint64"))
+    ocorrencia = hashes.groupby(hashes, sort=False).cumcount().to_numpy(dtype="uint64")
+    if ocorrencias is not None:
+        if ocorrencias:
+            ocorrencia += hashes.map(ocorrencias).fillna(0).to_numpy(dtype="uint64")
+        for valor, quantidade in hashes.value_counts(sort=False).items():
+            ocorrencias[valor] = ocorrencias.get(valor, 0) + int(quantidade)
+
+    chaves = hashes.to_numpy()
+    repetidas = ocorrencia > 0
+    if repetidas.any():
+        combinadas = pd.DataFrame({
+            "hash": chaves[repetidas].astype("uint64"),
+            "ocorrencia": ocorrencia[repetidas].astype("uint64"),
+        })
+        chaves = chaves.copy()
+        chaves[repetidas] = pd.util.hash_pandas_object(combinadas, index=False).to_numpy(dtype="uint64")
+    return chaves
+
+
+def _chaves_existentes(particoes, esquema, raiz):
+    """
+    Lê as chaves de linha já gravadas nas partições informadas.
+    Arquivos anteriores à coluna `_chave` têm as chaves calculadas na leitura.
+    """
+    chaves = []
+    for arquivo in listar_arquivos(raiz, particoes=particoes):
+        if COLUNA_CHAVE in pq.ParquetFile(arquivo).schema_arrow.names:
+            tabela = pq.read_table(arquivo, columns=[COLUNA_CHAVE])
+            chaves.append(tabela.column(COLUNA_CHAVE).to_numpy())
+        else:
+            existente = aplicar_esquema(pq.read_table(arquivo).to_pandas(), esquema)
+            chaves.append(calcular_chaves(existente))
+
+    if not chaves:
+        return np.array([], dtype="uint64")
+    return np.unique(np.concatenate(chaves))
+
+
+# ===== INGESTÃO =====
+
+def _descartar_conhecidas(lote, conhecidas, esquema, raiz):
+    """
+    Descarta as linhas do lote cujas chaves já estão no armazenamento ou já
+    foram anexadas na transação. `conhecidas` é um dicionário com as
+    partições já lidas ("particoes") e o conjunto das chaves ("chaves"):
+    cada partição é lida uma única vez por transação, e as chaves das
+    linhas mantidas são acrescentadas ao conjunto.
+    """
+    particoes = particoes_do_lote(lote) - conhecidas["particoes"]
+    if particoes:
+        conhecidas["chaves"].update(_chaves_existentes(particoes, esquema, raiz).tolist())
+        conhecidas["particoes"] |= particoes
+    chaves = lote[COLUNA_CHAVE].tolist()
+    mantidas = np.fromiter((chave not in conhecidas["chaves"] for chave in chaves), dtype=bool, count=len(chaves))
+    lote = lote[mantidas]
+    conhecidas["chaves"].update(lote[COLUNA_CHAVE].tolist())
+    return lote
+
+
+def _ingerir_bloco(df, manifesto, raiz, transacao, ocorrencias, conhecidas):
+    """
+    Normaliza um bloco, mescla seu esquema ao do manifesto (em memória),
+    descarta as linhas já existentes no armazenamento e anexa o restante à
+    transação. `ocorrencias` é a contagem das linhas dos blocos anteriores
+    do arquivo (veja `calcular_chaves`); as chaves de um arquivo são únicas,
+    então nenhum bloco descarta linhas de outro. `conhecidas` guarda as
+    chaves lidas e anexadas nos blocos anteriores (veja `_descartar_conhecidas`).
+    Retorna uma tupla (lote anexado, relatório de normalização, relatório de esquema).
+    """
+    lote, relatorio_normalizacao = normalizar_lote(df)
+    lote = preparar_tipos(lote)
+    esquema, relatorio_esquema = mesclar_esquema(manifesto["esquema"], lote)
+    lote = aplicar_esquema(lote, esquema)
+    lote[COLUNA_CHAVE] = calcular_chaves(lote, ocorrencias)
+
+    lote = _descartar_conhecidas(lote, conhecidas, esquema, raiz)
+
+    anexar_particoes(lote, raiz, transacao)
+    manifesto["esquema"] = esquema
+    return lote, relatorio_normalizacao, relatorio_esquema
+
+
+def _registro_vazio(nome_arquivo):
+    """
+    Retorna o registro de uma ingestão ainda sem linhas.
+    """
+    return {
+        "arquivo": nome_arquivo,
+        "ingerido_em": None,
+        "linhas": 0,
+        "novas": 0,
+        "duplicadas": 0,
+        "normalizacao": {"falhas": {}, "exemplos": {}, "linhas_descartadas": 0},
+        "esquema": {"colunas_novas": [], "colunas_ausentes": [], "colunas_promovidas": {}},
+    }
+
+
+def _somar_normalizacao(normalizacao, relatorio, deslocamento):
+    """
+    Soma o relatório de normalização de um bloco ao de um arquivo. As linhas
+    de exemplo são renumeradas pela posição do bloco no arquivo (`deslocamento`).
+    """
+    normalizacao["linhas_descartadas"] += relatorio["linhas_descartadas"]
+    for col, falhas in relatorio["falhas"].items():
+        normalizacao["falhas"][col] = normalizacao["falhas"].get(col, 0) + falhas
+        exemplos = normalizacao["exemplos"].setdefault(col, [])
+        novos = [deslocamento + linha for linha in relatorio["exemplos"][col]]
+        exemplos.extend(novos[:EXEMPLOS_POR_COLUNA - len(exemplos)])
+
+
+def _somar_esquema(esquema, relatorio):
+    """
+    Soma o relatório de esquema de um bloco ao de um arquivo.
+    """
+    for chave in ("colunas_novas", "colunas_ausentes"):
+        esquema[chave] += [col for col in relatorio[chave] if col not in esquema[chave]]
+    esquema["colunas_promovidas"].update(relatorio["colunas_promovidas"])
+
+
+def _concluir_registro(registro, novas):
+    """
+    Completa o registro com as linhas novas, as duplicadas e o horário da ingestão.
+    """
+    registro["ingerido_em"] = pd.Timestamp.now().isoformat(timespec="seconds")
+    registro["novas"] = int(novas)
+    registro["duplicadas"] = registro["linhas"] - registro["normalizacao"]["linhas_descartadas"] - registro["novas"]
+    return registro
+
+
+def ingerir_blocos(blocos, hash_arquivo, nome_arquivo, raiz=DATA_DIR):
+    """
+    Ingere um arquivo no armazenamento, bloco a bloco, de forma idempotente.
+
+    `blocos` é um iterável de DataFrames; cada bloco é normalizado, deduplicado
+    e gravado na transação assim que chega, de modo que apenas um bloco fica
+    em memória. A transação (partições, cubo, registro da ingestão e nova
+    geração) só é confirmada ao final, então as sessões passam a ver o
+    arquivo inteiro de uma só vez.
+
+    Retorna o registro da ingestão (linhas lidas, novas, duplicadas e os
+    relatórios de normalização e esquema). Se o arquivo já foi ingerido,
+    retorna o registro original sem consumir os blocos.
+    """
+    with trava_escrita(raiz):
+        manifesto = ler_manifesto(raiz)
+        if hash_arquivo in manifesto["ingestoes"]:
+            return manifesto["ingestoes"][hash_arquivo]
+
+        registro = _registro_vazio(nome_arquivo)
+        novas = 0
+        ocorrencias = {}
+        conhecidas = {"particoes": set(), "chaves": set()}
+        cubo_lote = None
+        esbocos_lote = None
+        produtos_lote = None
+
+        # O cubo, os esboços e o dicionário de produtos são somados
+        # incrementalmente; se já estavam defasados, são reconstruídos
+        incremental = cubo_em_dia(manifesto, raiz)
+        esbocos_incrementais = esbocos_em_dia(manifesto, raiz)
+        produtos_incrementais = produtos_em_dia(manifesto, raiz)
+        with Transacao(raiz) as transacao:
+            for df in blocos:
+                lote, relatorio_normalizacao, relatorio_esquema = _ingerir_bloco(
+                    df, manifesto, raiz, transacao, ocorrencias, conhecidas
+                )
+                if incremental:
+                    cubo_lote = mesclar_cubos(cubo_lote, agregar_cubo(lote))
+                if esbocos_incrementais:
+                    esbocos_lote = mesclar_esbocos(esbocos_lote, esbocar_lote(lote))
+                if produtos_incrementais:
+                    produtos_lote = mesclar_produtos(produtos_lote, agregar_produtos(lote))
+                _somar_normalizacao(registro["normalizacao"], relatorio_normalizacao, registro["linhas"])
+                _somar_esquema(registro["esquema"], relatorio_esquema)
+                registro["linhas"] += df.shape[0]
+                novas += lote.shape[0]
+            if incremental:
+                atualizar_cubo(cubo_lote, raiz, transacao)
+            if esbocos_incrementais:
+                atualizar_esbocos(esbocos_lote, raiz, transacao)
+            if produtos_incrementais:
+                atualizar_produtos(produtos_lote, raiz, transacao)
+
+            manifesto["ingestoes"][hash_arquivo] = _concluir_registro(registro, novas)
+            manifesto["geracao"] += 1
+            if incremental:
+                manifesto["geracao_cubo"] = manifesto["geracao"]
+            if esbocos_incrementais:
+                manifesto["geracao_esbocos"] = manifesto["geracao"]
+            if produtos_incrementais:
+                manifesto["geracao_produtos"] = manifesto["geracao"]
+            transacao.confirmar(manifesto)
+        if not incremental:
+            reconstruir_cubo(raiz)
+        if not esbocos_incrementais:
+            reconstruir_esbocos(raiz)
+        if not produtos_incrementais:
+            reconstruir_produtos(raiz)
+    return registro
+
+
+# ===== INGESTÃO DE VÁRIOS ARQUIVOS =====
+
+def preparar_arquivo(conteudo, nome_arquivo, planilha=None, tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Lê e normaliza um arquivo (conteúdo em bytes) sem tocar o armazenamento,
+    de modo que pode ser executada em outro processo. `planilha` escolhe a
+    planilha de arquivos Excel (a primeira, se None).
+
+    Retorna um dicionário com o lote normalizado ("lote"), o número de linhas
+    lidas ("linhas") e o relatório de normalização ("normalizacao").
+    """
+    leitor = ler_em_blocos(io.BytesIO(conteudo), nome_arquivo, tamanho_bloco, planilha=planilha)
+    return normalizar_blocos((bloco for bloco, _ in leitor), nome_arquivo)
+
+
+def normalizar_blocos(blocos, nome_arquivo):
+    """
+    Normaliza os blocos lidos de um arquivo e os junta em um único lote.
+    Retorna um dicionário no formato de `preparar_arquivo`.
+    """
+    normalizacao = _registro_vazio(nome_arquivo)["normalizacao"]
+    partes = []
+    linhas = 0
+    for bloco in blocos:
+        lote, relatorio = normalizar_lote(bloco)
+        _somar_normalizacao(normalizacao, relatorio, linhas)
+        linhas += bloco.shape[0]
+        partes.append(preparar_tipos(lote))
+
+    lote = pd.concat(partes, ignore_index=True) if partes else pd.DataFrame()
+    # Categorias diferentes entre os blocos viram texto no concat
+    for col in COLUNAS_CATEGORICAS:
+        if col in lote.columns:
+            lote[col] = lote[col].astype("category")
+    return {"lote": lote, "linhas": linhas, "normalizacao": normalizacao}
+
+
+def ingerir_arquivos(preparados, raiz=DATA_DIR):
+    """
+    Ingere vários arquivos já preparados em uma única gravação: um arquivo
+    por partição, uma atualização do cubo e uma nova geração do manifesto.
+
+    `preparados` é uma lista de dicionários no formato de `preparar_arquivo`,
+    acrescidos das chaves "hash" e "arquivo" (nome). As linhas repetidas entre
+    os arquivos do lote contam como duplicadas do primeiro arquivo que as trouxe.
+    Retorna um dicionário hash -> registro da ingestão; arquivos já ingeridos
+    retornam o registro original.
+    """
+    with trava_escrita(raiz):
+        return _ingerir_preparados(preparados, raiz)
+
+
+def _ingerir_preparados(preparados, raiz):
+    """
+    Corpo de `ingerir_arquivos`, executado com a trava de escrita.
+    """
+    manifesto = ler_manifesto(raiz)
+    registros = {}
+    novos = []
+    for preparado in preparados:
+        hash_arquivo = preparado["hash"]
+        if hash_arquivo in manifesto["ingestoes"]:
+            registros[hash_arquivo] = manifesto["ingestoes"][hash_arquivo]
+            continue
+        if hash_arquivo in registros:
+            continue
+        esquema, relatorio_esquema = mesclar_esquema(manifesto["esquema"], preparado["lote"])
+        manifesto["esquema"] = esquema
+        registro = _registro_vazio(preparado["arquivo"])
+        registro.update(linhas=preparado["linhas"], normalizacao=preparado["normalizacao"], esquema=relatorio_esquema)
+        registros[hash_arquivo] = registro
+        novos.append(preparado)
+    if not novos:
+        return registros
+
+    esquema = manifesto["esquema"]
+    origem = np.repeat(np.arange(len(novos)), [preparado["lote"].shape[0] for preparado in novos])
+    lote = aplicar_esquema(pd.concat([preparado["lote"] for preparado in novos], ignore_index=True), esquema)
+    # Chaves por arquivo, como na ingestão de um arquivo só: as vendas
+    # repetidas dentro de um arquivo são mantidas, e uma linha que outro
+    # arquivo do lote já trouxe conta como duplicada, como se os arquivos
+    # fossem ingeridos um depois do outro
+    limites = np.cumsum([0] + [preparado["lote"].shape[0] for preparado in novos])
+    lote[COLUNA_CHAVE] = np.concatenate([
+        calcular_chaves(lote.iloc[inicio:fim]) for inicio, fim in zip(limites[:-1], limites[1:])
+    ])
+    existentes = _chaves_existentes(particoes_do_lote(lote), esquema, raiz)
+    mantidas = (~lote[COLUNA_CHAVE].duplicated() & ~lote[COLUNA_CHAVE].isin(existentes)).to_numpy()
+    lote = lote[mantidas]
+    novas_por_arquivo = np.bincount(origem[mantidas], minlength=len(novos))
+
+    incremental = cubo_em_dia(manifesto, raiz)
+    esbocos_incrementais = esbocos_em_dia(manifesto, raiz)
+    produtos_incrementais = produtos_em_dia(manifesto, raiz)
+    with Transacao(raiz) as transacao:
+        anexar_particoes(lote, raiz, transacao)
+        if incremental:
+            atualizar_cubo(agregar_cubo(lote), raiz, transacao)
+        if esbocos_incrementais:
+            atualizar_esbocos(esbocar_lote(lote), raiz, transacao)
+        if produtos_incrementais:
+            atualizar_produtos(agregar_produtos(lote), raiz, transacao)
+
+        for preparado, novas in zip(novos, novas_por_arquivo):
+            manifesto["ingestoes"][preparado["hash"]] = _concluir_registro(registros[preparado["hash"]], novas)
+        manifesto["geracao"] += 1
+        if incremental:
+            manifesto["geracao_cubo"] = manifesto["geracao"]
+        if esbocos_incrementais:
+            manifesto["geracao_esbocos"] = manifesto["geracao"]
+        if produtos_incrementais:
+            manifesto["geracao_produtos"] = manifesto["geracao"]
+        transacao.confirmar(manifesto)
+    if not incremental:
+        reconstruir_cubo(raiz)
+    if not esbocos_incrementais:
+        reconstruir_esbocos(raiz)
+    if not produtos_incrementais:
+        reconstruir_produtos(raiz)
+    return registros
+
+
+# ===== ARQUIVOS RECEBIDOS =====
+
+def _abrir(fonte):
+    """
+    Abre um arquivo recebido (caminho no disco ou conteúdo em bytes) em modo binário.
+    """
+    return io.BytesIO(fonte) if isinstance(fonte, bytes) else open(fonte, "rb")
+
+
+def _escolher_planilha(arquivo, nome, planilha):
+    """
+    Escolhe a planilha de um arquivo Excel: a pedida ou, se houver mais de
+    uma, a sugerida. Outros formatos (e arquivos de uma planilha) usam None.
+    """
+    if extensao(nome) not in EXTENSOES_EXCEL:
+        return None
+    if planilha is not None:
+        return planilha
+    if len(listar_planilhas(arquivo)) > 1:
+        return sugerir_planilha(arquivo)
+    return None
+
+
+def _sem_andamento(fracao, mensagem):
+    """
+    Ignora o andamento de uma ingestão.
+    """
+
+
+def ingerir_fontes(arquivos, raiz=DATA_DIR, informar=_sem_andamento, max_processos=None):
+    """
+    Ingere os arquivos recebidos pela linha de comando ou pelo dashboard.
+    `arquivos` é uma lista de tuplas (fonte, nome, planilha): a fonte é o
+    caminho do arquivo ou o seu conteúdo em bytes, o nome define o formato e
+    é o registrado no manifesto, e a planilha (só em arquivos Excel) é a
+    pedida ou, se None, a sugerida (veja `_escolher_planilha`).
+
+    Um único arquivo novo é lido e gravado em blocos; vários são preparados
+    em paralelo e gravados de uma só vez. `informar(fracao, mensagem)`
+    recebe o andamento, de 0 a 1.
+
+    Retorna o resumo: um dicionário por arquivo, na ordem recebida, com
+    "arquivo" (nome e planilha), "situacao", "registro" e "erro".
+    """
+    resumo = []
+    pendentes = []
+    hashes = []
+    for fonte, nome, planilha in arquivos:
+        item = {"arquivo": nome, "situacao": SITUACAO_IGNORADO, "registro": None, "erro": None}
+        resumo.append(item)
+        if not formato_suportado(nome):
+            item.update(situacao=SITUACAO_ERRO, erro="formato não suportado; use um arquivo .csv, .xlsx ou .xls")
+            continue
+        try:
+            with _abrir(fonte) as arquivo:
+                planilha = _escolher_planilha(arquivo, nome, planilha)
+                hash_arquivo = hash_planilha(hash_fluxo(arquivo), planilha)
+        except Exception as e:
+            item.update(situacao=SITUACAO_ERRO, erro=str(e))
+            continue
+        if planilha is not None:
+            item["arquivo"] = f"{nome} [{planilha}]"
+        if not ja_ingerido(hash_arquivo, raiz) and hash_arquivo not in hashes:
+            pendentes.append((item, fonte, nome, planilha))
+            hashes.append(hash_arquivo)
+
+    if len(pendentes) == 1:
+        item, fonte, nome, planilha = pendentes[0]
+        informar(0.0, f"Processando {nome}...")
+        try:
+            with _abrir(fonte) as arquivo:
+                blocos = _blocos_com_andamento(arquivo, nome, planilha, informar)
+                item.update(situacao=SITUACAO_INGERIDO, registro=ingerir_blocos(blocos, hashes[0], nome, raiz))
+        except Exception as e:
+            item.update(situacao=SITUACAO_ERRO, erro=str(e))
+    elif pendentes:
+        _ingerir_em_paralelo(pendentes, hashes, raiz, informar, max_processos)
+    return resumo
+
+
+def _blocos_com_andamento(arquivo, nome, planilha, informar):
+    """
+    Gera os blocos de um arquivo, informando a fração lida.
+    """
+    linhas = 0
+    for bloco, fracao in ler_em_blocos(arquivo, nome, planilha=planilha):
+        yield bloco
+        # Informado depois que o bloco foi normalizado e gravado
+        linhas += bloco.shape[0]
+        informar(fracao, f"{nome}: {linhas} linhas processadas ({fracao:.0%})")
+
+
+def _ingerir_em_paralelo(pendentes, hashes, raiz, informar, max_processos):
+    """
+    Prepara os arquivos pendentes em paralelo e grava todos de uma só vez,
+    atualizando a situação de cada item do resumo.
+    """
+    # `vendas.paralelo` importa este módulo
+    from .paralelo import preparar_em_paralelo
+
+    total = len(pendentes)
+    informar(0.0, f"Preparando {total} arquivos...")
+    preparados = {}
+    try:
+        arquivos = []
+        for _, fonte, nome, planilha in pendentes:
+            with _abrir(fonte) as arquivo:
+                arquivos.append((arquivo.read(), nome, planilha))
+        for concluidos, (indice, preparado, erro) in enumerate(preparar_em_paralelo(arquivos, max_processos), start=1):
+            if erro is not None:
+                pendentes[indice][0].update(situacao=SITUACAO_ERRO, erro=str(erro))
+            else:
+                preparado.update(hash=hashes[indice], arquivo=pendentes[indice][2])
+                preparados[indice] = preparado
+            informar(FRACAO_PREPARACAO * concluidos / total, f"{concluidos}/{total} arquivos preparados")
+
+        if preparados:
+            informar(FRACAO_PREPARACAO, f"Gravando {len(preparados)} arquivos...")
+            registros = ingerir_arquivos([preparados[i] for i in sorted(preparados)], raiz)
+            for indice in preparados:
+                pendentes[indice][0].update(situacao=SITUACAO_INGERIDO, registro=registros[hashes[indice]])
+    except Exception as e:
+        for item, _, _, _ in pendentes:
+            if item["situacao"] != SITUACAO_ERRO:
+                item.update(situacao=SITUACAO_ERRO, erro=str(e))
+
+
+# ===== MIGRAÇÃO =====
+
+def migrar_csv(caminho_csv, raiz=DATA_DIR):
+    """
+    Migra o antigo arquivo CSV consolidado para o armazenamento particionado.
+    A migração só ocorre uma vez: o CSV é renomeado para ``.migrado`` ao final.
+    Retorna o número de linhas migradas.
+    """
+    if not os.path.exists(caminho_csv) or existe_armazem(raiz):
+        return 0
+
+    with open(caminho_csv, "rb") as arquivo:
+        hash_arquivo = hash_fluxo(arquivo)
+        blocos = (bloco for bloco, _ in ler_csv_em_blocos(arquivo))
+        registro = ingerir_blocos(blocos, hash_arquivo, os.path.basename(caminho_csv), raiz)
+    os.replace(caminho_csv, caminho_csv + ".migrado")
+    return registro["novas"]
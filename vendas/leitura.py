@@ -0,0 +1,230 @@
+"""
+Leitura em blocos dos arquivos enviados.
+
+Os arquivos são lidos em blocos de até `TAMANHO_BLOCO` linhas: CSV com o
+leitor em blocos do pandas e Excel linha a linha com o openpyxl em modo
+somente leitura. Cada bloco é entregue junto com a fração do arquivo já lida
+(bytes, no CSV; linhas, no Excel), de modo que o uso de memória depende do
+tamanho do bloco e não do tamanho do arquivo.
+
+Antes da leitura, o cabeçalho é comparado às colunas usadas pelo dashboard
+(sem diferenciar maiúsculas nem espaços nas pontas): apenas essas colunas são
+lidas, já com o tipo de leitura definido, e as demais nunca chegam a ser
+materializadas. Em arquivos Excel é possível escolher a planilha.
+"""
+
+import os
+
+import pandas as pd
+
+from .esquema import COLUNAS_ORIGEM, ESQUEMA_NORMALIZACAO
+
+# ===== CONSTANTES =====
+TAMANHO_BLOCO = 50_000
+EXTENSOES_CSV = ("csv",)
+EXTENSOES_EXCEL = ("xlsx", "xls")
+
+# Tipos lidos como texto para evitar a inferência do leitor; os numéricos
+# ficam com a inferência (decimal ",") e são validados na normalização
+TIPOS_TEXTO = ("texto", "codigo")
+
+
+def extensao(nome_arquivo):
+    """
+    Retorna a extensão de um nome de arquivo, em minúsculas e sem o ponto.
+    """
+    return nome_arquivo.rsplit(".", 1)[-1].lower()
+
+
+def formato_suportado(nome_arquivo):
+    """
+    Indica se o arquivo pode ser lido pelo dashboard.
+    """
+    return extensao(nome_arquivo) in EXTENSOES_CSV + EXTENSOES_EXCEL
+
+
+def padronizar_nome(nome):
+    """
+    Padroniza o nome de uma coluna (sem espaços nas pontas, em minúsculas).
+    """
+    return str(nome).strip().lower()
+
+
+def padronizar_colunas(df):
+    """
+    Padroniza os nomes das colunas de um DataFrame.
+    """
+    df.columns = [padronizar_nome(col) for col in df.columns]
+    return df
+
+
+def resolver_colunas(cabecalho, colunas=COLUNAS_ORIGEM):
+    """
+    Retorna as posições do cabeçalho que correspondem às colunas pedidas.
+    Se duas colunas do arquivo tiverem o mesmo nome padronizado, vale a
+    primeira. Com `colunas` None, todas as posições são retornadas.
+    """
+    if colunas is None:
+        return list(range(len(cabecalho)))
+    pedidas = set(colunas)
+    posicoes = {}
+    for posicao, nome in enumerate(cabecalho):
+        padronizado = padronizar_nome(nome)
+        if padronizado in pedidas and padronizado not in posicoes:
+            posicoes[padronizado] = posicao
+    return sorted(posicoes.values())
+
+
+def _exigir_colunas(posicoes):
+    """
+    Garante que o cabeçalho tem ao menos uma coluna reconhecida.
+    """
+    if not posicoes:
+        raise ValueError("Nenhuma coluna conhecida encontrada no cabeçalho do arquivo.")
+    return posicoes
+
+
+def _tamanho(arquivo):
+    """
+    Retorna o tamanho em bytes de um arquivo aberto, sem mudar a posição.
+    """
+    posicao = arquivo.tell()
+    arquivo.seek(0, os.SEEK_END)
+    tamanho = arquivo.tell()
+    arquivo.seek(posicao)
+    return tamanho
+
+
+# ===== CSV =====
+
+def ler_csv_em_blocos(arquivo, tamanho_bloco=TAMANHO_BLOCO, colunas=COLUNAS_ORIGEM):
+    """
+    Lê um CSV (caminho ou arquivo aberto em modo binário) em blocos, apenas
+    com as colunas pedidas (todas, se `colunas` for None).
+    Gera tuplas (bloco, fração dos bytes já lidos).
+    """
+    if isinstance(arquivo, (str, os.PathLike)):
+        with open(arquivo, "rb") as aberto:
+            yield from ler_csv_em_blocos(aberto, tamanho_bloco, colunas)
+        return
+
+    inicio = arquivo.tell()
+    cabecalho = pd.read_csv(arquivo, nrows=0, encoding="utf-8").columns
+    arquivo.seek(inicio)
+    posicoes = _exigir_colunas(resolver_colunas(cabecalho, colunas))
+    tipos = {}
+    for posicao in posicoes:
+        tipo = ESQUEMA_NORMALIZACAO.get(padronizar_nome(cabecalho[posicao]))
+        if tipo in TIPOS_TEXTO or tipo == "data":
+            tipos[posicao] = "string"
+
+    total = _tamanho(arquivo) or 1
+    leitor = pd.read_csv(
+        arquivo, decimal=",", encoding="utf-8", chunksize=tamanho_bloco,
+        usecols=posicoes, dtype={cabecalho[posicao]: tipo for posicao, tipo in tipos.items()},
+    )
+    with leitor:
+        for bloco in leitor:
+            yield padronizar_colunas(bloco), min(arquivo.tell() / total, 1.0)
+
+
+# ===== EXCEL =====
+
+def listar_planilhas(arquivo):
+    """
+    Lista os nomes das planilhas de um arquivo Excel.
+    """
+    from openpyxl import load_workbook
+
+    pasta = load_workbook(arquivo, read_only=True)
+    try:
+        return list(pasta.sheetnames)
+    finally:
+        pasta.close()
+        if hasattr(arquivo, "seek"):
+            arquivo.seek(0)
+
+
+def sugerir_planilha(arquivo, colunas=COLUNAS_ORIGEM):
+    """
+    Sugere a planilha cujo cabeçalho reconhece mais colunas pedidas
+    (a primeira, em caso de empate).
+    """
+    from openpyxl import load_workbook
+
+    pasta = load_workbook(arquivo, read_only=True)
+    try:
+        melhor, reconhecidas = pasta.sheetnames[0], -1
+        for planilha in pasta.worksheets:
+            cabecalho = next(planilha.iter_rows(max_row=1, values_only=True), ())
+            encontradas = len(resolver_colunas(cabecalho, colunas))
+            if encontradas > reconhecidas:
+                melhor, reconhecidas = planilha.title, encontradas
+        return melhor
+    finally:
+        pasta.close()
+        if hasattr(arquivo, "seek"):
+            arquivo.seek(0)
+
+
+def ler_excel_em_blocos(arquivo, tamanho_bloco=TAMANHO_BLOCO, colunas=COLUNAS_ORIGEM, planilha=None):
+    """
+    Lê uma planilha de um Excel linha a linha, em modo somente leitura,
+    guardando apenas as células das colunas pedidas (todas, se `colunas`
+    for None). Sem `planilha`, lê a primeira.
+    Gera tuplas (bloco, fração das linhas já lidas).
+    """
+    from openpyxl import load_workbook
+
+    pasta = load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        folha = pasta.worksheets[0] if planilha is None else pasta[planilha]
+        total = max((folha.max_row or 1) - 1, 1)
+        linhas = folha.iter_rows(values_only=True)
+        cabecalho = next(linhas, None)
+        if cabecalho is None:
+            return
+        posicoes = _exigir_colunas(resolver_colunas(cabecalho, colunas))
+        nomes = [
+            f"unnamed: {posicao}" if cabecalho[posicao] is None else padronizar_nome(cabecalho[posicao])
+            for posicao in posicoes
+        ]
+        # A data fica com o tipo nativo do Excel; códigos e textos viram texto
+        texto = [col for col in nomes if ESQUEMA_NORMALIZACAO.get(col) in TIPOS_TEXTO]
+
+        def montar(buffer):
+            bloco = pd.DataFrame(buffer, columns=nomes)
+            for col in texto:
+                bloco[col] = bloco[col].astype("string")
+            return bloco
+
+        buffer = []
+        lidas = 0
+        for linha in linhas:
+            if all(valor is None for valor in linha):
+                continue
+            buffer.append([linha[posicao] if posicao < len(linha) else None for posicao in posicoes])
+            lidas += 1
+            if len(buffer) == tamanho_bloco:
+                yield montar(buffer), min(lidas / total, 1.0)
+                buffer = []
+        if buffer:
+            yield montar(buffer), 1.0
+    finally:
+        pasta.close()
+
+
+# ===== DESPACHO =====
+
+def ler_em_blocos(arquivo, nome_arquivo, tamanho_bloco=TAMANHO_BLOCO, colunas=COLUNAS_ORIGEM, planilha=None):
+    """
+    Lê um arquivo CSV ou Excel em blocos, conforme a extensão do nome, apenas
+    com as colunas pedidas. `planilha` só se aplica a arquivos Excel.
+    Gera tuplas (bloco, fração já lida). Formatos desconhecidos geram ValueError.
+    """
+    formato = extensao(nome_arquivo)
+    if formato in EXTENSOES_CSV:
+        return ler_csv_em_blocos(arquivo, tamanho_bloco, colunas)
+    if formato in EXTENSOES_EXCEL:
+        return ler_excel_em_blocos(arquivo, tamanho_bloco, colunas, planilha)
+    raise ValueError(f"Formato de arquivo não suportado: .{formato}")
@@ -0,0 +1,96 @@
+"""
+Representação compacta dos dados em memória.
+
+Ao montar o motor pandas, cada coluna do DataFrame consolidado é convertida
+para o tipo mais estreito que guarda exatamente os mesmos valores:
+
+- inteiros: o menor inteiro com sinal que comporta o mínimo e o máximo
+  (anulável, se houver valores ausentes);
+- decimais: inteiro, se todos os valores forem inteiros; senão continuam em
+  float64, já que float32 mudaria as somas exibidas;
+- textos: categórica, se houver poucos valores distintos; senão texto em Arrow;
+- mês: categórica com os meses em ordem do calendário (um código int8 por
+  linha; o nome só é lido na exibição); ano: int16.
+
+O armazenamento não muda: os arquivos Parquet mantêm os tipos do esquema,
+pois a chave de linha (`_chave`) depende deles.
+"""
+
+import numpy as np
+import pandas as pd
+
+from .esquema import COLUMN_ANO, COLUMN_MES, NOMES_MESES
+
+# Textos com até esta fração de valores distintos viram categóricos
+FRACAO_CATEGORIAS = 0.5
+
+TIPO_MES = pd.CategoricalDtype(NOMES_MESES, ordered=True)
+INTEIROS = [np.int8, np.int16, np.int32, np.int64]
+
+
+def _menor_inteiro(serie):
+    """
+    Converte uma série de inteiros (ou decimais sem parte fracionária) para o
+    menor inteiro que comporta seus valores.
+    """
+    validos = serie.dropna()
+    minimo, maximo = (validos.min(), validos.max()) if len(validos) else (0, 0)
+    for tipo in INTEIROS:
+        limites = np.iinfo(tipo)
+        if limites.min <= minimo and maximo <= limites.max:
+            break
+    if serie.isna().any():
+        # Inteiro anulável: "Int8", "Int16"...
+        return serie.astype(tipo.__name__.capitalize())
+    return serie.astype(tipo)
+
+
+def compactar_coluna(nome, serie):
+    """
+    Retorna a série no tipo compacto da coluna (veja o módulo), ou a própria
+    série se nenhum tipo menor representar exatamente seus valores.
+    """
+    if nome == COLUMN_MES:
+        return serie if serie.dtype == TIPO_MES else serie.astype(TIPO_MES)
+    if nome == COLUMN_ANO and pd.api.types.is_integer_dtype(serie) and not serie.isna().any():
+        return serie.astype(np.int16)
+    if pd.api.types.is_bool_dtype(serie) or isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie
+    if pd.api.types.is_integer_dtype(serie):
+        return _menor_inteiro(serie)
+    if pd.api.types.is_float_dtype(serie):
+        validos = serie.dropna()
+        if len(validos) and np.all(np.mod(validos.to_numpy(dtype="float64"), 1) == 0) and validos.abs().max() < 2 ** 31:
+            return _menor_inteiro(serie)
+        return serie
+    if pd.api.types.is_object_dtype(serie) or pd.api.types.is_string_dtype(serie):
+        validos = serie.count()
+        if validos and serie.nunique() <= validos * FRACAO_CATEGORIAS:
+            return serie.astype("category")
+        if pd.api.types.is_object_dtype(serie):
+            return serie.astype(pd.StringDtype("pyarrow"))
+    return serie
+
+
+def compactar_tipos(df, colunas=None):
+    """
+    Compacta as colunas do DataFrame (todas, ou só as de `colunas`).
+    Retorna uma tupla (df, relatório): o relatório traz, por coluna, os bytes
+    ocupados e o tipo antes e depois da compactação.
+    """
+    linhas = []
+    compactado = df.copy(deep=False)
+    for col in df.columns:
+        original = df[col]
+        serie = compactar_coluna(col, original) if colunas is None or col in colunas else original
+        if serie is not original:
+            compactado[col] = serie
+        linhas.append({
+            "coluna": col,
+            "tipo_antes": str(original.dtype),
+            "tipo_depois": str(serie.dtype),
+            "bytes_antes": int(original.memory_usage(deep=True, index=False)),
+            "bytes_depois": int(serie.memory_usage(deep=True, index=False)),
+        })
+    relatorio = pd.DataFrame(linhas, columns=["coluna", "tipo_antes", "tipo_depois", "bytes_antes", "bytes_depois"])
+    return compactado, relatorio
@@ -0,0 +1,238 @@
+"""
+Motor de consulta opcional em DuckDB.
+
+As consultas são executadas diretamente sobre as partições Parquet do
+armazenamento: as seleções da barra lateral viram cláusulas WHERE
+parametrizadas e cada KPI, gráfico ou tabela é uma agregação executada no
+DuckDB. Apenas os resultados (pequenos) voltam para o pandas, de modo que o
+dashboard funciona com conjuntos de dados maiores que a memória.
+
+Requer o pacote opcional ``duckdb``.
+"""
+
+import os
+import threading
+
+import duckdb
+import pandas as pd
+
+from .armazenamento import COLUNA_CHAVE, DATA_DIR, ler_manifesto, listar_arquivos, trava_publicacao
+from .cubo import COLUNA_LINHAS, METRICAS_CUBO
+from .esquema import COLUMN_DATA, COLUMN_MES, NOMES_MESES
+from .filtros import intervalo_de_datas
+from .motores import MOTOR_DUCKDB
+
+# Linhas do resumo estatístico, na ordem do DataFrame.describe()
+LINHAS_RESUMO = ["count", "mean", "std", "min", "25%", "50%", "75%", "max"]
+
+
+def _q(coluna):
+    """
+    Cita um nome de coluna para uso em SQL.
+    """
+    return '"' + coluna.replace('"', '""') + '"'
+
+
+class MotorDuckDB:
+    """
+    Motor SQL sobre os arquivos Parquet de uma geração do armazenamento
+    (veja `_fixar`).
+    """
+
+    nome = MOTOR_DUCKDB
+    # Os dados ficam nos arquivos; não há DataFrame compactado em memória
+    memoria = None
+
+    def __init__(self, raiz=DATA_DIR):
+        self.raiz = raiz
+        self._conexao = duckdb.connect()
+        self._trava = threading.Lock()
+        self._fixar()
+
+    def _fixar(self):
+        """
+        Fixa a visão `vendas` na lista de arquivos de uma geração: a lista e
+        a geração são lidas juntas, com a trava de publicação compartilhada,
+        de modo que a visão nunca vê uma transação ou compactação pela metade
+        (o arquivo compactado e os de origem ao mesmo tempo).
+        """
+        with trava_publicacao(self.raiz):
+            arquivos = listar_arquivos(self.raiz)
+            self.geracao = ler_manifesto(self.raiz)["geracao"]
+        lista_arquivos = ", ".join("'" + os.path.abspath(arquivo).replace("'", "''") + "'" for arquivo in arquivos)
+        origem = f"read_parquet([{lista_arquivos}], union_by_name = true)"
+        with self._trava:
+            colunas = [linha[0] for linha in self._conexao.execute(f"DESCRIBE SELECT * FROM {origem}").fetchall()]
+            self._colunas = [col for col in colunas if col != COLUNA_CHAVE]
+            lista = ", ".join(_q(col) for col in self._colunas)
+            self._conexao.execute(f"CREATE OR REPLACE VIEW vendas AS SELECT {lista} FROM {origem}")
+
+    def _executar(self, sql, parametros=()):
+        """
+        Executa uma consulta e retorna o resultado como DataFrame.
+        Cada consulta usa um cursor próprio, pois a conexão é compartilhada
+        entre as sessões. Se um arquivo da geração fixada foi removido por
+        uma publicação posterior, a visão é fixada na geração atual e a
+        consulta, repetida.
+        """
+        for tentativa in range(2):
+            with self._trava:
+                cursor = self._conexao.cursor()
+            try:
+                return cursor.execute(sql, list(parametros)).df()
+            except duckdb.IOException:
+                if tentativa:
+                    raise
+                self._fixar()
+            finally:
+                cursor.close()
+
+    def _where(self, selecoes):
+        """
+        Compila as seleções em uma cláusula WHERE parametrizada. O intervalo
+        de datas vira uma comparação de faixa, que o DuckDB resolve pelas
+        estatísticas de mínimo e máximo dos arquivos (gravados ordenados pela data).
+        """
+        condicoes = []
+        parametros = []
+        for coluna, valores in selecoes.items():
+            if not valores or coluna not in self._colunas:
+                continue
+            if coluna == COLUMN_DATA:
+                inicio, fim = intervalo_de_datas(valores)
+                condicoes.append(f"{_q(coluna)} >= ? AND {_q(coluna)} < ?")
+                parametros.extend([inicio.to_pydatetime(), (fim + pd.Timedelta(days=1)).to_pydatetime()])
+                continue
+            condicoes.append(f"{_q(coluna)} IN ({', '.join('?' for _ in valores)})")
+            parametros.extend(valores)
+        if not condicoes:
+            return "", []
+        return "WHERE " + " AND ".join(condicoes), parametros
+
+    def colunas(self):
+        """
+        Retorna as colunas disponíveis para exibição.
+        """
+        return list(self._colunas)
+
+    def total_linhas(self):
+        """
+        Retorna o número total de linhas.
+        """
+        return int(self._executar("SELECT count(*) AS n FROM vendas")["n"].iloc[0])
+
+    def periodo(self):
+        """
+        Retorna a primeira e a última data (ou None, None se não houver datas).
+        """
+        if COLUMN_DATA not in self._colunas:
+            return None, None
+        coluna = _q(COLUMN_DATA)
+        resultado = self._executar(f"SELECT min({coluna}) AS inicio, max({coluna}) AS fim FROM vendas")
+        inicio, fim = resultado["inicio"].iloc[0], resultado["fim"].iloc[0]
+        return (None, None) if pd.isna(inicio) else (pd.Timestamp(inicio), pd.Timestamp(fim))
+
+    def valores(self, coluna):
+        """
+        Retorna os valores distintos de uma coluna, em ordem crescente.
+        """
+        resultado = self._executar(
+            f"SELECT DISTINCT {_q(coluna)} AS valor FROM vendas WHERE {_q(coluna)} IS NOT NULL ORDER BY 1"
+        )
+        return resultado["valor"].tolist()
+
+    def totais(self, selecoes):
+        """
+        Retorna a soma de cada métrica (e o total de linhas) das seleções.
+        """
+        metricas = [col for col in METRICAS_CUBO if col in self._colunas]
+        where, parametros = self._where(selecoes)
+        expressoes = [f"sum({_q(col)}) AS {_q(col)}" for col in metricas]
+        expressoes.append(f"count(*) AS {_q(COLUNA_LINHAS)}")
+        resultado = self._executar(f"SELECT {', '.join(expressoes)} FROM vendas {where}", parametros)
+        return {col: (0 if pd.isna(valor) else valor) for col, valor in resultado.iloc[0].items()}
+
+    def agrupar(self, selecoes, chaves, metricas):
+        """
+        Agrupa as linhas selecionadas pelas chaves, somando as métricas.
+        Use `COLUNA_LINHAS` como métrica para contar linhas. Grupos com chave
+        nula são mantidos; uma métrica sem valores no grupo soma zero, como
+        no motor pandas.
+        """
+        where, parametros = self._where(selecoes)
+        expressoes = [_q(col) for col in chaves]
+        for col in metricas:
+            if col == COLUNA_LINHAS:
+                expressoes.append(f"count(*) AS {_q(COLUNA_LINHAS)}")
+            else:
+                expressoes.append(f"coalesce(sum({_q(col)}), 0) AS {_q(col)}")
+        grupo = ", ".join(_q(col) for col in chaves)
+        return self._executar(
+            f"SELECT {', '.join(expressoes)} FROM vendas {where} GROUP BY {grupo} ORDER BY {grupo}",
+            parametros,
+        )
+
+    def selecionadas(self, selecoes, colunas=None):
+        """
+        Retorna as linhas selecionadas (todas as colunas, se `colunas` for None).
+        """
+        where, parametros = self._where(selecoes)
+        lista = ", ".join(_q(col) for col in (colunas or self._colunas))
+        return self._executar(f"SELECT {lista} FROM vendas {where}", parametros)
+
+    def pagina(self, selecoes, colunas, inicio, tamanho, ordenar_por=None, decrescente=False):
+        """
+        Retorna as linhas selecionadas de `inicio` a `inicio + tamanho`, nas
+        colunas pedidas, ordenadas por `ordenar_por` (valores ausentes no
+        fim), se informada. O DuckDB ordena só o necessário para a página.
+        O mês é ordenado pelo calendário, como no motor pandas.
+        """
+        where, parametros = self._where(selecoes)
+        lista = ", ".join(_q(col) for col in colunas)
+        ordem = ""
+        if ordenar_por is not None:
+            chave = _q(ordenar_por)
+            if ordenar_por == COLUMN_MES:
+                meses = ", ".join(f"'{nome}'" for nome in NOMES_MESES)
+                chave = f"list_position([{meses}], {chave})"
+            ordem = f"ORDER BY {chave} {'DESC' if decrescente else 'ASC'} NULLS LAST"
+        return self._executar(
+            f"SELECT {lista} FROM vendas {where} {ordem} LIMIT {int(tamanho)} OFFSET {int(inicio)}", parametros
+        )
+
+    def blocos(self, selecoes, colunas, tamanho_bloco):
+        """
+        Gera as linhas selecionadas em blocos de até `tamanho_bloco` linhas,
+        nas colunas pedidas, lendo o resultado da consulta aos poucos.
+        """
+        where, parametros = self._where(selecoes)
+        lista = ", ".join(_q(col) for col in colunas)
+        with self._trava:
+            cursor = self._conexao.cursor()
+        try:
+            leitor = cursor.execute(f"SELECT {lista} FROM vendas {where}", parametros).fetch_record_batch(tamanho_bloco)
+            for lote in leitor:
+                yield lote.to_pandas()
+        finally:
+            cursor.close()
+
+    def resumo(self, selecoes, colunas):
+        """
+        Retorna o resumo estatístico no formato de DataFrame.describe(),
+        calculado no DuckDB.
+        """
+        where, parametros = self._where(selecoes)
+        expressoes = []
+        for i, col in enumerate(colunas):
+            c = f"CAST({_q(col)} AS DOUBLE)"
+            expressoes += [
+                f"count({c}) AS c{i}_0", f"avg({c}) AS c{i}_1", f"stddev_samp({c}) AS c{i}_2",
+                f"min({c}) AS c{i}_3", f"quantile_cont({c}, 0.25) AS c{i}_4",
+                f"quantile_cont({c}, 0.5) AS c{i}_5", f"quantile_cont({c}, 0.75) AS c{i}_6",
+                f"max({c}) AS c{i}_7",
+            ]
+        resultado = self._executar(f"SELECT {', '.join(expressoes)} FROM vendas {where}", parametros).iloc[0]
+        return pd.DataFrame(
+            {col: [resultado[f"c{i}_{j}"] for j in range(len(LINHAS_RESUMO))] for i, col in enumerate(colunas)},
+            index=LINHAS_RESUMO,
+        )
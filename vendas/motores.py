@@ -0,0 +1,196 @@
+"""
+Motores de consulta usados pelo dashboard.
+
+Um motor responde às perguntas da página (totais, agrupamentos, resumo
+estatístico e linhas) para um conjunto de seleções da barra lateral
+(dicionário coluna -> valores aceitos; na coluna de data, o intervalo
+[início, fim]). Há dois motores com a mesma interface:
+
+- `MotorPandas` (padrão): dados em memória, filtros pelo índice de posições
+  e agregações pelo cubo materializado.
+- `MotorDuckDB` (opcional, `vendas.motor_duckdb`): consultas SQL sobre as
+  partições Parquet, sem carregar os dados em memória.
+
+O motor é escolhido pela variável de ambiente ``DASHBOARD_MOTOR``.
+"""
+
+import os
+
+import numpy as np
+
+from .cache import memorizar_filtro
+from .cubo import METRICAS_CUBO, agregar_cubo, filtrar_cubo, meses_do_intervalo, totais_cubo
+from .esquema import COLUMN_DATA
+from .filtros import aplicar_posicoes
+
+# ===== CONFIGURAÇÃO =====
+MOTOR_PANDAS = "pandas"
+MOTOR_DUCKDB = "duckdb"
+MOTOR_CONFIGURADO = os.environ.get("DASHBOARD_MOTOR", MOTOR_PANDAS).strip().lower()
+
+
+class MotorPandas:
+    """
+    Motor em memória sobre o DataFrame compartilhado (ordenado pela data), o
+    índice de posições e o cubo de agregação de uma mesma versão.
+    Com `versao` informada, as posições de cada combinação de filtros ficam
+    no cache por filtro (veja `memorizar_filtro`). `memoria` é o relatório
+    da compactação dos dados (veja `compactar_tipos`).
+    """
+
+    nome = MOTOR_PANDAS
+
+    def __init__(self, df, indice, cubo, versao=None, memoria=None):
+        self.df = df
+        self.indice = indice
+        self.cubo = cubo
+        self.versao = versao
+        self.memoria = memoria
+
+    def _posicoes(self, selecoes):
+        """
+        Retorna as posições das linhas selecionadas (None se não houver filtro).
+        """
+        if self.versao is None:
+            return self.indice.selecionar(selecoes)
+        return memorizar_filtro("posicoes", self.versao, selecoes, lambda: self.indice.selecionar(selecoes))
+
+    def _cubo(self, selecoes):
+        """
+        Retorna as células do cubo das seleções. Um intervalo de datas que não
+        cobre meses inteiros não cabe no cubo: as linhas selecionadas são
+        agregadas em um cubo próprio.
+        """
+        intervalo = selecoes.get(COLUMN_DATA)
+        if not intervalo or meses_do_intervalo(intervalo) is not None:
+            return filtrar_cubo(self.cubo, selecoes)
+
+        def construir():
+            # Métricas nos tipos do cubo gravado, não nos tipos compactos das linhas
+            cubo = agregar_cubo(self.selecionadas(selecoes))
+            return cubo.astype({col: self.cubo[col].dtype for col in METRICAS_CUBO if col in cubo and col in self.cubo})
+
+        if self.versao is None:
+            return construir()
+        return memorizar_filtro("cubo", self.versao, selecoes, construir)
+
+    def colunas(self):
+        """
+        Retorna as colunas disponíveis para exibição.
+        """
+        return self.df.columns.tolist()
+
+    def total_linhas(self):
+        """
+        Retorna o número total de linhas.
+        """
+        return self.df.shape[0]
+
+    def periodo(self):
+        """
+        Retorna a primeira e a última data (ou None, None se não houver datas),
+        lidas nas pontas do índice de datas.
+        """
+        if self.indice.datas is None:
+            return None, None
+        return self.indice.datas.extremos()
+
+    def valores(self, coluna):
+        """
+        Retorna os valores distintos de uma coluna filtrável, em ordem crescente.
+        """
+        return self.indice.valores(coluna)
+
+    def totais(self, selecoes):
+        """
+        Retorna a soma de cada métrica (e o total de linhas) das seleções.
+        """
+        return totais_cubo(self._cubo(selecoes))
+
+    def agrupar(self, selecoes, chaves, metricas):
+        """
+        Agrupa as linhas selecionadas pelas chaves, somando as métricas.
+        Use `COLUNA_LINHAS` como métrica para contar linhas. Grupos com chave
+        nula são mantidos.
+        """
+        cubo_filtrado = self._cubo(selecoes)
+        return cubo_filtrado.groupby(chaves, observed=True, dropna=False)[metricas].sum().reset_index()
+
+    def selecionadas(self, selecoes, colunas=None):
+        """
+        Retorna as linhas selecionadas (todas as colunas, se `colunas` for None).
+        """
+        df_filtrado = aplicar_posicoes(self.df, self._posicoes(selecoes))
+        return df_filtrado if colunas is None else df_filtrado[colunas]
+
+    def _ordem(self, selecoes, coluna):
+        """
+        Retorna a permutação das linhas selecionadas em ordem crescente da
+        coluna (posições no DataFrame, estável, valores ausentes no fim) e o
+        número de valores presentes. Fica no cache por filtro: trocar de
+        página ou inverter a ordem não reordena as linhas.
+        """
+        def construir():
+            posicoes = self._posicoes(selecoes)
+            serie = self.df[coluna] if posicoes is None else self.df[coluna].take(posicoes)
+            relativas = serie.reset_index(drop=True).sort_values(kind="stable", na_position="last").index.to_numpy()
+            ordem = relativas if posicoes is None else np.asarray(posicoes)[relativas]
+            tipo = np.int32 if self.df.shape[0] < 2 ** 31 else np.int64
+            return ordem.astype(tipo, copy=False), int(serie.notna().sum())
+
+        if self.versao is None:
+            return construir()
+        return memorizar_filtro(f"ordem:{coluna}", self.versao, selecoes, construir)
+
+    def pagina(self, selecoes, colunas, inicio, tamanho, ordenar_por=None, decrescente=False):
+        """
+        Retorna as linhas selecionadas de `inicio` a `inicio + tamanho`, nas
+        colunas pedidas, na ordem do armazenamento ou ordenadas por
+        `ordenar_por` (valores ausentes sempre no fim). Só a página é copiada.
+        """
+        dados = self.df[colunas]
+        if ordenar_por is None:
+            posicoes = self._posicoes(selecoes)
+            if posicoes is None:
+                return dados.iloc[inicio:inicio + tamanho]
+            return dados.take(posicoes[inicio:inicio + tamanho])
+
+        ordem, presentes = self._ordem(selecoes, ordenar_por)
+        if not decrescente:
+            return dados.take(ordem[inicio:inicio + tamanho])
+        # Ordem decrescente: os valores presentes lidos de trás para a frente
+        indices = np.arange(inicio, min(inicio + tamanho, len(ordem)))
+        indices = np.where(indices < presentes, presentes - 1 - indices, indices)
+        return dados.take(ordem[indices])
+
+    def blocos(self, selecoes, colunas, tamanho_bloco):
+        """
+        Gera as linhas selecionadas em blocos de até `tamanho_bloco` linhas,
+        nas colunas pedidas.
+        """
+        posicoes = self._posicoes(selecoes)
+        dados = self.df[colunas]
+        total = dados.shape[0] if posicoes is None else len(posicoes)
+        for inicio in range(0, total, tamanho_bloco):
+            if posicoes is None:
+                yield dados.iloc[inicio:inicio + tamanho_bloco]
+            else:
+                yield dados.take(posicoes[inicio:inicio + tamanho_bloco])
+
+    def resumo(self, selecoes, colunas):
+        """
+        Retorna o resumo estatístico (describe) das colunas nas linhas selecionadas.
+        """
+        return self.selecionadas(selecoes, colunas).describe()
+
+
+def motor_duckdb_disponivel():
+    """
+    Indica se o pacote opcional duckdb está instalado.
+    """
+    try:
+        import duckdb  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
@@ -0,0 +1,110 @@
+"""
+Normalização de tipos aplicada uma única vez a cada lote ingerido.
+
+Converte as colunas conforme `ESQUEMA_NORMALIZACAO`, deriva as colunas
+`mês` e `ano` a partir da data, descarta linhas sem data válida e codifica
+as colunas de `COLUNAS_CATEGORICAS` como categóricas. Todas as
+conversões são vetorizadas e o resultado é gravado já tipado, de modo que os
+reruns do dashboard partem de dados prontos para consulta.
+"""
+
+import pandas as pd
+
+from .esquema import COLUMN_ANO, COLUMN_DATA, COLUMN_MES, COLUNAS_CATEGORICAS, ESQUEMA_NORMALIZACAO
+
+# Número máximo de linhas de exemplo guardadas por coluna no relatório
+EXEMPLOS_POR_COLUNA = 5
+
+
+def _para_numero(serie):
+    """
+    Converte uma série para número. Textos no padrão brasileiro ("1.234,56")
+    são aceitos; valores inválidos viram NaN.
+    """
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie
+    texto = serie.astype("string").str.strip()
+    padrao_brasileiro = texto.str.contains(",", regex=False).fillna(False)
+    texto = texto.where(
+        ~padrao_brasileiro,
+        texto.str.replace(".", "", regex=False).str.replace(",", ".", regex=False),
+    )
+    return pd.to_numeric(texto, errors='coerce')
+
+
+def _converter(serie, tipo):
+    """
+    Converte uma série para o tipo lógico informado.
+    """
+    if tipo == "data":
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            return serie
+        return pd.to_datetime(serie, format='%d/%m/%Y', errors='coerce')
+    if tipo == "decimal":
+        return _para_numero(serie).astype("float64")
+    if tipo == "inteiro":
+        numeros = _para_numero(serie)
+        if numeros.dropna().mod(1).eq(0).all():
+            return numeros.astype("Int64")
+        return numeros.astype("float64")
+    if tipo == "codigo":
+        numeros = _para_numero(serie)
+        return numeros.round().astype("Int64").astype("string").fillna("NaN")
+    return serie.astype("string").fillna("nan")
+
+
+def _falhas(original, convertida, tipo):
+    """
+    Retorna a máscara das linhas que tinham valor mas não puderam ser convertidas.
+    """
+    if tipo == "texto":
+        return pd.Series(False, index=original.index)
+    if tipo == "codigo":
+        convertida = convertida.mask(convertida == "NaN")
+    return original.notna() & convertida.isna()
+
+
+def normalizar_lote(df):
+    """
+    Normaliza um lote conforme o esquema e deriva `mês` e `ano`.
+
+    Retorna uma tupla (df, relatorio). O relatório traz, por coluna, o número
+    de valores que não puderam ser convertidos e algumas linhas de exemplo
+    (numeração do arquivo, a partir de 1), além do total de linhas descartadas
+    por não terem data válida.
+    """
+    df = df.reset_index(drop=True)
+    relatorio = {"falhas": {}, "exemplos": {}, "linhas_descartadas": 0}
+
+    for col, tipo in ESQUEMA_NORMALIZACAO.items():
+        if col not in df.columns:
+            continue
+        convertida = _converter(df[col], tipo)
+        falhas = _falhas(df[col], convertida, tipo)
+        if falhas.any():
+            relatorio["falhas"][col] = int(falhas.sum())
+            relatorio["exemplos"][col] = [int(i) + 1 for i in falhas[falhas].index[:EXEMPLOS_POR_COLUNA]]
+        df[col] = convertida
+
+    if COLUMN_DATA in df.columns:
+        sem_data = df[COLUMN_DATA].isna()
+        relatorio["linhas_descartadas"] = int(sem_data.sum())
+        df = df[~sem_data].reset_index(drop=True)
+        df[COLUMN_MES] = df[COLUMN_DATA].dt.month_name().astype("string")
+        df[COLUMN_ANO] = df[COLUMN_DATA].dt.year.astype("int32")
+
+    for col in COLUNAS_CATEGORICAS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+
+    return df, relatorio
+
+
+def precisa_normalizar(df):
+    """
+    Indica se um DataFrame carregado contém linhas que não passaram pela
+    normalização (gravadas antes de as colunas derivadas existirem).
+    """
+    if COLUMN_DATA not in df.columns:
+        return False
+    return COLUMN_MES not in df.columns or bool(df[COLUMN_MES].isna().any())
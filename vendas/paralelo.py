@@ -0,0 +1,49 @@
+"""
+Preparação de vários arquivos em paralelo.
+
+Ler e normalizar um arquivo (principalmente Excel, pelo openpyxl) é limitado
+pela CPU. Quando vários arquivos são enviados juntos, cada um é preparado em
+um processo de um pool; a gravação no armazenamento continua única e feita no
+processo principal (veja `ingerir_arquivos`).
+
+Os processos são criados pelo método "spawn", seguro dentro do servidor
+multithread do Streamlit.
+"""
+
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .ingestao import preparar_arquivo
+
+
+def preparar_em_paralelo(arquivos, max_processos=None):
+    """
+    Prepara os arquivos, uma lista de tuplas (conteúdo, nome, planilha), em paralelo.
+
+    Gera tuplas (índice, preparado, erro) à medida que cada arquivo termina,
+    fora de ordem: `preparado` é o resultado de `preparar_arquivo` e `erro` a
+    exceção levantada (um é sempre None). Com um único processo disponível,
+    os arquivos são preparados em sequência, sem criar o pool.
+    """
+    if not arquivos:
+        return
+    processos = min(len(arquivos), max_processos or os.cpu_count() or 1)
+
+    if processos == 1:
+        for indice, (conteudo, nome, planilha) in enumerate(arquivos):
+            try:
+                yield indice, preparar_arquivo(conteudo, nome, planilha), None
+            except Exception as e:
+                yield indice, None, e
+        return
+
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=processos, mp_context=contexto) as pool:
+        futuros = {
+            pool.submit(preparar_arquivo, conteudo, nome, planilha): indice
+            for indice, (conteudo, nome, planilha) in enumerate(arquivos)
+        }
+        for futuro in as_completed(futuros):
+            erro = futuro.exception()
+            yield futuros[futuro], None if erro else futuro.result(), erro
@@ -0,0 +1,181 @@
+"""
+Instrumentação opcional de desempenho do dashboard.
+
+Com o perfil ativo (variável de ambiente DASHBOARD_PERFIL=1 ou parâmetro
+`?perfil=1` na URL), cada execução da página mede o tempo de cada seção, a
+memória dos DataFrames principais e os acertos do cache por filtro durante a
+execução. Ao final, o resumo é exibido na barra lateral e emitido como uma
+linha JSON no logger "vendas.perfil", para ser agregado pelo pipeline de logs.
+
+Inativo, o perfil não mede nada: as seções apenas executam o bloco.
+
+A primeira execução da página no processo registra também o tempo desde a
+importação deste módulo ("desde_inicio_ms"): com `python -m vendas servir`,
+que o importa ao iniciar, é o tempo até a primeira pintura após um restart.
+"""
+
+import functools
+import json
+import logging
+import os
+import platform
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+from .cache import CACHE_FILTROS
+
+# ===== CONFIGURAÇÃO =====
+PERFIL_AMBIENTE = os.environ.get("DASHBOARD_PERFIL", "").strip().lower() in ("1", "true", "sim")
+INICIO_PROCESSO = time.time()
+
+_trava_primeira = threading.Lock()
+_primeira_pendente = True
+
+logger = logging.getLogger("vendas.perfil")
+if not logger.handlers:
+    _saida = logging.StreamHandler(sys.stderr)
+    _saida.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_saida)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def pico_memoria_mb():
+    """
+    Retorna o pico de memória residente do processo em MB (None se indisponível).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB; macOS, em bytes
+    return round(pico / (1024 * 1024 if platform.system() == "Darwin" else 1024), 1)
+
+
+def _reivindicar_primeira():
+    """
+    Retorna True apenas para a primeira execução da página no processo.
+    """
+    global _primeira_pendente
+    with _trava_primeira:
+        primeira, _primeira_pendente = _primeira_pendente, False
+        return primeira
+
+
+def emitir(registro):
+    """
+    Emite um registro como uma linha JSON no logger "vendas.perfil".
+    """
+    registro = {"momento": pd.Timestamp.now().isoformat(timespec="milliseconds"), **registro}
+    logger.info(json.dumps(registro, ensure_ascii=False, default=str))
+
+
+def memoria_df(df):
+    """
+    Retorna a memória ocupada por um DataFrame em bytes, incluindo o conteúdo
+    dos textos.
+    """
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+class Perfil:
+    """
+    Medições de uma execução da página. As seções podem ser aninhadas; o nome
+    registrado é o caminho ("motor/carregar_particoes"). Seções medidas depois
+    de `concluir` (ex.: a reexecução de um fragmento) são emitidas no log, cada
+    uma em sua própria linha.
+    """
+
+    def __init__(self, ativo, contexto=None):
+        self.ativo = ativo
+        self.contexto = dict(contexto or {})
+        self.secoes = {}
+        self.memoria = {}
+        self.concluido = False
+        self._pilha = []
+        self._inicio = time.perf_counter()
+        self._cache_inicial = CACHE_FILTROS.estatisticas() if ativo else None
+
+    @contextmanager
+    def secao(self, nome):
+        """
+        Mede o tempo do bloco, acumulando-o na seção `nome`.
+        """
+        if not self.ativo:
+            yield
+            return
+        self._pilha.append(nome)
+        caminho = "/".join(self._pilha)
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            segundos = time.perf_counter() - inicio
+            self._pilha.pop()
+            self.secoes[caminho] = self.secoes.get(caminho, 0.0) + segundos
+            if self.concluido and not self._pilha:
+                emitir({"evento": "fragmento", "secao": caminho, "ms": round(segundos * 1000, 2)})
+
+    def medido(self, nome):
+        """
+        Decorador que mede cada chamada da função como a seção `nome`.
+        """
+        def decorador(funcao):
+            @functools.wraps(funcao)
+            def medida(*args, **kwargs):
+                with self.secao(nome):
+                    return funcao(*args, **kwargs)
+            return medida
+        return decorador
+
+    def registrar_memoria(self, nome, df):
+        """
+        Registra a memória ocupada por um DataFrame.
+        """
+        if self.ativo and df is not None:
+            self.memoria[nome] = memoria_df(df)
+
+    def _cache(self):
+        """
+        Retorna as estatísticas do cache por filtro, com os acertos e falhas
+        ocorridos durante esta execução.
+        """
+        atual = CACHE_FILTROS.estatisticas()
+        acertos = atual["acertos"] - self._cache_inicial["acertos"]
+        falhas = atual["falhas"] - self._cache_inicial["falhas"]
+        return {
+            **atual,
+            "acertos_execucao": acertos,
+            "falhas_execucao": falhas,
+            "taxa_acertos_execucao": acertos / (acertos + falhas) if acertos + falhas else None,
+        }
+
+    def concluir(self):
+        """
+        Encerra a execução, emite a linha de log e retorna o resumo (None se
+        o perfil estiver inativo). A primeira execução concluída no processo é
+        marcada mesmo com o perfil inativo, para não confundir a seguinte.
+        """
+        primeira = _reivindicar_primeira()
+        if not self.ativo:
+            return None
+        resumo = {
+            "evento": "execucao",
+            **self.contexto,
+            "total_ms": round((time.perf_counter() - self._inicio) * 1000, 2),
+            "secoes_ms": {nome: round(segundos * 1000, 2) for nome, segundos in self.secoes.items()},
+            "memoria_bytes": self.memoria,
+            "pico_memoria_mb": pico_memoria_mb(),
+            "cache": self._cache(),
+        }
+        if primeira:
+            resumo["primeira_execucao"] = True
+            resumo["desde_inicio_ms"] = round((time.time() - INICIO_PROCESSO) * 1000, 2)
+        self.concluido = True
+        emitir(resumo)
+        return resumo
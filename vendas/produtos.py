@@ -0,0 +1,226 @@
+"""
+Dicionário de produtos para o filtro de produtos do dashboard.
+
+Com catálogos de dezenas de milhares de produtos, montar o filtro com todos
+os nomes a cada execução da página pesa no navegador e repete a ordenação.
+O dicionário guarda, por produto, o faturamento, a quantidade e o número de
+linhas, em ``<raiz>/_produtos.parquet``. Como o cubo, é atualizado
+incrementalmente a cada ingestão (somando os totais do lote aos gravados),
+na mesma transação que publica as partições do lote.
+
+Na consulta, `DicionarioProdutos` ordena os produtos pelo faturamento (o
+posto de cada produto) e monta um índice invertido das palavras dos nomes,
+sem acentos e em minúsculas. Uma busca retorna só os N primeiros produtos,
+pela ordem de faturamento, cujos nomes têm palavras começando por cada
+termo digitado.
+"""
+
+import os
+import re
+import unicodedata
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+from .armazenamento import COMPRESSAO, DATA_DIR, existe_armazem, ler_manifesto
+from .cubo import COLUNA_LINHAS, carregar_cubo
+from .diario import Transacao, trava_escrita
+from .esquema import COLUMN_PRODUTO, COLUMN_QUANTIDADE, COLUMN_VALOR_TOTAL
+
+# ===== CONSTANTES =====
+ARQUIVO_PRODUTOS = "_produtos.parquet"
+METRICAS_PRODUTOS = [COLUMN_VALOR_TOTAL, COLUMN_QUANTIDADE]
+# Produtos retornados por busca
+LIMITE_SUGESTOES = 50
+
+_PALAVRA = re.compile(r"\w+")
+
+
+# ===== CONSTRUÇÃO =====
+
+def agregar_produtos(df):
+    """
+    Agrega linhas brutas (ou o cubo, ou outro dicionário) por produto,
+    somando o faturamento, a quantidade e o número de linhas.
+    """
+    metricas = [col for col in METRICAS_PRODUTOS if col in df.columns]
+    if COLUMN_PRODUTO not in df.columns:
+        return pd.DataFrame(columns=[COLUMN_PRODUTO] + metricas + [COLUNA_LINHAS])
+
+    if COLUNA_LINHAS in df.columns:
+        linhas = df[COLUNA_LINHAS]
+    else:
+        linhas = pd.Series(1, index=df.index, dtype="int64")
+
+    # Produtos categóricos viram texto: os dicionários de lotes diferentes
+    # são concatenados antes de somar
+    produtos = df[COLUMN_PRODUTO].astype("object")
+    agrupado = df[metricas].assign(**{COLUMN_PRODUTO: produtos, COLUNA_LINHAS: linhas}).groupby(
+        COLUMN_PRODUTO, sort=False
+    )
+    return agrupado.sum(min_count=1).reset_index()
+
+
+def mesclar_produtos(*dicionarios):
+    """
+    Soma dicionários de produtos parciais em um único dicionário.
+    """
+    dicionarios = [dicionario for dicionario in dicionarios if dicionario is not None and not dicionario.empty]
+    if not dicionarios:
+        return pd.DataFrame()
+    if len(dicionarios) == 1:
+        return dicionarios[0]
+    return agregar_produtos(pd.concat(dicionarios, ignore_index=True))
+
+
+# ===== PERSISTÊNCIA =====
+
+def _caminho_produtos(raiz):
+    """
+    Retorna o caminho do arquivo do dicionário de produtos.
+    """
+    return os.path.join(raiz, ARQUIVO_PRODUTOS)
+
+
+def gravar_produtos(produtos, raiz=DATA_DIR, transacao=None):
+    """
+    Grava o dicionário de produtos de forma atômica (ou na `transacao`, se
+    informada), como `gravar_cubo`.
+    """
+    if transacao is not None:
+        produtos.to_parquet(transacao.caminho_pendente(_caminho_produtos(raiz)), index=False, compression=COMPRESSAO)
+        return
+    os.makedirs(raiz, exist_ok=True)
+    caminho = _caminho_produtos(raiz)
+    temporario = caminho + ".tmp"
+    produtos.to_parquet(temporario, index=False, compression=COMPRESSAO)
+    os.replace(temporario, caminho)
+
+
+def produtos_em_dia(manifesto, raiz=DATA_DIR):
+    """
+    Indica se o dicionário gravado corresponde à geração do manifesto.
+    Um armazenamento vazio tem, por definição, o dicionário em dia.
+    """
+    if not os.path.exists(_caminho_produtos(raiz)):
+        return not existe_armazem(raiz)
+    return manifesto.get("geracao_produtos") == manifesto["geracao"]
+
+
+def atualizar_produtos(produtos_lote, raiz=DATA_DIR, transacao=None):
+    """
+    Soma o dicionário de um lote (veja `agregar_produtos`) ao gravado e
+    grava o resultado (na `transacao`, se informada).
+    """
+    caminho = _caminho_produtos(raiz)
+    existente = pd.read_parquet(caminho) if os.path.exists(caminho) else None
+    produtos = mesclar_produtos(existente, produtos_lote)
+    gravar_produtos(produtos, raiz, transacao)
+    return produtos
+
+
+def reconstruir_produtos(raiz=DATA_DIR):
+    """
+    Reconstrói o dicionário a partir do cubo (reconstruído antes, se
+    defasado), sem ler as partições. Usa a trava de escrita e publica o
+    dicionário e o manifesto em uma transação, como `reconstruir_cubo`.
+    """
+    with trava_escrita(raiz):
+        cubo = carregar_cubo(raiz)
+        manifesto = ler_manifesto(raiz)
+        produtos = agregar_produtos(cubo)
+        with Transacao(raiz) as transacao:
+            gravar_produtos(produtos, raiz, transacao)
+            manifesto["geracao_produtos"] = manifesto["geracao"]
+            transacao.confirmar(manifesto)
+    return produtos
+
+
+def carregar_produtos(raiz=DATA_DIR):
+    """
+    Carrega o dicionário gravado. Se ele não existir ou estiver defasado em
+    relação à geração do armazenamento, é reconstruído.
+    """
+    if not produtos_em_dia(ler_manifesto(raiz), raiz):
+        return reconstruir_produtos(raiz)
+    if not os.path.exists(_caminho_produtos(raiz)):
+        return pd.DataFrame()
+    return pd.read_parquet(_caminho_produtos(raiz))
+
+
+# ===== BUSCA =====
+
+def palavras(texto):
+    """
+    Retorna as palavras de um texto, sem acentos e em minúsculas.
+    """
+    decomposto = unicodedata.normalize("NFKD", str(texto).casefold())
+    sem_acentos = "".join(caractere for caractere in decomposto if not unicodedata.combining(caractere))
+    return _PALAVRA.findall(sem_acentos)
+
+
+class DicionarioProdutos:
+    """
+    Produtos ordenados pelo faturamento, com índice invertido das palavras
+    dos nomes. Cada palavra aponta para os postos (em ordem crescente) dos
+    produtos que a contêm; as palavras ficam ordenadas, de modo que as que
+    começam por um termo formam uma faixa contínua (busca binária).
+    """
+
+    def __init__(self, produtos):
+        if produtos.empty or COLUMN_PRODUTO not in produtos.columns:
+            produtos = pd.DataFrame({COLUMN_PRODUTO: [], COLUMN_VALOR_TOTAL: []})
+        validos = produtos[produtos[COLUMN_PRODUTO].notna()]
+        receita = validos[COLUMN_VALOR_TOTAL] if COLUMN_VALOR_TOTAL in validos.columns else pd.Series(0, index=validos.index)
+        ordenados = validos.assign(_receita=receita.fillna(0), _nome=validos[COLUMN_PRODUTO].astype(str)).sort_values(
+            ["_receita", "_nome"], ascending=[False, True], kind="stable"
+        )
+        self.nomes = ordenados["_nome"].to_numpy(dtype=object)
+        self.receita = ordenados["_receita"].to_numpy(dtype="float64")
+        self._postos = {nome: posto for posto, nome in enumerate(self.nomes)}
+
+        postagens = {}
+        for posto, nome in enumerate(self.nomes):
+            for palavra in set(palavras(nome)):
+                postagens.setdefault(palavra, []).append(posto)
+        self._palavras = sorted(postagens)
+        self._postagens = [np.array(postagens[palavra], dtype=np.int32) for palavra in self._palavras]
+
+    def __len__(self):
+        return len(self.nomes)
+
+    def posto(self, nome):
+        """
+        Retorna o posto do produto pelo faturamento (0 é o maior), ou None.
+        """
+        return self._postos.get(nome)
+
+    def _com_prefixo(self, termo):
+        """
+        Retorna os postos dos produtos com alguma palavra começando pelo termo.
+        """
+        inicio = bisect_left(self._palavras, termo)
+        fim = bisect_left(self._palavras, termo + "\U0010ffff", inicio)
+        if inicio == fim:
+            return np.array([], dtype=np.int32)
+        if fim - inicio == 1:
+            return self._postagens[inicio]
+        return np.unique(np.concatenate(self._postagens[inicio:fim]))
+
+    def buscar(self, texto="", limite=LIMITE_SUGESTOES):
+        """
+        Retorna até `limite` produtos, do maior para o menor faturamento,
+        cujos nomes têm, para cada termo do texto, uma palavra começando por
+        ele. Sem termos, retorna os mais vendidos.
+        """
+        termos = sorted(set(palavras(texto)), key=len, reverse=True)
+        if not termos:
+            return self.nomes[:limite].tolist()
+        postos = None
+        for termo in termos:
+            candidatos = self._com_prefixo(termo)
+            postos = candidatos if postos is None else np.intersect1d(postos, candidatos, assume_unique=True)
+            if not len(postos):
+                return []
+        return self.nomes[postos[:limite]].tolist()
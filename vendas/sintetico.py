@@ -0,0 +1,179 @@
+"""
+Gerador de exportações de vendas sintéticas, no formato esperado pelo dashboard.
+
+Os arquivos têm os cabeçalhos de uma exportação real ("Data", "Valor Total",
+...), datas em dd/mm/aaaa e decimais com vírgula, em CSV ou Excel. A geração
+é feita em blocos e depende apenas da semente, de modo que o mesmo comando
+produz sempre o mesmo arquivo, em qualquer tamanho. Usado pelo benchmark
+(`vendas.benchmark`) e para testes manuais:
+
+    python -m vendas.sintetico 1000000 vendas_1m.csv
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from .exportacao import LIMITE_LINHAS_EXCEL
+from .leitura import EXTENSOES_CSV, EXTENSOES_EXCEL, TAMANHO_BLOCO, extensao
+
+# ===== DOMÍNIOS DOS VALORES =====
+PRODUTOS = [
+    f"{modelo} {cor}"
+    for modelo in ("Camiseta", "Regata", "Bermuda", "Calça", "Vestido", "Saia", "Jaqueta", "Moletom")
+    for cor in ("Preta", "Branca", "Azul", "Verde", "Vermelha", "Cinza")
+]
+TAMANHOS = ["34", "36", "38", "40", "42", "44", "46"]
+PESOS_TAMANHOS = [0.04, 0.12, 0.22, 0.26, 0.20, 0.11, 0.05]
+TIPOS = ["Normal", "Promoção", "Kit"]
+PESOS_TIPOS = [0.75, 0.2, 0.05]
+STATUS = ["Concluído", "Enviado", "Cancelado", "Devolvido"]
+PESOS_STATUS = [0.7, 0.15, 0.1, 0.05]
+UFS = [
+    "SP", "RJ", "MG", "RS", "PR", "SC", "BA", "PE", "CE", "GO", "DF", "ES", "PA", "MA",
+    "AM", "MT", "MS", "PB", "RN", "AL", "PI", "SE", "RO", "TO", "AC", "AP", "RR",
+]
+# Preço unitário base de cada produto, fixo para que as métricas sejam coerentes
+PRECOS = dict(zip(PRODUTOS, np.random.default_rng(0).uniform(29.9, 299.9, len(PRODUTOS)).round(2)))
+
+# Cabeçalhos como aparecem nas exportações; "Pedido" não é usado pelo dashboard
+CABECALHOS = [
+    "Pedido", "Data", "Produto", "Tamanho", "Tipo", "Status", "UF", "Quantidade",
+    "Valor Total", "Subtotal do Produto", "Taxa", "Renda Estimada", "Quantidade Devolução",
+]
+CABECALHOS_DECIMAIS = ["Valor Total", "Subtotal do Produto", "Taxa", "Renda Estimada"]
+
+
+# ===== GERAÇÃO =====
+
+def _pesos(quantidade, rng):
+    """
+    Gera pesos desiguais (aproximadamente Zipf) para os valores de um domínio.
+    """
+    pesos = 1 / np.arange(1, quantidade + 1)
+    rng.shuffle(pesos)
+    return pesos / pesos.sum()
+
+
+def gerar_blocos(linhas, tamanho_bloco=TAMANHO_BLOCO, semente=0, inicio="2023-01-01", dias=730,
+                 fracao_invalidos=0.0):
+    """
+    Gera as vendas em DataFrames de até `tamanho_bloco` linhas, com os
+    cabeçalhos de uma exportação. As datas são uniformes em `dias` dias a
+    partir de `inicio`; produtos e UFs seguem pesos desiguais. Com
+    `fracao_invalidos`, essa fração das linhas recebe uma data ou um valor
+    inválido, para exercitar o relatório de normalização.
+    """
+    rng_dominio = np.random.default_rng([semente, 0])
+    pesos_produtos = _pesos(len(PRODUTOS), rng_dominio)
+    pesos_ufs = _pesos(len(UFS), rng_dominio)
+    precos = np.array([PRECOS[produto] for produto in PRODUTOS])
+    inicio = pd.Timestamp(inicio)
+
+    for numero, primeira in enumerate(range(0, linhas, tamanho_bloco), start=1):
+        n = min(tamanho_bloco, linhas - primeira)
+        rng = np.random.default_rng([semente, numero])
+
+        produto = rng.choice(len(PRODUTOS), n, p=pesos_produtos)
+        status = rng.choice(STATUS, n, p=PESOS_STATUS)
+        quantidade = rng.integers(1, 6, n)
+        subtotal = (precos[produto] * quantidade * rng.uniform(0.9, 1.1, n)).round(2)
+        frete = rng.choice([0.0, 9.9, 14.9, 19.9], n, p=[0.4, 0.3, 0.2, 0.1])
+        valor_total = (subtotal + frete).round(2)
+        taxa = (valor_total * rng.uniform(0.08, 0.16, n)).round(2)
+        devolucao = np.where(status == "Devolvido", quantidade, 0)
+
+        bloco = pd.DataFrame({
+            "Pedido": np.arange(primeira + 1, primeira + n + 1),
+            "Data": inicio + pd.to_timedelta(rng.integers(0, dias, n), unit="D"),
+            "Produto": np.array(PRODUTOS)[produto],
+            "Tamanho": rng.choice(TAMANHOS, n, p=PESOS_TAMANHOS),
+            "Tipo": rng.choice(TIPOS, n, p=PESOS_TIPOS),
+            "Status": status,
+            "UF": rng.choice(UFS, n, p=pesos_ufs),
+            "Quantidade": quantidade,
+            "Valor Total": valor_total,
+            "Subtotal do Produto": subtotal,
+            "Taxa": taxa,
+            "Renda Estimada": (valor_total - taxa).round(2),
+            "Quantidade Devolução": devolucao,
+        })
+        yield _formatar_bloco(bloco, rng, fracao_invalidos)
+
+
+def _formatar_bloco(bloco, rng, fracao_invalidos):
+    """
+    Converte datas e decimais para texto no padrão brasileiro (dd/mm/aaaa e
+    vírgula decimal) e insere os valores inválidos pedidos.
+    """
+    bloco["Data"] = bloco["Data"].dt.strftime("%d/%m/%Y")
+    for col in CABECALHOS_DECIMAIS:
+        bloco[col] = bloco[col].map("{:.2f}".format).str.replace(".", ",", regex=False)
+    if fracao_invalidos:
+        invalidas = rng.random(bloco.shape[0]) < fracao_invalidos
+        metade = rng.random(bloco.shape[0]) < 0.5
+        bloco.loc[invalidas & metade, "Data"] = "31/02/2023"
+        bloco.loc[invalidas & ~metade, "Valor Total"] = "n/d"
+    return bloco
+
+
+# ===== GRAVAÇÃO =====
+
+def gravar_csv(caminho, blocos):
+    """
+    Grava os blocos em um CSV separado por vírgulas (UTF-8).
+    """
+    with open(caminho, "w", encoding="utf-8", newline="") as arquivo:
+        for i, bloco in enumerate(blocos):
+            bloco.to_csv(arquivo, index=False, header=i == 0)
+
+
+def gravar_xlsx(caminho, blocos):
+    """
+    Grava os blocos em uma planilha Excel, em modo de escrita contínua.
+    """
+    from openpyxl import Workbook
+
+    pasta = Workbook(write_only=True)
+    planilha = pasta.create_sheet("Vendas")
+    planilha.append(CABECALHOS)
+    for bloco in blocos:
+        for linha in bloco.itertuples(index=False, name=None):
+            planilha.append(linha)
+    pasta.save(caminho)
+
+
+def gerar_arquivo(caminho, linhas, semente=0, fracao_invalidos=0.0, tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Gera um arquivo de vendas sintéticas com `linhas` linhas. O formato (CSV
+    ou Excel) é escolhido pela extensão do caminho. Retorna o caminho.
+    """
+    formato = extensao(caminho)
+    if formato not in EXTENSOES_CSV + ("xlsx",):
+        raise ValueError(f"Formato não suportado pelo gerador: {formato or os.path.basename(caminho)}")
+    if formato in EXTENSOES_EXCEL and linhas > LIMITE_LINHAS_EXCEL:
+        raise ValueError(f"Uma planilha Excel comporta no máximo {LIMITE_LINHAS_EXCEL:,} linhas. Use CSV.")
+
+    blocos = gerar_blocos(linhas, tamanho_bloco, semente, fracao_invalidos=fracao_invalidos)
+    if formato in EXTENSOES_CSV:
+        gravar_csv(caminho, blocos)
+    else:
+        gravar_xlsx(caminho, blocos)
+    return caminho
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera uma exportação de vendas sintéticas (CSV ou XLSX).")
+    parser.add_argument("linhas", type=int, help="número de linhas")
+    parser.add_argument("caminho", help="arquivo de saída (.csv ou .xlsx)")
+    parser.add_argument("--semente", type=int, default=0, help="semente do gerador (padrão: 0)")
+    parser.add_argument("--invalidos", type=float, default=0.0, help="fração de linhas com valores inválidos")
+    args = parser.parse_args(argv)
+    gerar_arquivo(args.caminho, args.linhas, args.semente, args.invalidos)
+    print(f"{args.linhas:,} linhas gravadas em {args.caminho}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Fila de tarefas em segundo plano do dashboard.
+
+Um upload não é mais processado na execução da página: os arquivos são
+enviados a uma fila (`FILA_TAREFAS`), atendida por um pool de threads do
+processo do servidor, e a página continua respondendo. Cada tarefa de
+ingestão grava os arquivos, compacta as partições e prepara a nova versão
+dos dados (motor e agregações sem filtros, veja `preparar_versao`). Só
+então a nova versão é publicada no cache, de uma só vez; até lá, todas as
+sessões seguem consultando a versão anterior.
+
+A fila é compartilhada por todas as sessões do processo. Cada tarefa guarda
+a situação, o progresso e uma mensagem, que a página exibe enquanto ela
+executa, e o resultado (ou o erro) ao terminar.
+"""
+
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .aquecimento import preparar_versao
+from .armazenamento import DATA_DIR
+from .compactacao import compactar
+from .ingestao import SITUACAO_INGERIDO, ingerir_fontes
+from .perfil import emitir
+
+# ===== CONSTANTES =====
+# As escritas já são feitas uma de cada vez (trava de escrita) e vários
+# arquivos enviados juntos são preparados em um pool de processos: um único
+# trabalhador basta e mantém as tarefas na ordem de chegada
+TRABALHADORES = 1
+# Tarefas concluídas mantidas na fila para consulta das sessões
+LIMITE_HISTORICO = 50
+
+SITUACAO_NA_FILA = "na fila"
+SITUACAO_EXECUTANDO = "executando"
+SITUACAO_CONCLUIDA = "concluída"
+SITUACAO_FALHOU = "falhou"
+# A gravação dos arquivos ocupa os primeiros 80% do progresso de uma ingestão
+FRACAO_GRAVACAO = 0.8
+
+
+class Tarefa:
+    """
+    Uma tarefa da fila: nome, raiz do armazenamento, situação, progresso
+    (0 a 1) e mensagem atuais e, ao terminar, o resultado ou o erro.
+    """
+
+    def __init__(self, identificador, nome, raiz):
+        self.id = identificador
+        self.nome = nome
+        self.raiz = raiz
+        self.situacao = SITUACAO_NA_FILA
+        self.progresso = 0.0
+        self.mensagem = "Aguardando na fila..."
+        self.resultado = None
+        self.erro = None
+        self.criada_em = time.time()
+        self.concluida_em = None
+
+    @property
+    def concluida(self):
+        """
+        Indica se a tarefa terminou (com sucesso ou não).
+        """
+        return self.situacao in (SITUACAO_CONCLUIDA, SITUACAO_FALHOU)
+
+    def informar(self, progresso=None, mensagem=None):
+        """
+        Atualiza o progresso e a mensagem exibidos pela página.
+        """
+        if progresso is not None:
+            self.progresso = min(max(float(progresso), 0.0), 1.0)
+        if mensagem is not None:
+            self.mensagem = mensagem
+
+
+class FilaTarefas:
+    """
+    Fila de tarefas atendida por um pool de threads. Seguro para uso entre
+    threads; as sessões consultam as tarefas pelo identificador.
+    """
+
+    def __init__(self, trabalhadores=TRABALHADORES):
+        self._pool = ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix="tarefa")
+        self._trava = threading.Lock()
+        self._tarefas = OrderedDict()
+        self._contador = itertools.count(1)
+
+    def submeter(self, nome, funcao, *args, raiz=DATA_DIR):
+        """
+        Põe na fila a execução de `funcao(tarefa, *args)` e retorna a tarefa.
+        A função recebe a tarefa para informar o progresso; o valor retornado
+        fica em `tarefa.resultado`.
+        """
+        with self._trava:
+            tarefa = Tarefa(next(self._contador), nome, raiz)
+            self._tarefas[tarefa.id] = tarefa
+            concluidas = [t.id for t in self._tarefas.values() if t.concluida]
+            for identificador in concluidas[:max(len(concluidas) - LIMITE_HISTORICO, 0)]:
+                del self._tarefas[identificador]
+        self._pool.submit(self._executar, tarefa, funcao, args)
+        return tarefa
+
+    def _executar(self, tarefa, funcao, args):
+        """
+        Executa a tarefa, registrando a situação final e a duração no log.
+        """
+        tarefa.situacao = SITUACAO_EXECUTANDO
+        tarefa.informar(0.0, "Iniciando...")
+        inicio = time.perf_counter()
+        try:
+            tarefa.resultado = funcao(tarefa, *args)
+            tarefa.informar(1.0, "Concluída.")
+            tarefa.situacao = SITUACAO_CONCLUIDA
+        except Exception as e:
+            tarefa.erro = str(e)
+            tarefa.informar(mensagem=f"Falhou: {e}")
+            tarefa.situacao = SITUACAO_FALHOU
+        finally:
+            tarefa.concluida_em = time.time()
+            emitir({
+                "evento": "tarefa",
+                "nome": tarefa.nome,
+                "raiz": tarefa.raiz,
+                "situacao": tarefa.situacao,
+                "ms": round((time.perf_counter() - inicio) * 1000, 2),
+                **({"erro": tarefa.erro} if tarefa.erro else {}),
+            })
+
+    def obter(self, identificador):
+        """
+        Retorna a tarefa com o identificador (None se não existir mais).
+        """
+        with self._trava:
+            return self._tarefas.get(identificador)
+
+    def ativas(self, raiz=DATA_DIR):
+        """
+        Retorna as tarefas ainda não concluídas de uma raiz, em ordem de chegada.
+        """
+        raiz = os.path.abspath(raiz)
+        with self._trava:
+            return [t for t in self._tarefas.values() if not t.concluida and os.path.abspath(t.raiz) == raiz]
+
+
+FILA_TAREFAS = FilaTarefas()
+
+
+# ===== INGESTÃO =====
+
+def ingerir_enviados(tarefa, arquivos, raiz=DATA_DIR):
+    """
+    Corpo da tarefa de ingestão. `arquivos` é uma lista de tuplas
+    (conteúdo, nome, planilha). Grava os arquivos novos (veja
+    `ingerir_fontes`), junta os arquivos pequenos das partições e prepara a
+    nova versão dos dados.
+
+    Retorna o resumo do upload: um dicionário por arquivo com "arquivo",
+    "situacao", "registro" e "erro".
+    """
+    def informar(fracao, mensagem):
+        tarefa.informar(FRACAO_GRAVACAO * fracao, mensagem)
+
+    resumo = ingerir_fontes(arquivos, raiz, informar)
+    if any(item["situacao"] == SITUACAO_INGERIDO for item in resumo):
+        # A compactação não muda as linhas nem a geração: feita antes da
+        # preparação, a nova versão já é montada sobre os arquivos compactados
+        tarefa.informar(FRACAO_GRAVACAO, "Compactando as partições...")
+        compactar(raiz)
+        tarefa.informar(0.9, "Atualizando índices, cubo e agregações...")
+        preparar_versao(raiz)
+    return resumo
+
+
+def submeter_ingestao(arquivos, raiz=DATA_DIR):
+    """
+    Põe na fila a ingestão dos arquivos (lista de tuplas (conteúdo, nome,
+    planilha)) e retorna a tarefa.
+    """
+    nomes = ", ".join(nome for _, nome, _ in arquivos)
+    return FILA_TAREFAS.submeter(f"Ingestão de {nomes}", ingerir_enviados, arquivos, raiz, raiz=raiz)